@@ -40,40 +40,171 @@ Page({
       // 加载聚会信息和推荐结果
       this.loadGathering(options.code)
       this.loadRecommendations(options.code)
+
+      // 之后的变化由服务端实时推送
+      this.connectRealtime()
     }
   },
 
   onShow() {
-    // 页面显示时刷新数据
-    if (this.data.code) {
-      this.loadGathering(this.data.code)
-      this.loadRecommendations(this.data.code)
+    // 页面重新显示时恢复实时连接（带上已有版本号，有更新时服务端补发快照）
+    if (this.data.code && !this.socketTask) {
+      this.connectRealtime()
+    }
+  },
+
+  onHide() {
+    this.closeRealtime()
+  },
+
+  onUnload() {
+    this.closeRealtime()
+  },
+
+  // ==================== 实时更新 ====================
+
+  // 连接聚会实时推送
+  connectRealtime() {
+    this.closeRealtime()
+    this.realtimeClosed = false
+
+    const url = app.globalData.baseUrl.replace(/^http/, 'ws') +
+      '/gathering/' + this.data.code + '/ws?version=' + (this.version || 0) +
+      '&recommendations_version=' + (this.recommendationsVersion || 0)
+    const socketTask = wx.connectSocket({ url })
+    this.socketTask = socketTask
+
+    socketTask.onOpen(() => {
+      this.reconnectDelay = 1000
+      // 心跳，避免空闲连接被网关断开
+      this.heartbeatTimer = setInterval(() => {
+        socketTask.send({ data: 'ping' })
+      }, 25000)
+    })
+
+    socketTask.onMessage((res) => {
+      if (res.data !== 'pong') {
+        this.handleRealtimeEvent(JSON.parse(res.data))
+      }
+    })
+
+    socketTask.onClose((res) => {
+      if (this.socketTask !== socketTask) {
+        return
+      }
+      this.clearRealtimeTimers()
+      this.socketTask = null
+      // 主动关闭或聚会不存在时不重连，其他情况按指数退避重连
+      if (!this.realtimeClosed && res.code !== 4404) {
+        const delay = this.reconnectDelay || 1000
+        this.reconnectDelay = Math.min(delay * 2, 30000)
+        this.reconnectTimer = setTimeout(() => this.connectRealtime(), delay)
+      }
+    })
+
+    socketTask.onError(() => {
+      // 出错后会触发 onClose，在那里重连
+    })
+  },
+
+  // 关闭实时连接
+  closeRealtime() {
+    this.realtimeClosed = true
+    this.clearRealtimeTimers()
+    if (this.socketTask) {
+      const socketTask = this.socketTask
+      this.socketTask = null
+      socketTask.close({})
     }
   },
 
-  // 加载聚会信息
+  clearRealtimeTimers() {
+    clearInterval(this.heartbeatTimer)
+    clearTimeout(this.reconnectTimer)
+    clearTimeout(this.recommendationsTimer)
+  },
+
+  // 处理推送事件（按版本号忽略过期事件）
+  handleRealtimeEvent(event) {
+    if (event.type === 'recommendations') {
+      if (event.version < (this.recommendationsVersion || 0)) {
+        return
+      }
+      this.recommendationsVersion = event.version
+      clearTimeout(this.recommendationsTimer)
+      this.setData({
+        recommendations: event.data || [],
+        isLoading: false
+      })
+      return
+    }
+
+    // snapshot / gathering：聚会更新
+    if (event.version <= (this.version || 0)) {
+      return
+    }
+    const changed = this.participantsSignature(event.data) !== this.participantsSignature(this.data.gathering)
+    this.applyGathering(event.data)
+
+    // 参与者变化后服务端在后台重算并推送推荐结果；一段时间内没有收到时再主动请求
+    if (changed && !this.data.isSinglePerson) {
+      clearTimeout(this.recommendationsTimer)
+      this.recommendationsTimer = setTimeout(() => {
+        this.loadRecommendations(this.data.code)
+      }, 5000)
+    }
+  },
+
+  // 影响推荐结果的参与者信息
+  participantsSignature(gathering) {
+    if (!gathering || !gathering.participants) {
+      return ''
+    }
+    return gathering.participants.map((p) => {
+      const location = p.location || {}
+      return [p.temp_id, location.lat, location.lng, p.transport].join(',')
+    }).join(';')
+  },
+
+  // 响应头中的 ETag
+  getEtag(res) {
+    const header = res.header || {}
+    return header.ETag || header.Etag || header.etag || ''
+  },
+
+  // 加载聚会信息（带上次的 ETag，未变化时服务端返回 304）
   loadGathering(code) {
     wx.request({
       url: app.globalData.baseUrl + '/gathering/' + code,
+      header: this.gatheringEtag ? { 'If-None-Match': this.gatheringEtag } : {},
       success: (res) => {
-        if (res.data.success) {
-          const gathering = res.data.data
-          const participantCount = gathering.participants ? gathering.participants.length : 0
-
-          this.setData({
-            gathering: gathering,
-            isSinglePerson: participantCount === 1
-          })
-
-          // 如果只有一个人，加载附近地点
-          if (participantCount === 1) {
-            this.loadNearbyPlaces(gathering)
-          }
+        if (res.statusCode === 304) {
+          return
+        }
+        if (res.data.success && (res.data.data.version || 0) >= (this.version || 0)) {
+          this.gatheringEtag = this.getEtag(res)
+          this.applyGathering(res.data.data)
         }
       }
     })
   },
 
+  // 更新页面上的聚会信息
+  applyGathering(gathering) {
+    const participantCount = gathering.participants ? gathering.participants.length : 0
+    this.version = gathering.version || 0
+
+    this.setData({
+      gathering: gathering,
+      isSinglePerson: participantCount === 1
+    })
+
+    // 如果只有一个人，加载附近地点
+    if (participantCount === 1) {
+      this.loadNearbyPlaces(gathering)
+    }
+  },
+
   // 加载推荐结果
   loadRecommendations(code) {
     // 如果只有一个人，不加载推荐
@@ -85,14 +216,15 @@ Page({
     this.setData({ isLoading: true })
 
     wx.request({
-      url: app.globalData.baseUrl + '/recommend/calculate',
-      method: 'POST',
-      data: {
-        gathering_code: code,
-        preferences: {}
-      },
+      url: app.globalData.baseUrl + '/recommend/' + code,
+      header: this.recommendationsEtag ? { 'If-None-Match': this.recommendationsEtag } : {},
       success: (res) => {
-        if (res.data.success) {
+        if (res.statusCode === 304) {
+          // 推荐结果未变化
+          this.setData({ isLoading: false })
+        } else if (res.data.success) {
+          this.recommendationsEtag = this.getEtag(res)
+          this.recommendationsVersion = Math.max(this.recommendationsVersion || 0, res.data.version || 0)
           this.setData({
             recommendations: res.data.data || [],
             isLoading: false
@@ -481,9 +613,11 @@ Page({
           // 隐藏弹窗
           this.hideAddParticipant()
 
-          // 重新加载数据
-          this.loadGathering(this.data.code)
-          this.loadRecommendations(this.data.code)
+          // 已连接实时推送时由推送更新，否则重新加载数据
+          if (!this.socketTask) {
+            this.loadGathering(this.data.code)
+            this.loadRecommendations(this.data.code)
+          }
         } else {
           wx.showToast({
             title: res.data.message || '添加失败',
@@ -532,9 +666,11 @@ Page({
             icon: 'success'
           })
 
-          // 重新加载数据
-          this.loadGathering(this.data.code)
-          this.loadRecommendations(this.data.code)
+          // 已连接实时推送时由推送更新，否则重新加载数据
+          if (!this.socketTask) {
+            this.loadGathering(this.data.code)
+            this.loadRecommendations(this.data.code)
+          }
         } else {
           wx.showToast({
             title: res.data.message || '删除失败',
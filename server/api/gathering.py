@@ -1,40 +1,72 @@
 """
 聚会相关API
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse
+from typing import Dict, Optional
 from datetime import datetime, timedelta
+import asyncio
 import random
 import string
 from models.gathering import (
     CreateGatheringRequest, 
     JoinGatheringRequest, 
-    Gathering, 
+    LeaveGatheringRequest,
     GatheringResponse,
     Participant
 )
-from app.database import get_mongodb, get_redis
+from services.gathering_repository import gathering_repository
+from services.realtime import gathering_hub, encode_event
+from services.recompute_worker import recompute_worker
+from api.recommendation import latest_recommendations, recompute_gathering
 from app.config import settings
+from app.etag import gathering_etag, etag_matches, not_modified
+from core.scoring_state import scoring_states
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# 本进程内等待防抖的重算任务（后台队列不可用时使用）
+_local_recomputes: Dict[str, asyncio.Task] = {}
+
 def generate_invite_code() -> str:
     """生成6位邀请码"""
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
 
+async def _recompute_locally(code: str):
+    """防抖期结束后在本进程内重算推荐"""
+    await asyncio.sleep(settings.RECOMPUTE_DEBOUNCE_SECONDS)
+    _local_recomputes.pop(code, None)
+    try:
+        await recompute_gathering(code)
+    except Exception as e:
+        logger.error(f"Local recompute failed for gathering {code}: {e}")
+
+async def _schedule_recompute(code: str):
+    """
+    参与者变化后安排重算推荐
+
+    优先加入后台重算队列；队列不可用（如 Redis 不可用）时在本进程内防抖后重算，
+    防抖期内的新变化取消尚未开始的任务并重新计时。
+    """
+    if await recompute_worker.enqueue(code):
+        return
+
+    pending = _local_recomputes.pop(code, None)
+    if pending:
+        pending.cancel()
+    _local_recomputes[code] = asyncio.create_task(_recompute_locally(code))
+
 @router.post("/create", response_model=GatheringResponse)
 async def create_gathering(request: CreateGatheringRequest):
     """
     创建新聚会
     """
     try:
-        db = get_mongodb()
-        
         # 生成唯一邀请码
         code = generate_invite_code()
-        while await db.gatherings.find_one({"code": code}):
+        while await gathering_repository.exists(code):
             code = generate_invite_code()
         
         # 创建聚会对象
@@ -61,23 +93,14 @@ async def create_gathering(request: CreateGatheringRequest):
             )
             gathering["participants"].append(creator.dict())
         
-        # 保存到数据库
-        await db.gatherings.insert_one(gathering)
-        
-        # 缓存到Redis（用于实时更新）
-        redis = get_redis()
-        if redis:
-            await redis.setex(
-                f"gathering:{code}",
-                settings.GATHERING_EXPIRE_HOURS * 3600,
-                Gathering(**gathering).json()
-            )
+        # 保存到数据库（同时写入缓存）
+        created = await gathering_repository.create(gathering)
         
         logger.info(f"Created gathering with code: {code}")
         
         return GatheringResponse(
             success=True,
-            data=Gathering(**gathering),
+            data=created,
             message="聚会创建成功"
         )
         
@@ -85,72 +108,69 @@ async def create_gathering(request: CreateGatheringRequest):
         logger.error(f"Failed to create gathering: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _join_failure(code: str) -> Optional[GatheringResponse]:
+    """
+    原子更新未命中时判断原因
+
+    Returns:
+        失败响应；聚会仍可加入（并发修改导致未命中）时返回None
+    """
+    gathering = await gathering_repository.join_state(code)
+    if not gathering or gathering["status"] != "active":
+        return GatheringResponse(success=False, message="邀请码无效或已过期")
+
+    if gathering["expires_at"] < datetime.now():
+        await gathering_repository.set_status(code, "expired")
+        return GatheringResponse(success=False, message="聚会已过期")
+
+    if len(gathering["participants"]) >= settings.MAX_PARTICIPANTS:
+        return GatheringResponse(
+            success=False,
+            message=f"聚会人数已达上限（{settings.MAX_PARTICIPANTS}人）"
+        )
+    return None
+
 @router.post("/join", response_model=GatheringResponse)
 async def join_gathering(request: JoinGatheringRequest):
     """
-    加入聚会
+    加入聚会（已加入的参与者更新位置信息）
+
+    新参与者用 $push 加入，过滤条件中带人数上限和"尚未加入"判断；
+    已加入的参与者用位置操作符 $set 更新自己的条目。
+    两者都是单次原子的 find_one_and_update，并发加入不会互相覆盖。
     """
     try:
-        db = get_mongodb()
-        
-        # 查找聚会
-        gathering = await db.gatherings.find_one({"code": request.code.upper()})
+        code = request.code.upper()
+        participant = request.participant.dict()
+        temp_id = request.participant.temp_id
+
+        gathering = None
+        for _ in range(2):
+            # 新参与者：未满员且尚未加入时追加
+            gathering = await gathering_repository.add_participant(code, participant)
+            if gathering:
+                break
+
+            # 已加入：更新自己的条目
+            gathering = await gathering_repository.update_participant(code, participant)
+            if gathering:
+                break
+
+            failure = await _join_failure(code)
+            if failure:
+                return failure
+
         if not gathering:
-            return GatheringResponse(
-                success=False,
-                message="邀请码无效或已过期"
-            )
-        
-        # 检查是否过期
-        if gathering["expires_at"] < datetime.now():
-            await db.gatherings.update_one(
-                {"code": request.code},
-                {"$set": {"status": "expired"}}
-            )
-            return GatheringResponse(
-                success=False,
-                message="聚会已过期"
-            )
-        
-        # 检查人数限制
-        if len(gathering["participants"]) >= settings.MAX_PARTICIPANTS:
-            return GatheringResponse(
-                success=False,
-                message=f"聚会人数已达上限（{settings.MAX_PARTICIPANTS}人）"
-            )
-        
-        # 检查是否已经加入
-        participant_ids = [p["temp_id"] for p in gathering["participants"]]
-        if request.participant.temp_id in participant_ids:
-            # 更新位置信息
-            for i, p in enumerate(gathering["participants"]):
-                if p["temp_id"] == request.participant.temp_id:
-                    gathering["participants"][i] = request.participant.dict()
-                    break
-        else:
-            # 添加新参与者
-            gathering["participants"].append(request.participant.dict())
-        
-        # 更新数据库
-        await db.gatherings.update_one(
-            {"code": request.code.upper()},
-            {"$set": {"participants": gathering["participants"]}}
-        )
-        
-        # 更新Redis缓存
-        redis = get_redis()
-        if redis:
-            await redis.setex(
-                f"gathering:{request.code}",
-                settings.GATHERING_EXPIRE_HOURS * 3600,
-                Gathering(**gathering).json()
-            )
+            return GatheringResponse(success=False, message="加入聚会失败，请重试")
+
+        # 参与者变化，后台重算推荐（防抖，连续加入只算一次）
+        await _schedule_recompute(code)
         
-        logger.info(f"User {request.participant.temp_id} joined gathering {request.code}")
+        logger.info(f"User {temp_id} joined gathering {code}")
         
         return GatheringResponse(
             success=True,
-            data=Gathering(**gathering),
+            data=gathering,
             message="成功加入聚会"
         )
         
@@ -158,62 +178,119 @@ async def join_gathering(request: JoinGatheringRequest):
         logger.error(f"Failed to join gathering: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/leave", response_model=GatheringResponse)
+async def leave_gathering(request: LeaveGatheringRequest):
+    """
+    退出聚会（$pull 原子移除参与者）
+    """
+    try:
+        code = request.code.upper()
+        gathering = await gathering_repository.remove_participant(code, request.temp_id)
+        if not gathering:
+            return GatheringResponse(success=False, message="邀请码无效或已过期")
+
+        await _schedule_recompute(code)
+
+        logger.info(f"User {request.temp_id} left gathering {code}")
+
+        return GatheringResponse(
+            success=True,
+            data=gathering,
+            message="已退出聚会"
+        )
+
+    except Exception as e:
+        logger.error(f"Failed to leave gathering: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{code}", response_model=GatheringResponse)
-async def get_gathering(code: str):
+async def get_gathering(code: str, if_none_match: Optional[str] = Header(None)):
     """
     获取聚会详情
+
+    响应带 ETag（聚会版本号）；If-None-Match 与当前版本一致时返回 304，
+    版本号只从 Redis 读取，不读 MongoDB、不构建模型。
+    缓存命中时直接序列化缓存中的聚会数据返回，同样不构建模型。
     """
     try:
-        # 先从Redis获取
-        redis = get_redis()
-        if redis:
-            cached = await redis.get(f"gathering:{code.upper()}")
-            if cached:
-                gathering = Gathering.parse_raw(cached)
-                return GatheringResponse(
-                    success=True,
-                    data=gathering
-                )
-        
-        # 从MongoDB获取
-        db = get_mongodb()
-        gathering = await db.gatherings.find_one({"code": code.upper()})
+        if if_none_match:
+            version = await gathering_repository.cached_version(code)
+            if version is not None and etag_matches(if_none_match, gathering_etag(version)):
+                return not_modified(gathering_etag(version))
+
+        data = await gathering_repository.get_data(code)
         
-        if not gathering:
+        if not data:
             return GatheringResponse(
                 success=False,
                 message="聚会不存在"
             )
-        
-        return GatheringResponse(
-            success=True,
-            data=Gathering(**gathering)
+
+        etag = gathering_etag(data["version"])
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+        return ORJSONResponse(
+            {"success": True, "data": data, "message": ""},
+            headers={"ETag": etag}
         )
         
     except Exception as e:
         logger.error(f"Failed to get gathering: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.websocket("/{code}/ws")
+async def gathering_updates(websocket: WebSocket, code: str, version: int = 0, recommendations_version: int = 0):
+    """
+    聚会实时更新（替代轮询聚会详情和推荐结果）
+
+    推送事件 {"type", "version", "data"}：
+    - snapshot: 连接时聚会版本比客户端传入的 version 新，补发完整聚会
+    - gathering: 聚会更新（参与者加入/退出/修改、状态变化）
+    - recommendations: 新的推荐结果；连接时最近一次的结果比客户端传入的 recommendations_version 新时也补发
+    客户端发送 "ping" 时回复 "pong"（心跳）。
+    """
+    code = code.upper()
+    await websocket.accept()
+
+    # 先登记再读取快照，读取期间的更新不会丢失（客户端按版本号去重）
+    gathering_hub.connect(code, websocket)
+    try:
+        data = await gathering_repository.get_data(code)
+        if not data:
+            await websocket.close(code=4404, reason="gathering not found")
+            return
+
+        if data["version"] > version:
+            await websocket.send_text(encode_event("snapshot", data["version"], data))
+
+        # 断线期间错过的推荐结果
+        latest = await latest_recommendations(code)
+        if latest and latest[0] > recommendations_version:
+            await websocket.send_text(encode_event("recommendations", *latest))
+
+        while True:
+            message = await websocket.receive_text()
+            if message == "ping":
+                await websocket.send_text("pong")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        gathering_hub.disconnect(code, websocket)
+
 @router.delete("/{code}")
 async def cancel_gathering(code: str):
     """
     取消聚会
     """
     try:
-        db = get_mongodb()
-        
-        result = await db.gatherings.update_one(
-            {"code": code.upper()},
-            {"$set": {"status": "cancelled"}}
-        )
+        gathering = await gathering_repository.set_status(code, "cancelled")
         
-        if result.modified_count == 0:
+        if not gathering:
             return {"success": False, "message": "聚会不存在"}
-        
-        # 从Redis删除
-        redis = get_redis()
-        if redis:
-            await redis.delete(f"gathering:{code.upper()}")
+
+        # 丢弃增量打分状态
+        scoring_states.discard(code.upper())
         
         return {"success": True, "message": "聚会已取消"}
         
@@ -227,15 +304,7 @@ async def list_recent_gatherings(limit: int = 10):
     获取最近的聚会列表（用于调试）
     """
     try:
-        db = get_mongodb()
-        
-        cursor = db.gatherings.find(
-            {"status": "active"}
-        ).sort("created_at", -1).limit(limit)
-        
-        gatherings = []
-        async for doc in cursor:
-            gatherings.append(Gathering(**doc))
+        gatherings = await gathering_repository.list_recent(limit)
         
         return {
             "success": True,
@@ -4,48 +4,92 @@
 from fastapi import APIRouter, HTTPException
 from typing import List, Optional
 from models.gathering import Location
-from services.map_service import get_map_service
+from models.location import GeocodeBatchRequest
+from services.map_service import get_map_service, GeocodeError
+from services.quota import QuotaExceeded
+from services.geocoder import geocoder
+from services.reverse_geocoder import get_reverse_geocoder
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+def _geocode_data(address: str, result) -> dict:
+    """地理编码结果的响应格式（地图服务出错的地址带 error 字段，区别于未找到）"""
+    if isinstance(result, Exception):
+        return {"address": address, "location": None, "formatted_address": None, "error": "地图服务暂时不可用"}
+    if result is None:
+        return {"address": address, "location": None, "formatted_address": None}
+    return {
+        "address": address,
+        "location": {"lat": result["lat"], "lng": result["lng"]},
+        "formatted_address": result["formatted_address"],
+        "province": result["province"],
+        "city": result["city"],
+        "district": result["district"]
+    }
+
 @router.post("/geocode")
-async def geocode_address(address: str):
+async def geocode_address(address: str, city: Optional[str] = None):
     """
     地址转坐标（地理编码）
     """
     try:
-        map_service = get_map_service()
-        # 这里简化处理，实际应调用地图API
-        # 返回模拟数据
+        result = await geocoder.geocode(get_map_service(), address, city)
+        if result is None:
+            return {"success": False, "message": "未找到该地址"}
         return {
             "success": True,
-            "data": {
-                "address": address,
-                "location": {
-                    "lat": 39.908 + (hash(address) % 100) / 10000,
-                    "lng": 116.397 + (hash(address) % 100) / 10000
-                }
-            }
+            "data": _geocode_data(address, result)
         }
+    except QuotaExceeded as e:
+        logger.warning(f"Geocoding quota exceeded: {e}")
+        raise HTTPException(status_code=503, detail="地图服务繁忙，请稍后重试")
+    except GeocodeError as e:
+        logger.error(f"Geocoding upstream error: {e}")
+        raise HTTPException(status_code=502, detail="地图服务暂时不可用")
     except Exception as e:
         logger.error(f"Geocoding failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/geocode/batch")
+async def geocode_batch(request: GeocodeBatchRequest):
+    """
+    批量地址转坐标（去重后并发解析，未找到的地址 location 为 null，地图服务出错的地址另带 error 字段）
+    """
+    try:
+        results = await geocoder.geocode_many(get_map_service(), request.addresses, request.city)
+        data = [_geocode_data(address, result) for address, result in zip(request.addresses, results)]
+        return {
+            "success": True,
+            "data": data,
+            "count": len(data),
+            "resolved": sum(1 for r in results if isinstance(r, dict)),
+            "failed": sum(1 for r in results if isinstance(r, Exception))
+        }
+    except Exception as e:
+        logger.error(f"Batch geocoding failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/reverse-geocode")
 async def reverse_geocode(lat: float, lng: float):
     """
-    坐标转地址（逆地理编码）
+    坐标转地址（逆地理编码，优先使用本地行政区边界）
     """
     try:
-        # 这里简化处理，实际应调用地图API
+        result = await get_reverse_geocoder().reverse_geocode(get_map_service(), lat, lng)
+        if result is None:
+            return {"success": False, "message": "无法解析该位置"}
         return {
             "success": True,
             "data": {
                 "location": {"lat": lat, "lng": lng},
-                "address": f"北京市朝阳区（{lat:.3f}, {lng:.3f}）附近",
-                "formatted_address": f"北京市朝阳区建国路{abs(hash(f'{lat}{lng}')) % 100}号"
+                "address": result["formatted_address"],
+                "formatted_address": result["formatted_address"],
+                "province": result["province"],
+                "city": result["city"],
+                "district": result["district"],
+                "street": result["street"]
             }
         }
     except Exception as e:
@@ -1,17 +1,54 @@
 """
 推荐相关API
 """
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
-from models.gathering import Participant, Location, RecommendationItem, ParticipantDistance
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import ORJSONResponse, Response
+from typing import List, Optional, Tuple
+from models.gathering import Gathering, Location, RecommendationItem, ParticipantDistance
 from core.algorithm import RecommendationEngine
+from core.scoring_state import GatheringScoringState, scoring_states
 from services.map_service import get_map_service
-from app.database import get_mongodb
+from services.candidate_service import generate_candidates, search_centers
+from services.travel_times import apply_routed_times
+from services.singleflight import SingleFlight
+from services.gathering_repository import gathering_repository
+from services.realtime import gathering_hub, encode_event
+from services.quota import quota_priority, PRIORITY_BACKGROUND
+from app.database import get_redis
+from app.config import settings
+from app.etag import recommendations_etag, etag_matches, not_modified
 import logging
+import traceback
+import hashlib
+import json
+import orjson
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# 推荐计算请求合并（同一聚会、同一参与者状态的并发请求只计算一次）
+calculation_flight = SingleFlight(namespace="recommend")
+
+
+def participant_version(gathering: Gathering, preferences: Optional[dict] = None) -> str:
+    """
+    计算聚会参与者状态的版本标识（参与者位置/交通方式、聚会类型和偏好）
+
+    Args:
+        gathering: 聚会
+        preferences: 偏好设置
+
+    Returns:
+        版本字符串
+    """
+    digest = hashlib.md5()
+    digest.update(f"{gathering.type.value}|{json.dumps(preferences or {}, sort_keys=True)}".encode("utf-8"))
+    for p in gathering.participants:
+        lat, lng = (p.location.lat, p.location.lng) if p.location else (None, None)
+        digest.update(f"{p.temp_id}|{lat}|{lng}|{p.transport};".encode("utf-8"))
+    return digest.hexdigest()
+
+
 @router.post("/calculate")
 async def calculate_recommendations(
     gathering_code: str,
@@ -20,85 +57,15 @@ async def calculate_recommendations(
     """
     计算推荐地点
     """
-    #  print("This is Calculating")
-    print("========>Gathering Code  "+gathering_code);
-    print("========>preferences: ")
-    print(preferences)
     try:
-        # 获取聚会信息
-        db = get_mongodb()
-        gathering = await db.gatherings.find_one({"code": gathering_code.upper()})
+        # 获取推荐计算所需的聚会字段（经聚会缓存读取）
+        gathering_code = gathering_code.upper()
+        gathering = await gathering_repository.get_for_calculation(gathering_code)
         
         if not gathering:
             raise HTTPException(status_code=404, detail="聚会不存在")
         
-        # 转换参与者数据
-        participants = [Participant(**p) for p in gathering["participants"]]
-        
-        # 过滤出有位置信息的参与者
-        valid_participants = [p for p in participants if p.location]
-        
-        if len(valid_participants) < 2:
-            return {
-                "success": False,
-                "message": "需要至少2个人的位置信息才能推荐",
-                "data": []
-            }
-        
-        # 计算中心点
-        center_point = RecommendationEngine.calculate_center_point(valid_participants)
-        
-        # 获取地图服务
-        map_service = get_map_service()
-        
-        # 搜索附近的候选地点
-        keyword_map = {
-            "meal": "餐厅",
-            "coffee": "咖啡厅",
-            "movie": "电影院",
-            "ktv": "KTV",
-            "other": "商场"
-        }
-        keyword = keyword_map.get(gathering["type"], "餐厅")
-        
-        candidate_places = await map_service.search_nearby(
-            center=center_point,
-            keyword=keyword,
-            radius=3000
-        )
-        print("=================>candidate_places:")
-        print(candidate_places)
-        
-        # 使用推荐引擎计算
-        recommendations = RecommendationEngine.recommend_locations(
-            participants=valid_participants,
-            candidate_locations=candidate_places,
-            max_results=5
-        )
-        
-        # 根据偏好过滤
-        if preferences:
-            recommendations = RecommendationEngine.filter_by_preferences(
-                recommendations=recommendations,
-                preferences=preferences
-            )
-        
-        # 更新数据库中的推荐结果
-        recommendation_dicts = [r.dict() for r in recommendations]
-        await db.gatherings.update_one(
-            {"code": gathering_code.upper()},
-            {"$set": {"recommendations": recommendation_dicts}}
-        )
-        
-        return {
-            "success": True,
-            "data": recommendations,
-            "center_point": {
-                "lat": center_point[0],
-                "lng": center_point[1]
-            },
-            "participant_count": len(valid_participants)
-        }
+        return await _recommendations_response(gathering, gathering_code, preferences)
         
     except HTTPException:
         raise
@@ -107,6 +74,283 @@ async def calculate_recommendations(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.get("/{gathering_code}")
+async def get_recommendations(gathering_code: str, if_none_match: Optional[str] = Header(None)):
+    """
+    获取推荐结果（默认偏好），支持 If-None-Match 条件请求
+
+    计算推荐结果后聚会没有再修改、且客户端已有该结果时，只读 Redis 返回 304。
+    """
+    try:
+        gathering_code = gathering_code.upper()
+        if if_none_match:
+            latest = await _latest_versions(gathering_code)
+            if (
+                latest is not None
+                and latest[1] == await gathering_repository.cached_version(gathering_code)
+                and etag_matches(if_none_match, recommendations_etag(latest[0]))
+            ):
+                return not_modified(recommendations_etag(latest[0]))
+
+        gathering = await gathering_repository.get_for_calculation(gathering_code)
+        if not gathering:
+            raise HTTPException(status_code=404, detail="聚会不存在")
+
+        return await _recommendations_response(gathering, gathering_code, None, if_none_match)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get recommendations: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _recommendations_response(
+    gathering: Gathering,
+    gathering_code: str,
+    preferences: Optional[dict],
+    if_none_match: Optional[str] = None
+) -> Response:
+    """
+    按当前参与者状态返回推荐结果（带 ETag）
+
+    后台已按当前参与者状态算好的结果直接返回缓存的序列化字节，否则（冷启动/尚未重算完）当场计算。
+    """
+    version = participant_version(gathering, preferences)
+    latest = await _load_latest(gathering_code, version)
+    if latest is not None:
+        result_version, body = latest
+        etag = recommendations_etag(result_version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+    result = await _calculate(gathering, gathering_code, preferences, version)
+    headers = {"ETag": recommendations_etag(result["version"])} if "version" in result else None
+    return ORJSONResponse(result, headers=headers)
+
+
+async def recompute_gathering(gathering_code: str):
+    """
+    后台重算推荐（recompute_worker 的处理函数，参与者变化并防抖后调用）
+
+    地图请求使用后台优先级，不占用为交互请求预留的配额。
+    """
+    gathering = await gathering_repository.get_for_calculation(gathering_code)
+    if not gathering or gathering.status != "active":
+        return
+
+    with quota_priority(PRIORITY_BACKGROUND):
+        await _calculate(gathering, gathering_code, None, participant_version(gathering))
+
+
+async def _calculate(
+    gathering: Gathering,
+    gathering_code: str,
+    preferences: Optional[dict],
+    version: str,
+    fresh: bool = False
+) -> dict:
+    """
+    同一聚会、同一参与者状态的并发请求共享一次计算
+
+    Args:
+        fresh: 强制重新计算（不使用最近写入的合并结果，只与正在进行的计算合并）
+    """
+    return await calculation_flight.do(
+        f"{gathering_code}:{version}",
+        lambda: _compute_recommendations(gathering, gathering_code, preferences),
+        fresh=fresh
+    )
+
+
+def _latest_key(gathering_code: str) -> str:
+    return f"recommend:latest:{gathering_code}"
+
+
+async def _load_latest(gathering_code: str, version: str) -> Optional[Tuple[int, str]]:
+    """
+    读取最近一次计算的推荐结果
+
+    Args:
+        gathering_code: 邀请码
+        version: 当前参与者状态版本
+
+    Returns:
+        (推荐结果版本号, 序列化后的响应体)；没有结果或结果不是按当前参与者状态计算的时返回None
+    """
+    redis = get_redis()
+    if not redis:
+        return None
+    try:
+        participant_version_, result_version, body = await redis.hmget(
+            _latest_key(gathering_code), "participant_version", "version", "body"
+        )
+    except Exception as e:
+        logger.warning(f"Failed to load latest recommendations for {gathering_code}: {e}")
+        return None
+    if participant_version_ != version or body is None:
+        return None
+    return int(result_version), body
+
+
+async def _latest_versions(gathering_code: str) -> Optional[Tuple[int, int]]:
+    """
+    最近一次计算的推荐结果版本号，以及计算时读取的聚会版本号（只读 Redis）
+
+    Returns:
+        (推荐结果版本号, 聚会版本号)；没有结果或 Redis 不可用时返回None
+    """
+    redis = get_redis()
+    if not redis:
+        return None
+    try:
+        result_version, gathering_version = await redis.hmget(
+            _latest_key(gathering_code), "version", "gathering_version"
+        )
+    except Exception as e:
+        logger.warning(f"Failed to load latest recommendations version for {gathering_code}: {e}")
+        return None
+    if result_version is None or gathering_version is None:
+        return None
+    return int(result_version), int(gathering_version)
+
+
+async def latest_recommendations(gathering_code: str) -> Optional[Tuple[int, List[dict]]]:
+    """
+    最近一次计算的推荐结果（实时连接重连时补发）
+
+    Returns:
+        (推荐结果版本号, 推荐列表)；没有结果或 Redis 不可用时返回None
+    """
+    redis = get_redis()
+    if not redis:
+        return None
+    try:
+        result_version, body = await redis.hmget(_latest_key(gathering_code), "version", "body")
+    except Exception as e:
+        logger.warning(f"Failed to load latest recommendations for {gathering_code}: {e}")
+        return None
+    if result_version is None or body is None:
+        return None
+    return int(result_version), orjson.loads(body)["data"]
+
+
+async def _store_latest(gathering_code: str, result: dict, gathering_version: int):
+    """
+    保存最近一次计算的推荐结果：推荐结果版本号、参与者状态版本和序列化后的响应体
+
+    Args:
+        gathering_version: 计算时读取的聚会版本号（聚会此后没有修改时条件请求可直接返回 304）
+    """
+    redis = get_redis()
+    if not redis:
+        return
+    key = _latest_key(gathering_code)
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={
+                "version": result["version"],
+                "gathering_version": gathering_version,
+                "participant_version": result["participant_version"],
+                "body": orjson.dumps(result)
+            })
+            pipe.expire(key, settings.RECOMMENDATION_RESULT_TTL)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to store latest recommendations for {gathering_code}: {e}")
+
+
+async def _compute_recommendations(gathering: Gathering, gathering_code: str, preferences: Optional[dict]) -> dict:
+    """
+    计算推荐地点并写入数据库
+    """
+    # 过滤出有位置信息的参与者
+    valid_participants = [p for p in gathering.participants if p.location]
+    
+    if len(valid_participants) < 2:
+        return {
+            "success": False,
+            "message": "需要至少2个人的位置信息才能推荐",
+            "data": []
+        }
+    
+    # 获取地图服务
+    map_service = get_map_service()
+    
+    # 搜索附近的候选地点
+    keyword_map = {
+        "meal": "餐厅",
+        "coffee": "咖啡厅",
+        "movie": "电影院",
+        "ktv": "KTV",
+        "other": "商场"
+    }
+    keyword = keyword_map.get(gathering.type.value, "餐厅")
+    
+    # 搜索中心：优化后的整体中心（参与者分散时还包括各簇中心）
+    centers = search_centers(valid_participants)
+    center_point = centers[0]
+
+    # 候选地点按聚会固定：搜索中心漂移不超过阈值时沿用上次的候选集合，否则重新并发搜索并去重
+    scoring_state = scoring_states.get(gathering_code)
+    if scoring_state is None or not scoring_state.covers(centers, keyword, settings.CANDIDATE_RECENTER_KM):
+        _, candidate_places = await generate_candidates(
+            map_service=map_service,
+            participants=valid_participants,
+            keyword=keyword,
+            radius=3000,
+            centers=centers
+        )
+        scoring_state = GatheringScoringState(candidate_places, centers, keyword)
+        # 搜索失败（没有候选）时不固定，下次重新搜索
+        if candidate_places:
+            scoring_states.put(gathering_code, scoring_state)
+    
+    # 使用增量打分状态计算：只计算新增/变化的参与者
+    computed = scoring_state.sync(valid_participants)
+    logger.debug(f"Gathering {gathering_code}: recomputed {computed}/{len(valid_participants)} participant rows")
+    recommendations = scoring_state.recommend(max_results=5)
+    
+    # 根据偏好过滤
+    if preferences:
+        recommendations = RecommendationEngine.filter_by_preferences(
+            recommendations=recommendations,
+            preferences=preferences
+        )
+
+    # 入选地点的通勤数据改用路线接口的真实值
+    if settings.ROUTED_TRAVEL_TIMES:
+        await apply_routed_times(map_service, scoring_state.participants, recommendations)
+    
+    # 只转换一次，写入数据库、推送、响应和缓存共用
+    data = [r.to_dict() for r in recommendations]
+
+    # 更新数据库中的推荐结果（同时写回聚会缓存）
+    saved = await gathering_repository.set_recommendations(gathering_code, data)
+
+    # 推送完整推荐结果（含各参与者通勤明细）给订阅该聚会的连接
+    if saved:
+        await gathering_hub.publish(gathering_code, encode_event("recommendations", saved.recommendations_version, data))
+    
+    result = {
+        "success": True,
+        "data": data,
+        "center_point": {
+            "lat": center_point[0],
+            "lng": center_point[1]
+        },
+        "participant_count": len(valid_participants),
+        "version": saved.recommendations_version if saved else gathering.recommendations_version,
+        "participant_version": participant_version(gathering, preferences)
+    }
+
+    # 按偏好筛选的结果不覆盖默认推荐
+    if not preferences:
+        await _store_latest(gathering_code, result, gathering.version)
+    return result
+
 @router.get("/mock/{gathering_code}")
 async def get_mock_recommendations(gathering_code: str):
     """
@@ -261,18 +505,26 @@ async def get_mock_recommendations(gathering_code: str):
 @router.post("/refresh/{gathering_code}")
 async def refresh_recommendations(gathering_code: str):
     """
-    刷新推荐结果
+    刷新推荐结果（地图请求使用后台优先级，不与计算推荐的交互请求争抢配额）
     """
     try:
+        gathering_code = gathering_code.upper()
+        gathering = await gathering_repository.get_for_calculation(gathering_code)
+        if not gathering:
+            raise HTTPException(status_code=404, detail="聚会不存在")
+
         # 重新计算推荐
-        result = await calculate_recommendations(gathering_code)
+        with quota_priority(PRIORITY_BACKGROUND):
+            result = await _calculate(gathering, gathering_code, None, participant_version(gathering), fresh=True)
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "message": "推荐结果已更新",
             "data": result["data"]
-        }
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to refresh recommendations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -24,12 +24,75 @@ class Settings(BaseSettings):
     TENCENT_MAP_KEY: Optional[str] = None
     TENCENT_MAP_SK: Optional[str] = None  # 腾讯地图SK密钥（用于签名校验）
     AMAP_KEY: Optional[str] = None
+    MAP_PROVIDER: Optional[str] = None  # 设为 fake 时使用本地确定性地图服务（测试/离线开发），设为 local 时只用本地POI数据集
+    POI_DATASET_PATH: Optional[str] = None  # 本地POI数据集（.ybpoi/.csv/.parquet），配置后地点搜索优先使用本地索引
+    POI_INDEX_CELL_DEG: float = 0.01  # 本地POI空间索引的网格大小（度）
+
+    # 地图API配额（每个Key的QPS和每日调用量，0表示不限）
+    TENCENT_MAP_QPS: float = 5
+    TENCENT_MAP_DAILY_QUOTA: int = 10000
+    AMAP_QPS: float = 3
+    AMAP_DAILY_QUOTA: int = 5000
+    QUOTA_MAX_WAIT: float = 1.0  # 交互请求等待配额的最长时间（秒），后台请求为其5倍
+    QUOTA_BACKGROUND_RESERVE: float = 0.2  # 为交互请求预留的令牌和每日额度比例
+
+    # 地图服务商熔断与对冲请求（同时配置腾讯和高德时生效）
+    MAP_BREAKER_FAILURES: int = 5  # 连续失败多少次后熔断
+    MAP_BREAKER_RESET_SECONDS: float = 30.0  # 熔断后多久放行探测请求（秒）
+    MAP_HEDGE_DEFAULT_DELAY: float = 0.8  # 延迟样本不足时发起对冲请求的等待时间（秒）
+    MAP_HEDGE_MIN_DELAY: float = 0.1  # 对冲请求最短等待时间（秒）
+
+    # 地图API HTTP连接池配置
+    MAP_HTTP2: bool = True  # 启用HTTP/2（需要安装h2）
+    MAP_HTTP_MAX_CONNECTIONS: int = 100  # 连接池最大连接数
+    MAP_HTTP_MAX_KEEPALIVE: int = 20  # 最多保持的空闲长连接数
+    MAP_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # 空闲长连接保持时间（秒）
+    MAP_HTTP_PER_HOST_CONCURRENCY: int = 20  # 每个域名的最大并发请求数
+    MAP_HTTP_CONNECT_TIMEOUT: float = 2.0  # 连接超时（秒）
+    MAP_HTTP_READ_TIMEOUT: float = 5.0  # 读取超时（秒）
+    MAP_HTTP_RETRIES: int = 2  # GET请求最多重试次数
+    MAP_HTTP_RETRY_BACKOFF: float = 0.2  # 重试退避基准时间（秒）
     
     # 业务配置
     GATHERING_EXPIRE_HOURS: int = 24
     MAX_PARTICIPANTS: int = 20
     SEARCH_RADIUS: int = 5000  # 米
     MAX_RECOMMENDATIONS: int = 10
+    CENTER_OBJECTIVE: str = "fairness"  # 搜索中心优化目标: mean/geometric_median/minimax/fairness
+    CENTER_MAX_ITERATIONS: int = 50  # 中心点优化最大迭代次数
+    CENTER_FAIRNESS_PENALTY: float = 1.0  # fairness目标中耗时标准差的惩罚系数
+    CANDIDATE_MAX_CLUSTERS: int = 3  # 候选生成时参与者最多分成的簇数
+    CANDIDATE_CLUSTER_SEPARATION_KM: float = 5.0  # 簇中心之间的最小距离（公里）
+    CANDIDATE_DEDUP_METERS: int = 30  # 合并候选时视为同一地点的距离（米）
+    CANDIDATE_RECENTER_KM: float = 1.0  # 搜索中心漂移超过该距离时重新搜索候选地点（公里）
+    CALIBRATION_CELL_DEG: float = 0.05  # 通勤时间校准的区域网格大小（度）
+    CALIBRATION_MIN_SAMPLES: int = 5  # 拟合修正系数所需的最少样本数
+    CALIBRATION_MAX_SAMPLES: int = 20000  # 内存中保留的最多样本数
+    CALIBRATION_REFIT_SECONDS: int = 300  # 后台拟合间隔（秒）
+    ROUTE_CACHE_PRECISION: int = 7  # 路线缓存的 geohash 精度（7约150米）
+    ROUTE_CACHE_BUCKET_HOURS: int = 3  # 路线缓存的出发时段分桶（小时）
+    ROUTE_CACHE_TTL: int = 6 * 3600  # 路线缓存过期时间（秒）
+    ROUTE_CACHE_LOCAL_SIZE: int = 50000  # 进程内路线缓存条目数
+    POI_CACHE_PRECISION: int = 6  # POI缓存的 geohash 精度（6约1公里）
+    POI_CACHE_FRESH_TTL: int = 600  # POI缓存新鲜期（秒），过期后先返回旧数据再后台刷新
+    POI_CACHE_STALE_TTL: int = 24 * 3600  # 过期数据最多保留时间（秒）
+    POI_CACHE_NEGATIVE_TTL: int = 60  # 空结果和接口错误的缓存时间（秒）
+    GEOCODE_CACHE_TTL: int = 30 * 24 * 3600  # 地理编码结果缓存时间（秒）
+    GEOCODE_NEGATIVE_TTL: int = 3600  # 未找到的地址缓存时间（秒）
+    GEOCODE_CACHE_LOCAL_SIZE: int = 20000  # 进程内地理编码缓存条目数
+    GEOCODE_BATCH_MAX: int = 100  # 批量地理编码单次最多地址数
+    GEOCODE_BATCH_CONCURRENCY: int = 8  # 批量地理编码同时请求地图服务的数量
+    REVERSE_GEOCODE_DISTRICTS_PATH: Optional[str] = None  # 区县边界 GeoJSON（属性 name/city/province）
+    REVERSE_GEOCODE_STREETS_PATH: Optional[str] = None  # 街道/乡镇边界 GeoJSON（属性 name）
+    REVERSE_GEOCODE_CELL_DEG: float = 0.05  # 边界网格索引的网格大小（度）
+    GATHERING_CACHE_TTL: int = 3600  # 聚会详情缓存时间（秒）
+    GATHERING_CACHE_BETA: float = 1.0  # 聚会缓存提前刷新系数（XFetch）
+    REALTIME_SEND_TIMEOUT: float = 5.0  # 实时推送单个连接的发送超时（秒）
+    RECOMPUTE_DEBOUNCE_SECONDS: float = 2.0  # 参与者最后一次变化后多久重算推荐（秒）
+    RECOMPUTE_CONCURRENCY: int = 4  # 每个进程同时重算的聚会数
+    RECOMMENDATION_RESULT_TTL: int = 24 * 3600  # 预计算推荐结果保留时间（秒）
+    ROUTED_TRAVEL_TIMES: bool = True  # 推荐结果的通勤时间使用路线接口的真实值（同时作为校准样本）
+    SCORING_STATE_CACHE_SIZE: int = 1000  # 每个进程缓存的聚会打分状态数
     
     class Config:
         env_file = ".env"
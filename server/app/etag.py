@@ -0,0 +1,34 @@
+"""
+ETag 条件请求
+
+聚会的 ETag 由聚会版本号生成（每次修改递增），推荐结果的 ETag 由推荐结果版本号生成
+（每次保存推荐结果递增，保存推荐结果不改变聚会版本号），客户端带 If-None-Match 请求且版本未变时返回 304。
+"""
+from typing import Optional
+from fastapi import Response
+
+
+def gathering_etag(version: int) -> str:
+    """聚会详情的 ETag"""
+    return f'"g-{version}"'
+
+
+def recommendations_etag(version: int) -> str:
+    """推荐结果的 ETag（推荐结果版本号）"""
+    return f'"r-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否包含该 ETag（弱比较，支持多个值和 *）"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """304 响应"""
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,47 @@
+"""
+将POI数据导出（CSV/Parquet）转换为内存映射的列存储文件
+
+用法:
+    python build_poi_store.py pois.csv data/pois.ybpoi [--cell-deg 0.01]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from services.local_poi import POIIndex, read_poi_records, load_poi_index
+from services.poi_store import POI_STORE_SUFFIX, write_poi_store
+from app.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建POI列存储文件")
+    parser.add_argument("source", help="POI数据导出文件（.csv/.parquet）")
+    parser.add_argument("output", help=f"输出文件（{POI_STORE_SUFFIX}）")
+    parser.add_argument("--cell-deg", type=float, default=settings.POI_INDEX_CELL_DEG, help="空间索引网格大小（度）")
+    args = parser.parse_args()
+
+    if not args.output.endswith(POI_STORE_SUFFIX):
+        parser.error(f"output file must end with {POI_STORE_SUFFIX}")
+
+    started = time.time()
+    records = read_poi_records(args.source)
+    index = POIIndex.from_records(records, args.cell_deg)
+    print(f"读取 {len(records)} 条记录，有效地点 {len(index)} 个，类别 {len(index.categories)} 种")
+
+    write_poi_store(index, args.output)
+    size_mb = Path(args.output).stat().st_size / 1024 / 1024
+    print(f"已写入 {args.output}（{size_mb:.1f} MB，耗时 {time.time() - started:.1f} 秒）")
+
+    # 校验：重新映射打开并比对地点数
+    started = time.time()
+    mapped = load_poi_index(args.output)
+    assert len(mapped) == len(index)
+    print(f"校验通过，打开耗时 {(time.time() - started) * 1000:.1f} 毫秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,166 @@
 """
 核心推荐算法
 """
-import traceback
-import sys
 import numpy as np
 from typing import List, Dict, Tuple
 from geopy.distance import geodesic
-from models.gathering import Location, Participant, RecommendationItem, ParticipantDistance
+from models.gathering import Location, Participant
+from core.results import ScoredParticipant, ScoredPlace
+from core.calibration import travel_time_calibrator
+from core.geo import SPEED_MAP, DEFAULT_SPEED, ROUTE_FACTOR, haversine_matrix, speed_vector
+from app.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 每度纬度/经度（赤道处）对应的公里数，用于局部平面投影
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG = 111.320
+
+# 中心点优化的收敛阈值（公里）
+CENTER_TOLERANCE_KM = 1e-3
+
+
+def _project(points: np.ndarray, origin: np.ndarray) -> np.ndarray:
+    """将 (纬度, 经度) 投影到以 origin 为原点的局部平面（公里）"""
+    scale = np.array([KM_PER_DEG_LAT, KM_PER_DEG_LNG * np.cos(np.radians(origin[0]))])
+    return (points - origin) * scale
+
+
+def _unproject(xy: np.ndarray, origin: np.ndarray) -> np.ndarray:
+    """将局部平面坐标（公里）还原为 (纬度, 经度)"""
+    scale = np.array([KM_PER_DEG_LAT, KM_PER_DEG_LNG * np.cos(np.radians(origin[0]))])
+    return xy / scale + origin
+
+
+def _weiszfeld(xy: np.ndarray, weights: np.ndarray, max_iterations: int) -> np.ndarray:
+    """
+    Weiszfeld 迭代求加权几何中位数（使 Σ w_i·|x - p_i| 最小）
+
+    Args:
+        xy: 参与者平面坐标，形状 (N, 2)
+        weights: 每个参与者的权重（单位距离耗时），形状 (N,)
+        max_iterations: 最大迭代次数
+
+    Returns:
+        中心点平面坐标
+    """
+    x = np.average(xy, axis=0, weights=weights)
+    for _ in range(max_iterations):
+        d = np.maximum(np.linalg.norm(xy - x, axis=1), 1e-9)
+        inv = weights / d
+        x_next = (inv[:, np.newaxis] * xy).sum(axis=0) / inv.sum()
+        if np.linalg.norm(x_next - x) < CENTER_TOLERANCE_KM:
+            return x_next
+        x = x_next
+    return x
+
+
+def _minimax_center(xy: np.ndarray, weights: np.ndarray, start: np.ndarray, max_iterations: int) -> np.ndarray:
+    """
+    近似求加权最小最大中心（使 max_i w_i·|x - p_i| 最小）
+
+    Badoiu-Clarkson 迭代：每步向当前耗时最长的参与者移动 1/(k+1) 的距离，保留最优解。
+
+    Args:
+        xy: 参与者平面坐标，形状 (N, 2)
+        weights: 每个参与者的权重（单位距离耗时），形状 (N,)
+        start: 初始点
+        max_iterations: 最大迭代次数
+
+    Returns:
+        中心点平面坐标
+    """
+    x = start
+    best, best_cost = x, np.inf
+    for k in range(1, max_iterations + 1):
+        cost = weights * np.linalg.norm(xy - x, axis=1)
+        worst = int(np.argmax(cost))
+        if cost[worst] < best_cost:
+            best, best_cost = x, cost[worst]
+        x = x + (xy[worst] - x) / (k + 1)
+    return best
+
+
+def _fair_center(
+    xy: np.ndarray,
+    weights: np.ndarray,
+    start: np.ndarray,
+    penalty: float,
+    max_iterations: int
+) -> np.ndarray:
+    """
+    梯度下降求 平均耗时 + penalty × 耗时标准差 最小的中心点
+
+    Args:
+        xy: 参与者平面坐标，形状 (N, 2)
+        weights: 每个参与者的权重（单位距离耗时），形状 (N,)
+        start: 初始点
+        penalty: 公平性惩罚系数
+        max_iterations: 最大迭代次数
+
+    Returns:
+        中心点平面坐标
+    """
+    def cost_and_grad(x):
+        diff = x - xy
+        d = np.maximum(np.linalg.norm(diff, axis=1), 1e-9)
+        t = weights * d
+        dt = (weights / d)[:, np.newaxis] * diff
+        mean, std = t.mean(), t.std()
+        grad = dt.mean(axis=0)
+        if std > 0:
+            grad = grad + penalty * ((t - mean)[:, np.newaxis] * dt).mean(axis=0) / std
+        return mean + penalty * std, grad
+
+    x = start
+    cost, grad = cost_and_grad(x)
+    step = max(np.linalg.norm(xy - x, axis=1).mean() / 2, CENTER_TOLERANCE_KM)
+    for _ in range(max_iterations):
+        norm = np.linalg.norm(grad)
+        if norm == 0 or step < CENTER_TOLERANCE_KM:
+            break
+        x_next = x - step * grad / norm
+        next_cost, next_grad = cost_and_grad(x_next)
+        if next_cost < cost:
+            x, cost, grad = x_next, next_cost, next_grad
+        else:
+            step /= 2
+    return x
+
+
+def _kmeans(xy: np.ndarray, k: int, max_iterations: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    小规模 k-means（最远点初始化，结果确定）
+
+    Args:
+        xy: 平面坐标，形状 (N, 2)
+        k: 簇数
+        max_iterations: 最大迭代次数
+
+    Returns:
+        (簇中心 (k, 2), 每个点所属簇的下标 (N,))
+    """
+    centers = [xy.mean(axis=0)]
+    for _ in range(1, k):
+        d = np.min(np.linalg.norm(xy[:, np.newaxis, :] - np.array(centers)[np.newaxis], axis=2), axis=1)
+        centers.append(xy[int(np.argmax(d))])
+    centers = np.array(centers)
+
+    labels = np.zeros(len(xy), dtype=np.intp)
+    for _ in range(max_iterations):
+        d = np.linalg.norm(xy[:, np.newaxis, :] - centers[np.newaxis], axis=2)
+        labels = np.argmin(d, axis=1)
+        new_centers = np.array([
+            xy[labels == c].mean(axis=0) if np.any(labels == c) else centers[c]
+            for c in range(k)
+        ])
+        if np.allclose(new_centers, centers, atol=CENTER_TOLERANCE_KM):
+            break
+        centers = new_centers
+    return centers, labels
+
+
 class RecommendationEngine:
     """推荐引擎"""
     
@@ -67,6 +217,108 @@ class RecommendationEngine:
         
         return (center_lat, center_lng)
     
+    @staticmethod
+    def optimize_center(
+        participants: List[Participant],
+        objective: str = None,
+        max_iterations: int = None
+    ) -> Tuple[float, float]:
+        """
+        按目标函数优化搜索中心点（考虑交通方式，以通勤时间而非距离衡量）
+
+        支持的目标：
+            mean: 经纬度算术平均（与 calculate_center_point 相同）
+            geometric_median: 总通勤时间最小（加权 Weiszfeld）
+            minimax: 最长通勤时间最小
+            fairness: 平均通勤时间 + 公平性惩罚（标准差）最小
+
+        Args:
+            participants: 参与者列表
+            objective: 优化目标，默认取配置 CENTER_OBJECTIVE
+            max_iterations: 最大迭代次数，默认取配置 CENTER_MAX_ITERATIONS
+
+        Returns:
+            (纬度, 经度)
+        """
+        valid_participants = [p for p in participants if p.location]
+        if not valid_participants:
+            return None
+
+        objective = objective or settings.CENTER_OBJECTIVE
+        max_iterations = max_iterations or settings.CENTER_MAX_ITERATIONS
+
+        points = np.array(
+            [(p.location.lat, p.location.lng) for p in valid_participants],
+            dtype=np.float64
+        )
+        origin = points.mean(axis=0)
+        if objective == "mean" or len(points) < 2:
+            return (float(origin[0]), float(origin[1]))
+
+        # 权重为单位距离耗时，使优化目标与通勤时间成正比
+        weights = 1.0 / speed_vector([p.transport for p in valid_participants])
+        weights = weights / weights.max()
+        xy = _project(points, origin)
+
+        center = _weiszfeld(xy, weights, max_iterations)
+        if objective == "minimax":
+            center = _minimax_center(xy, weights, center, max_iterations)
+        elif objective == "fairness":
+            center = _fair_center(xy, weights, center, settings.CENTER_FAIRNESS_PENALTY, max_iterations)
+        elif objective != "geometric_median":
+            logger.warning(f"Unknown center objective '{objective}', using geometric_median")
+
+        lat, lng = _unproject(center, origin)
+        return (float(lat), float(lng))
+
+    @staticmethod
+    def cluster_participants(
+        participants: List[Participant],
+        max_clusters: int = None,
+        min_separation_km: float = None
+    ) -> List[List[Participant]]:
+        """
+        将地理上分散的参与者聚成若干簇（如一半在海淀、一半在朝阳）
+
+        依次尝试 k=2..max_clusters，只有当各簇中心两两距离都不小于
+        min_separation_km 且簇内误差比 k-1 时至少减半，才接受更多的簇。
+
+        Args:
+            participants: 参与者列表
+            max_clusters: 最多簇数，默认取配置 CANDIDATE_MAX_CLUSTERS
+            min_separation_km: 簇中心之间的最小距离（公里），默认取配置 CANDIDATE_CLUSTER_SEPARATION_KM
+
+        Returns:
+            参与者分簇列表，不需要分簇时只有一个簇
+        """
+        valid_participants = [p for p in participants if p.location]
+        max_clusters = max_clusters or settings.CANDIDATE_MAX_CLUSTERS
+        min_separation_km = min_separation_km or settings.CANDIDATE_CLUSTER_SEPARATION_KM
+        if len(valid_participants) < 2 or max_clusters < 2:
+            return [valid_participants]
+
+        points = np.array(
+            [(p.location.lat, p.location.lng) for p in valid_participants],
+            dtype=np.float64
+        )
+        xy = _project(points, points.mean(axis=0))
+
+        labels = np.zeros(len(xy), dtype=np.intp)
+        inertia = np.sum((xy - xy.mean(axis=0)) ** 2)
+        for k in range(2, min(max_clusters, len(xy)) + 1):
+            centers, k_labels = _kmeans(xy, k, settings.CENTER_MAX_ITERATIONS)
+            separation = np.linalg.norm(centers[:, np.newaxis] - centers[np.newaxis], axis=2)
+            separation = separation[np.triu_indices(k, 1)].min()
+            k_inertia = np.sum((xy - centers[k_labels]) ** 2)
+            if separation < min_separation_km or k_inertia > inertia / 2:
+                break
+            labels, inertia = k_labels, k_inertia
+
+        return [
+            [p for p, label in zip(valid_participants, labels) if label == c]
+            for c in np.unique(labels)
+        ]
+
     @staticmethod
     def calculate_distance(from_location: Location, to_location: Location) -> float:
         """
@@ -106,17 +358,10 @@ class RecommendationEngine:
         ).kilometers
 
         # 根据交通方式估算速度（km/h）
-        speed_map = {
-            "driving": 30,  # 城市驾车平均速度
-            "transit": 25,  # 公共交通平均速度
-            "walking": 5,   # 步行速度
-            "cycling": 15   # 骑行速度
-        }
-
-        speed = speed_map.get(transport, 25)
+        speed = SPEED_MAP.get(transport, DEFAULT_SPEED)
 
         # 添加一些随机因素模拟实际路况（实际应该调用地图API）
-        time_minutes = (distance_km / speed) * 60 * 1.3  # 1.3是经验系数
+        time_minutes = (distance_km / speed) * 60 * ROUTE_FACTOR
 
         return round(time_minutes, 1)
     
@@ -190,7 +435,7 @@ class RecommendationEngine:
 
                 # 构建参与者距离信息
                 participant_distances.append(
-                    ParticipantDistance(
+                    ScoredParticipant(
                         temp_id=p.temp_id,
                         nickname=p.nickname or "匿名",
                         distance=distance,
@@ -242,14 +487,285 @@ class RecommendationEngine:
             "participant_distances": participant_distances
         }
     
+    @staticmethod
+    def candidate_arrays(candidate_locations: List[Dict]) -> Dict[str, np.ndarray]:
+        """
+        将候选地点列表转换为列数组
+
+        Args:
+            candidate_locations: 候选地点列表
+
+        Returns:
+            {"coords": (M, 2), "rating": (M,), "price_level": (M,)}，缺失的评分/价格记为0
+        """
+        coords = np.array(
+            [(c["lat"], c["lng"]) for c in candidate_locations],
+            dtype=np.float64
+        ).reshape(-1, 2)
+        ratings = np.array(
+            [float(c.get("rating") or 0) for c in candidate_locations],
+            dtype=np.float64
+        )
+        price_levels = np.array(
+            [float(c.get("price_level") or 0) for c in candidate_locations],
+            dtype=np.float64
+        )
+        return {"coords": coords, "rating": ratings, "price_level": price_levels}
+
+    @staticmethod
+    def build_matrices(participants: List[Participant], coords: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        一次性计算 参与者×候选地点 的距离矩阵和通勤时间矩阵
+
+        通勤时间按交通方式速度估算，并乘以校准器给出的（区域网格、时段）修正系数。
+
+        Args:
+            participants: 有位置信息的参与者列表
+            coords: 候选地点坐标，形状 (M, 2)
+
+        Returns:
+            (距离矩阵（公里）, 通勤时间矩阵（分钟）)，形状均为 (N, M)
+        """
+        origins = np.array(
+            [(p.location.lat, p.location.lng) for p in participants],
+            dtype=np.float64
+        ).reshape(-1, 2)
+        transports = [p.transport for p in participants]
+        speeds = speed_vector(transports)
+        factors = travel_time_calibrator.factors(origins, transports)
+
+        distance_km = haversine_matrix(origins, coords)
+        travel_time = distance_km * (factors / speeds * 60 * ROUTE_FACTOR)[:, np.newaxis]
+
+        return distance_km, travel_time
+
+    @staticmethod
+    def aggregate_scores(
+        travel_time: np.ndarray,
+        ratings: np.ndarray,
+        price_levels: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        由通勤时间矩阵按列计算平均时间、公平性和综合得分
+
+        与 score_location 的打分规则一致：通勤时间先保留1位小数再聚合，
+        公平性为 100*(1-变异系数)，权重为 公平性40% / 时间30% / 评分20% / 价格10%。
+
+        Args:
+            travel_time: 通勤时间矩阵（分钟），形状 (N, M)
+            ratings: 候选地点评分，形状 (M,)，0表示无评分
+            price_levels: 候选地点价格等级，形状 (M,)，0表示无价格
+
+        Returns:
+            {"avg_travel_time", "fairness_score", "total_score"}，形状均为 (M,)
+        """
+        rounded = np.round(travel_time, 1)
+        avg_time = rounded.mean(axis=0)
+        std_time = rounded.std(axis=0)
+
+        # 变异系数（标准差/平均值），平均时间为0时公平性记满分
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cv = np.where(avg_time > 0, std_time / avg_time, 0.0)
+        fairness = np.round(np.maximum(0.0, 100 * (1 - cv)), 2)
+
+        total = fairness * 0.4 + np.maximum(0.0, 100 - avg_time) * 0.3
+        total = total + np.where(ratings > 0, ratings / 5 * 100 * 0.2, 0.0)
+        total = total + np.where(price_levels > 0, np.maximum(0.0, 100 - price_levels * 20) * 0.1, 0.0)
+
+        return {
+            "avg_travel_time": avg_time,
+            "fairness_score": fairness,
+            "total_score": np.round(total, 2)
+        }
+
+    @staticmethod
+    def score_matrices(
+        participants: List[Participant],
+        arrays: Dict[str, np.ndarray],
+        distance_km: np.ndarray,
+        travel_time: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        由已有的距离/通勤时间矩阵计算各项得分
+
+        Args:
+            participants: 有位置信息的参与者列表（与矩阵行顺序一致）
+            arrays: candidate_arrays 返回的候选列数组
+            distance_km: 距离矩阵（公里），形状 (N, M)
+            travel_time: 通勤时间矩阵（分钟），形状 (N, M)
+
+        Returns:
+            包含距离矩阵、通勤时间矩阵以及各项得分数组的字典
+        """
+        scores = RecommendationEngine.aggregate_scores(
+            travel_time, arrays["rating"], arrays["price_level"]
+        )
+
+        # 计算到中心点的距离（米）
+        center_point = RecommendationEngine.calculate_center_point(participants)
+        if center_point:
+            distance_from_center = haversine_matrix(np.array(center_point), arrays["coords"])[0] * 1000
+        else:
+            distance_from_center = np.zeros(len(arrays["coords"]))
+
+        scores.update({
+            "distance_km": distance_km,
+            "travel_time": travel_time,
+            "distance_from_center": distance_from_center
+        })
+        return scores
+
+    @staticmethod
+    def score_candidates(participants: List[Participant], candidate_locations: List[Dict]) -> Dict[str, np.ndarray]:
+        """
+        批量为所有候选地点打分（score_location 的向量化版本）
+
+        距离使用球面 haversine 公式代替 geopy 的 WGS-84 椭球 geodesic，
+        两者在城市尺度上的相对误差不超过 0.5%，因此单项通勤时间误差在
+        0.5% 以内、综合得分误差通常小于 0.3 分，排序仅在得分近乎并列时可能不同。
+
+        Args:
+            participants: 有位置信息的参与者列表
+            candidate_locations: 候选地点列表
+
+        Returns:
+            包含距离矩阵、通勤时间矩阵以及各项得分数组的字典
+        """
+        arrays = RecommendationEngine.candidate_arrays(candidate_locations)
+        distance_km, travel_time = RecommendationEngine.build_matrices(participants, arrays["coords"])
+        return RecommendationEngine.score_matrices(participants, arrays, distance_km, travel_time)
+
+    @staticmethod
+    def select_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        部分选择得分最高的k个候选（argpartition，O(M)），再仅对这k个排序
+
+        得分并列时按候选原始顺序排列，与对全部结果做稳定排序后截断的结果一致。
+
+        Args:
+            scores: 综合得分数组，形状 (M,)
+            k: 需要的结果数
+
+        Returns:
+            按得分从高到低排列的候选下标
+        """
+        m = len(scores)
+        if k <= 0 or m == 0:
+            return np.empty(0, dtype=np.intp)
+        if k >= m:
+            return np.argsort(-scores, kind="stable")
+
+        # 第k大的得分作为阈值，阈值上的并列项按原始顺序补足
+        kth = np.partition(scores, m - k)[m - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        selected = np.concatenate([above, ties])
+
+        return selected[np.argsort(-scores[selected], kind="stable")]
+
+    @staticmethod
+    def build_recommendation_item(
+        candidate: Dict,
+        participants: List[Participant],
+        distance_km: np.ndarray,
+        travel_time: np.ndarray,
+        avg_travel_time: float,
+        score: float,
+        distance_from_center: float
+    ) -> ScoredPlace:
+        """
+        为单个入选候选构建推荐项
+
+        Args:
+            candidate: 候选地点
+            participants: 参与者列表（与矩阵行顺序一致）
+            distance_km: 该候选对应的距离列（公里），形状 (N,)
+            travel_time: 该候选对应的通勤时间列（分钟），形状 (N,)
+            avg_travel_time: 平均通勤时间（分钟）
+            score: 综合得分
+            distance_from_center: 距中心点距离（米）
+
+        Returns:
+            推荐项
+        """
+        distances = np.round(distance_km, 1).tolist()
+        times = np.round(travel_time, 1).tolist()
+
+        participant_distances = [
+            ScoredParticipant(
+                temp_id=p.temp_id,
+                nickname=p.nickname or "匿名",
+                distance=distances[i],
+                travel_time=times[i],
+                transport_mode=p.transport or "driving"
+            )
+            for i, p in enumerate(participants)
+        ]
+
+        rating = candidate.get("rating")
+        price_level = candidate.get("price_level")
+
+        return ScoredPlace(
+            id=candidate.get("id", ""),
+            name=candidate.get("name", "未知地点"),
+            address=candidate.get("address", ""),
+            lat=float(candidate["lat"]),
+            lng=float(candidate["lng"]),
+            location_name=candidate.get("name", ""),
+            type=candidate.get("type", "restaurant"),
+            rating=float(rating) if rating is not None else None,
+            price_level=int(price_level) if price_level is not None else None,
+            avg_travel_time=round(avg_travel_time, 1),
+            travel_times={p.temp_id: times[i] for i, p in enumerate(participants)},
+            score=score,
+            distance_from_center=round(distance_from_center, 1),
+            participant_distances=participant_distances
+        )
+
+    @staticmethod
+    def materialize_top_k(
+        participants: List[Participant],
+        candidate_locations: List[Dict],
+        scores: Dict[str, np.ndarray],
+        max_results: int
+    ) -> List[ScoredPlace]:
+        """
+        从得分数组中选出前N个候选并构建推荐项
+
+        Args:
+            participants: 参与者列表（与矩阵行顺序一致）
+            candidate_locations: 候选地点列表
+            scores: score_matrices 返回的得分字典
+            max_results: 最多返回结果数
+
+        Returns:
+            推荐地点列表（按得分从高到低）
+        """
+        top = RecommendationEngine.select_top_k(scores["total_score"], max_results)
+
+        return [
+            RecommendationEngine.build_recommendation_item(
+                candidate=candidate_locations[j],
+                participants=participants,
+                distance_km=scores["distance_km"][:, j],
+                travel_time=scores["travel_time"][:, j],
+                avg_travel_time=float(scores["avg_travel_time"][j]),
+                score=float(scores["total_score"][j]),
+                distance_from_center=float(scores["distance_from_center"][j])
+            )
+            for j in top
+        ]
+
     @staticmethod
     def recommend_locations(
         participants: List[Participant],
         candidate_locations: List[Dict],
         max_results: int = 5
-    ) -> List[RecommendationItem]:
+    ) -> List[ScoredPlace]:
         """
         推荐最佳聚会地点
+
+        打分全程基于数组完成，只为最终返回的前N个候选构建结果对象（__slots__ 数据类，不做校验）。
         
         Args:
             participants: 参与者列表
@@ -257,64 +773,27 @@ class RecommendationEngine:
             max_results: 最多返回结果数
             
         Returns:
-            推荐地点列表
+            推荐地点列表（按得分从高到低）
         """
-        print(participants)
-        print(candidate_locations)
+        participants = [p for p in participants if p.location]
         if not participants or not candidate_locations:
             return []
         
-        # 为每个候选地点打分
-        scored_locations = []
         try:
-            pass
-            for candidate in candidate_locations:
-                location = Location(
-                    address=candidate.get("address", ""),
-                    lng=candidate["lng"],
-                    lat=candidate["lat"],
-                    name=candidate.get("name", "")
-                )
-                
-                score_result = RecommendationEngine.score_location(
-                    location=location,
-                    participants=participants,
-                    rating=candidate.get("rating"),
-                    price_level=candidate.get("price_level")
-                )
-                
-                # 创建推荐项
-                recommendation = RecommendationItem(
-                    id=candidate.get("id", ""),
-                    name=candidate.get("name", "未知地点"),
-                    address=candidate.get("address", ""),
-                    location=location,
-                    type=candidate.get("type", "restaurant"),
-                    rating=candidate.get("rating"),
-                    price_level=candidate.get("price_level"),
-                    avg_travel_time=score_result["avg_travel_time"],
-                    travel_times=score_result["travel_times"],
-                    score=score_result["total_score"],
-                    distance_from_center=score_result["distance_from_center"],
-                    participant_distances=score_result["participant_distances"]
-                )
-
-                scored_locations.append(recommendation)
-        
-
+            # 为所有候选地点批量打分
+            scores = RecommendationEngine.score_candidates(participants, candidate_locations)
+            return RecommendationEngine.materialize_top_k(
+                participants, candidate_locations, scores, max_results
+            )
         except Exception as e:
-            traceback.print_exc()
-                # 按得分排序
-        scored_locations.sort(key=lambda x: x.score, reverse=True)
-        
-        # 返回前N个结果
-        return scored_locations[:max_results]
+            logger.exception(f"Failed to score candidate locations: {e}")
+            return []
     
     @staticmethod
     def filter_by_preferences(
-        recommendations: List[RecommendationItem],
+        recommendations: List[ScoredPlace],
         preferences: Dict
-    ) -> List[RecommendationItem]:
+    ) -> List[ScoredPlace]:
         """
         根据偏好过滤推荐结果
         
@@ -0,0 +1,261 @@
+"""
+通勤时间校准
+
+记录地图路线API返回的真实耗时样本（直线距离、交通方式、时段、区域网格 → 耗时），
+后台定期拟合每个 (交通方式, 区域网格, 小时) 的速度修正系数，
+打分引擎在估算通勤时间时查表使用，热路径上不需要调用路线API。
+
+样本先记在本进程内，拟合前追加到 Redis 列表并读回全部样本，各 worker 基于同一份样本拟合；
+Redis 不可用时每个进程只用自己记录的样本校准。
+"""
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import List, Dict, Tuple, Optional
+import numpy as np
+from core.geo import SPEED_MAP, DEFAULT_SPEED, ROUTE_FACTOR, haversine_matrix, normalize_mode
+from app.database import get_redis
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 有效样本的比值范围（实际耗时/估算耗时），超出视为异常数据
+MIN_RATIO = 0.2
+MAX_RATIO = 10.0
+
+# 直线距离过短的样本噪声大，不参与校准（公里）
+MIN_SAMPLE_DISTANCE_KM = 0.3
+
+# 各 worker 共享的样本列表
+SAMPLES_KEY = "calibration:samples"
+
+
+class TravelTimeCalibrator:
+    """通勤时间校准器"""
+
+    def __init__(
+        self,
+        cell_deg: float = 0.05,
+        min_samples: int = 5,
+        max_samples: int = 20000
+    ):
+        self.cell_deg = cell_deg
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+
+        # 样本: (交通方式, 网格纬度下标, 网格经度下标, 小时, 实际耗时/估算耗时)
+        self._samples: deque = deque(maxlen=max_samples)
+        # 尚未写入 Redis 的样本
+        self._pending: List[Tuple] = []
+
+        # 查找表: 交通方式 -> 全局系数；(交通方式, 网格, 小时) -> 系数
+        self._mode_factors: Dict[str, float] = {}
+        self._table: Dict[Tuple[str, int, int, int], float] = {}
+
+        # 每次拟合后递增，缓存的打分结果据此判断是否过期
+        self.version = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def cell_of(self, lat: float, lng: float) -> Tuple[int, int]:
+        """计算坐标所在的区域网格"""
+        return (int(np.floor(lat / self.cell_deg)), int(np.floor(lng / self.cell_deg)))
+
+    def record(
+        self,
+        from_point: Tuple[float, float],
+        to_point: Tuple[float, float],
+        mode: str,
+        duration: float,
+        hour: int = None
+    ):
+        """
+        记录一次路线API返回的真实耗时
+
+        Args:
+            from_point: 起点 (纬度, 经度)
+            to_point: 终点 (纬度, 经度)
+            mode: 出行方式
+            duration: 实际耗时（分钟）
+            hour: 出发时段（0-23），默认当前小时
+        """
+        if not duration:
+            return
+        self.record_matrix(
+            np.array([from_point]), np.array([to_point]), mode, np.array([[duration]], dtype=np.float64), hour
+        )
+
+    def record_matrix(
+        self,
+        origins: np.ndarray,
+        destinations: np.ndarray,
+        mode: str,
+        duration: np.ndarray,
+        hour: int = None
+    ):
+        """
+        记录批量距离接口返回的真实耗时矩阵（缺失的元素为NaN，跳过）
+
+        Args:
+            origins: 起点坐标，形状 (N, 2)
+            destinations: 终点坐标，形状 (M, 2)
+            mode: 出行方式
+            duration: 实际耗时矩阵（分钟），形状 (N, M)
+            hour: 出发时段（0-23），默认当前小时
+        """
+        mode = normalize_mode(mode)
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+        distance_km = haversine_matrix(origins, destinations)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            estimated = distance_km / SPEED_MAP.get(mode, DEFAULT_SPEED) * 60 * ROUTE_FACTOR
+            ratio = duration / estimated
+            valid = (distance_km >= MIN_SAMPLE_DISTANCE_KM) & (ratio >= MIN_RATIO) & (ratio <= MAX_RATIO)
+
+        hour = datetime.now().hour if hour is None else hour
+        for i, j in zip(*np.nonzero(valid)):
+            sample = (mode, *self.cell_of(*origins[i]), hour, float(ratio[i, j]))
+            self._samples.append(sample)
+            self._pending.append(sample)
+
+        # Redis 长时间不可用时不无限积累
+        if len(self._pending) > self.max_samples:
+            del self._pending[:len(self._pending) - self.max_samples]
+
+    async def sync_samples(self):
+        """把本进程新记录的样本追加到 Redis，并读回所有 worker 的样本（Redis 不可用时保持本进程样本）"""
+        redis = get_redis()
+        if not redis:
+            return
+
+        pending, self._pending = self._pending, []
+        try:
+            if pending:
+                await redis.rpush(SAMPLES_KEY, *(
+                    f"{mode},{cell_lat},{cell_lng},{hour},{ratio:.4f}"
+                    for mode, cell_lat, cell_lng, hour, ratio in pending
+                ))
+                await redis.ltrim(SAMPLES_KEY, -self.max_samples, -1)
+
+            samples = deque(maxlen=self.max_samples)
+            for item in await redis.lrange(SAMPLES_KEY, 0, -1):
+                mode, cell_lat, cell_lng, hour, ratio = item.split(",")
+                samples.append((mode, int(cell_lat), int(cell_lng), int(hour), float(ratio)))
+            self._samples = samples
+        except Exception as e:
+            # 未写入的样本留到下次
+            self._pending = pending + self._pending
+            logger.warning(f"Failed to sync travel time calibration samples: {e}")
+
+    def refit(self):
+        """根据已记录的样本重新拟合修正系数（网格系数向全局系数收缩），系数有变化时递增版本"""
+        if not self._samples:
+            return
+
+        groups: Dict[Tuple, List[float]] = {}
+        by_mode: Dict[str, List[float]] = {}
+        for mode, cell_lat, cell_lng, hour, ratio in self._samples:
+            groups.setdefault((mode, cell_lat, cell_lng, hour), []).append(ratio)
+            by_mode.setdefault(mode, []).append(ratio)
+
+        mode_factors = {
+            mode: float(np.median(ratios))
+            for mode, ratios in by_mode.items()
+            if len(ratios) >= self.min_samples
+        }
+
+        table = {}
+        for key, ratios in groups.items():
+            prior = mode_factors.get(key[0])
+            if prior is None:
+                continue
+            # 样本少的网格更多依赖全局系数
+            n = len(ratios)
+            table[key] = (n * float(np.median(ratios)) + self.min_samples * prior) / (n + self.min_samples)
+
+        # 系数未变化时不递增版本，缓存的打分结果继续有效
+        if mode_factors == self._mode_factors and table == self._table:
+            return
+
+        self._mode_factors = mode_factors
+        self._table = table
+        self.version += 1
+        logger.info(
+            f"Travel time calibration refit: {len(self._samples)} samples, "
+            f"{len(table)} cells, mode factors {mode_factors}"
+        )
+
+    def factors(self, origins: np.ndarray, transports: List[str], hour: int = None) -> np.ndarray:
+        """
+        查询每个起点的通勤时间修正系数
+
+        Args:
+            origins: 起点坐标，形状 (N, 2)
+            transports: 每个起点的交通方式
+            hour: 出发时段，默认当前小时
+
+        Returns:
+            修正系数数组，形状 (N,)，未校准时为1
+        """
+        if not self._mode_factors:
+            return np.ones(len(transports), dtype=np.float64)
+
+        hour = datetime.now().hour if hour is None else hour
+        result = np.empty(len(transports), dtype=np.float64)
+        for i, ((lat, lng), transport) in enumerate(zip(origins, transports)):
+            mode = normalize_mode(transport)
+            key = (mode, *self.cell_of(lat, lng), hour)
+            result[i] = self._table.get(key, self._mode_factors.get(mode, 1.0))
+        return result
+
+    def factor_key(self) -> Tuple[int, Optional[int]]:
+        """
+        当前修正系数的标识（拟合版本, 当前小时），变化时基于旧系数算出的通勤时间需要重算
+
+        未拟合出系数时 factors() 恒为1、与时段无关，小时记为None
+        """
+        return (self.version, datetime.now().hour if self._mode_factors else None)
+
+    def stats(self) -> Dict:
+        """校准状态"""
+        return {
+            "samples": len(self._samples),
+            "cells": len(self._table),
+            "mode_factors": dict(self._mode_factors),
+            "version": self.version
+        }
+
+    async def _run(self, interval: float):
+        """后台定期同步样本并拟合"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync_samples()
+                self.refit()
+            except Exception as e:
+                logger.error(f"Travel time calibration refit failed: {e}")
+
+    def start(self, interval: float = None):
+        """启动后台拟合任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(
+                self._run(interval or settings.CALIBRATION_REFIT_SECONDS)
+            )
+
+    async def stop(self):
+        """停止后台拟合任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 全局校准器
+travel_time_calibrator = TravelTimeCalibrator(
+    cell_deg=settings.CALIBRATION_CELL_DEG,
+    min_samples=settings.CALIBRATION_MIN_SAMPLES,
+    max_samples=settings.CALIBRATION_MAX_SAMPLES
+)
@@ -0,0 +1,119 @@
+"""
+地理计算基础工具
+"""
+import numpy as np
+from typing import List
+
+# 地球平均半径（公里）
+EARTH_RADIUS_KM = 6371.0088
+
+# 各交通方式的城市平均速度（km/h）
+SPEED_MAP = {
+    "driving": 30,  # 城市驾车平均速度
+    "transit": 25,  # 公共交通平均速度
+    "walking": 5,   # 步行速度
+    "cycling": 15   # 骑行速度
+}
+DEFAULT_SPEED = 25
+
+# 直线距离到实际路程的经验系数
+ROUTE_FACTOR = 1.3
+
+
+def haversine_matrix(origins: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+    """
+    批量计算两组坐标之间的球面距离（haversine）
+
+    Args:
+        origins: 起点坐标数组，形状 (N, 2)，每行为 (纬度, 经度)
+        destinations: 终点坐标数组，形状 (M, 2)，每行为 (纬度, 经度)
+
+    Returns:
+        距离矩阵（公里），形状 (N, M)
+    """
+    origins = np.radians(np.asarray(origins, dtype=np.float64).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=np.float64).reshape(-1, 2))
+
+    lat1 = origins[:, 0:1]
+    lng1 = origins[:, 1:2]
+    lat2 = destinations[:, 0][np.newaxis, :]
+    lng2 = destinations[:, 1][np.newaxis, :]
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def speed_vector(transports: List[str]) -> np.ndarray:
+    """
+    将交通方式列表转换为速度向量（km/h）
+
+    Args:
+        transports: 每个参与者的交通方式
+
+    Returns:
+        速度数组，形状 (N,)
+    """
+    return np.array(
+        [SPEED_MAP.get(t or "driving", DEFAULT_SPEED) for t in transports],
+        dtype=np.float64
+    )
+
+
+# 地图API出行方式到打分交通方式的映射
+MODE_ALIASES = {
+    "bicycling": "cycling"
+}
+
+
+def normalize_mode(mode: str) -> str:
+    """将地图API的出行方式统一为打分使用的交通方式"""
+    mode = mode or "driving"
+    return MODE_ALIASES.get(mode, mode)
+
+
+
+# geohash 使用的 base32 字符表
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 7) -> str:
+    """
+    计算坐标的 geohash（精度7约150米，精度6约1.2公里，精度5约5公里）
+
+    Args:
+        lat: 纬度
+        lng: 经度
+        precision: geohash 长度
+
+    Returns:
+        geohash 字符串
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        # 偶数位编码经度，奇数位编码纬度
+        value, rng = (lng, lng_range) if even else (lat, lat_range)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits = bits << 1
+            rng[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
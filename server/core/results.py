@@ -0,0 +1,69 @@
+"""
+打分结果的内部表示
+
+打分和持久化路径上使用 __slots__ 数据类，不构建 pydantic 模型（数据由打分代码生成，不需要校验）。
+to_dict() 输出的结构与 models.gathering.RecommendationItem 一致，
+直接用于写入数据库、API 响应和实时推送。
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass(slots=True)
+class ScoredParticipant:
+    """单个参与者到推荐地点的距离和通勤时间（对应 ParticipantDistance）"""
+    temp_id: str
+    nickname: str
+    distance: float  # 距离（公里），保留1位小数
+    travel_time: float  # 通勤时间（分钟），保留1位小数
+    transport_mode: str
+
+    def to_dict(self) -> Dict:
+        return {
+            "temp_id": self.temp_id,
+            "nickname": self.nickname,
+            "distance": self.distance,
+            "travel_time": self.travel_time,
+            "transport_mode": self.transport_mode
+        }
+
+
+@dataclass(slots=True)
+class ScoredPlace:
+    """推荐地点（对应 RecommendationItem）"""
+    id: str
+    name: str
+    address: str
+    lat: float
+    lng: float
+    location_name: Optional[str]
+    type: str
+    rating: Optional[float]
+    price_level: Optional[int]
+    avg_travel_time: float  # 平均通勤时间（分钟）
+    travel_times: Dict[str, float]  # 每个人的通勤时间
+    score: float  # 综合评分
+    distance_from_center: float  # 距离中心点距离（米）
+    participant_distances: List[ScoredParticipant] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        """RecommendationItem 结构的字典（只含JSON原生类型）"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "address": self.address,
+            "location": {
+                "address": self.address,
+                "lng": self.lng,
+                "lat": self.lat,
+                "name": self.location_name
+            },
+            "type": self.type,
+            "rating": self.rating,
+            "price_level": self.price_level,
+            "avg_travel_time": self.avg_travel_time,
+            "travel_times": self.travel_times,
+            "score": self.score,
+            "distance_from_center": self.distance_from_center,
+            "participant_distances": [d.to_dict() for d in self.participant_distances]
+        }
@@ -0,0 +1,157 @@
+"""
+聚会增量打分状态
+
+每个聚会固定一组候选地点，并缓存每个参与者对应的一行距离/通勤时间，
+参与者加入、离开或更新位置时只计算（或删除）变化的那一行，再重新聚合得分。
+候选地点只在搜索中心漂移超过阈值（或簇的数量变化）时重新搜索。
+"""
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from models.gathering import Participant
+from core.results import ScoredPlace
+from core.algorithm import RecommendationEngine
+from core.calibration import travel_time_calibrator
+from core.geo import haversine_matrix
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def participant_key(participant: Participant) -> Tuple:
+    """参与者中影响打分的字段（位置、交通方式和通勤时间修正系数的版本及时段）"""
+    return (
+        participant.location.lat,
+        participant.location.lng,
+        participant.transport or "driving",
+        travel_time_calibrator.factor_key()
+    )
+
+
+class GatheringScoringState:
+    """单个聚会的增量打分状态"""
+
+    def __init__(self, candidate_locations: List[Dict], centers: List[Tuple[float, float]], keyword: str):
+        """
+        Args:
+            candidate_locations: 候选地点列表
+            centers: 搜索候选地点时使用的搜索中心
+            keyword: 搜索关键词
+        """
+        self.candidates = candidate_locations
+        self.centers = centers
+        self.keyword = keyword
+        self.arrays = RecommendationEngine.candidate_arrays(candidate_locations)
+
+        # temp_id -> (参与者打分字段, 距离行, 通勤时间行)
+        self.rows: Dict[str, Tuple[Tuple, np.ndarray, np.ndarray]] = {}
+        self.participants: List[Participant] = []
+
+    def add_participant(self, participant: Participant):
+        """
+        计算（或重新计算）单个参与者到所有候选地点的距离和通勤时间
+
+        Args:
+            participant: 有位置信息的参与者
+        """
+        distance_km, travel_time = RecommendationEngine.build_matrices(
+            [participant], self.arrays["coords"]
+        )
+        self.rows[participant.temp_id] = (participant_key(participant), distance_km[0], travel_time[0])
+
+    def covers(self, centers: List[Tuple[float, float]], keyword: str, max_drift_km: float) -> bool:
+        """
+        当前候选地点是否仍适用于新的搜索中心（关键词相同、簇数量相同且每个中心的漂移不超过阈值）
+
+        Args:
+            centers: 按当前参与者计算的搜索中心
+            keyword: 搜索关键词
+            max_drift_km: 允许的最大漂移（公里）
+        """
+        if keyword != self.keyword or len(centers) != len(self.centers):
+            return False
+        drift = np.diagonal(haversine_matrix(np.array(self.centers), np.array(centers)))
+        return bool(np.all(drift <= max_drift_km))
+
+    def sync(self, participants: List[Participant]) -> int:
+        """
+        与当前参与者列表对齐，只计算新增或位置/交通方式变化的参与者
+
+        Args:
+            participants: 有位置信息的参与者列表
+
+        Returns:
+            本次重新计算的行数
+        """
+        current_ids = {p.temp_id for p in participants}
+        for temp_id in list(self.rows):
+            if temp_id not in current_ids:
+                self.rows.pop(temp_id)
+
+        computed = 0
+        for p in participants:
+            row = self.rows.get(p.temp_id)
+            if row is None or row[0] != participant_key(p):
+                self.add_participant(p)
+                computed += 1
+
+        self.participants = list(participants)
+        return computed
+
+    def recommend(self, max_results: int = 5) -> List[ScoredPlace]:
+        """
+        由缓存的各行重新聚合得分并返回推荐结果，结果与全量重新计算一致
+
+        Args:
+            max_results: 最多返回结果数
+
+        Returns:
+            推荐地点列表（按得分从高到低）
+        """
+        if not self.participants or not self.candidates:
+            return []
+
+        rows = [self.rows[p.temp_id] for p in self.participants]
+        distance_km = np.vstack([r[1] for r in rows])
+        travel_time = np.vstack([r[2] for r in rows])
+
+        scores = RecommendationEngine.score_matrices(
+            self.participants, self.arrays, distance_km, travel_time
+        )
+        return RecommendationEngine.materialize_top_k(
+            self.participants, self.candidates, scores, max_results
+        )
+
+
+class ScoringStateCache:
+    """按聚会邀请码缓存打分状态（进程内LRU）"""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._states: "OrderedDict[str, GatheringScoringState]" = OrderedDict()
+
+    def get(self, code: str) -> Optional[GatheringScoringState]:
+        """获取聚会的打分状态（不存在时返回None）"""
+        code = code.upper()
+        state = self._states.get(code)
+        if state is not None:
+            self._states.move_to_end(code)
+        return state
+
+    def put(self, code: str, state: GatheringScoringState):
+        """保存聚会的打分状态（替换旧状态）"""
+        code = code.upper()
+        self._states[code] = state
+        self._states.move_to_end(code)
+
+        while len(self._states) > self.max_size:
+            self._states.popitem(last=False)
+
+    def discard(self, code: str):
+        """删除聚会的打分状态"""
+        self._states.pop(code.upper(), None)
+
+
+# 全局打分状态缓存
+scoring_states = ScoringStateCache(max_size=settings.SCORING_STATE_CACHE_SIZE)
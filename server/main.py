@@ -2,11 +2,24 @@
 约呗后端服务主入口
 """
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
 from app.config import settings
 from app.database import init_db, close_db
+from core.calibration import travel_time_calibrator
+from services.route_cache import route_cache
+from services.poi_cache import poi_cache
+from services.http_client import map_http_client
+from services.quota import quota_manager
+from services.provider_router import provider_health
+from services.map_service import get_map_service
+from services.geocoder import geocoder
+from services.reverse_geocoder import get_reverse_geocoder
+from services.gathering_repository import gathering_repository
+from services.realtime import gathering_hub
+from services.recompute_worker import recompute_worker
 from api import gathering, location, recommendation
 import logging
 
@@ -23,9 +36,24 @@ async def lifespan(app: FastAPI):
     # 启动时
     logger.info("Starting Yuebei Server...")
     await init_db()
+    map_http_client.start()
+    travel_time_calibrator.start()
+    if settings.POI_DATASET_PATH:
+        # 启动时加载本地POI索引，避免第一个请求等待
+        get_map_service()
+    # 加载行政区边界（离线逆地理编码）
+    get_reverse_geocoder()
+    # 订阅聚会事件（多 worker 实时推送）
+    gathering_hub.start()
+    # 推荐结果后台重算
+    recompute_worker.start(recommendation.recompute_gathering)
     yield
     # 关闭时
     logger.info("Shutting down Yuebei Server...")
+    await recompute_worker.stop()
+    await gathering_hub.stop()
+    await travel_time_calibrator.stop()
+    await map_http_client.close()
     await close_db()
 
 # 创建FastAPI应用
@@ -33,7 +61,9 @@ app = FastAPI(
     title="约呗 API",
     description="智能聚会地点推荐服务",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson 序列化响应（datetime 输出为 ISO 8601，与模型的 json_encoders 一致）
+    default_response_class=ORJSONResponse
 )
 
 # 配置CORS
@@ -61,7 +91,17 @@ async def health_check():
     return {
         "status": "healthy",
         "database": "connected",
-        "cache": "connected"
+        "cache": "connected",
+        "route_cache": route_cache.stats(),
+        "gathering_cache": gathering_repository.stats(),
+        "realtime": gathering_hub.stats(),
+        "recompute": recompute_worker.stats(),
+        "poi_cache": poi_cache.stats(),
+        "geocode_cache": geocoder.stats(),
+        "reverse_geocode": get_reverse_geocoder().stats(),
+        "map_http": map_http_client.stats(),
+        "map_quota": quota_manager.stats(),
+        "map_providers": {name: h.to_dict() for name, h in provider_health.items()}
     }
 
 if __name__ == "__main__":
@@ -29,6 +29,12 @@ class Participant(BaseModel):
     transport: Optional[str] = "driving"  # 交通方式: driving/transit/walking
     joined_at: datetime = Field(default_factory=datetime.now)
 
+    @classmethod
+    def from_db(cls, doc: dict) -> "Participant":
+        """由数据库文档构建（跳过校验，仅用于可信的数据库数据）"""
+        location = doc.get("location")
+        return cls.model_construct(**{**doc, "location": Location.model_construct(**location) if location else None})
+
 class CreateGatheringRequest(BaseModel):
     """创建聚会请求"""
     type: GatheringType = GatheringType.MEAL
@@ -40,6 +46,11 @@ class JoinGatheringRequest(BaseModel):
     code: str
     participant: Participant
 
+class LeaveGatheringRequest(BaseModel):
+    """退出聚会请求"""
+    code: str
+    temp_id: str
+
 class Gathering(BaseModel):
     """聚会信息"""
     id: str
@@ -52,12 +63,26 @@ class Gathering(BaseModel):
     created_at: datetime
     expires_at: datetime
     status: str = "active"  # active/expired/cancelled
+    version: int = 0  # 版本号（每次修改递增）
+    recommendations_version: int = 0  # 推荐结果版本号（每次保存推荐结果递增，不影响 version）
     
     class Config:
         json_encoders = {
             datetime: lambda v: v.isoformat()
         }
 
+    @classmethod
+    def from_db(cls, doc: dict) -> "Gathering":
+        """
+        由数据库文档构建（跳过校验，仅用于可信的数据库数据）
+
+        数据库文档由本服务写入、已经过校验，热点读取路径上不必再完整校验一遍。
+        """
+        fields = {k: v for k, v in doc.items() if k != "_id"}
+        fields["type"] = GatheringType(doc["type"])
+        fields["participants"] = [Participant.from_db(p) for p in doc.get("participants", [])]
+        return cls.model_construct(**fields)
+
 class GatheringResponse(BaseModel):
     """聚会响应"""
     success: bool
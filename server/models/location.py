@@ -0,0 +1,11 @@
+"""
+位置数据模型
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from app.config import settings
+
+class GeocodeBatchRequest(BaseModel):
+    """批量地理编码请求"""
+    addresses: List[str] = Field(..., min_length=1, max_length=settings.GEOCODE_BATCH_MAX)
+    city: Optional[str] = None  # 限定城市
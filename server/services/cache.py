@@ -0,0 +1,146 @@
+"""
+两级缓存（进程内LRU + Redis）
+
+先查进程内LRU，未命中再查Redis（命中后回填LRU），写入时两级同时写。
+Redis不可用时只使用进程内缓存。
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from app.database import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """带过期时间的进程内LRU缓存"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，过期或不存在时返回None"""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        """删除缓存"""
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TwoTierCache:
+    """两级缓存，值以JSON存入Redis"""
+
+    def __init__(self, namespace: str, ttl: int, local_size: int = 10000, local_ttl: int = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local_ttl = local_ttl or ttl
+        self.local = LRUCache(max_size=local_size)
+
+        # 命中/未命中计数
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        """读取单个缓存值"""
+        return (await self.get_many([key]))[0]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        批量读取缓存值
+
+        Args:
+            keys: 缓存键列表
+
+        Returns:
+            与 keys 一一对应的值列表，未命中为None
+        """
+        values: List[Optional[Any]] = [self.local.get(k) for k in keys]
+        missing = [i for i, v in enumerate(values) if v is None]
+        self.local_hits += len(keys) - len(missing)
+
+        redis = get_redis()
+        if missing and redis:
+            try:
+                raw_values = await redis.mget([self._redis_key(keys[i]) for i in missing])
+                for i, raw in zip(missing, raw_values):
+                    if raw is not None:
+                        values[i] = json.loads(raw)
+                        self.local.set(keys[i], values[i], self.local_ttl)
+                        self.redis_hits += 1
+            except Exception as e:
+                logger.warning(f"Redis cache read failed ({self.namespace}): {e}")
+
+        self.misses += sum(1 for i in missing if values[i] is None)
+        return values
+
+    async def set(self, key: str, value: Any, ttl: int = None):
+        """写入单个缓存值"""
+        await self.set_many({key: value}, ttl)
+
+    async def set_many(self, items: Dict[str, Any], ttl: int = None):
+        """
+        批量写入缓存值
+
+        Args:
+            items: {缓存键: 值}，值需可JSON序列化
+            ttl: 过期时间（秒），默认使用缓存的 ttl
+        """
+        ttl = ttl or self.ttl
+        for key, value in items.items():
+            self.local.set(key, value, min(ttl, self.local_ttl))
+
+        redis = get_redis()
+        if items and redis:
+            try:
+                pipe = redis.pipeline(transaction=False)
+                for key, value in items.items():
+                    pipe.setex(self._redis_key(key), ttl, json.dumps(value, ensure_ascii=False, separators=(",", ":")))
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Redis cache write failed ({self.namespace}): {e}")
+
+    async def delete(self, key: str):
+        """删除缓存值"""
+        self.local.delete(key)
+        redis = get_redis()
+        if redis:
+            try:
+                await redis.delete(self._redis_key(key))
+            except Exception as e:
+                logger.warning(f"Redis cache delete failed ({self.namespace}): {e}")
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.local_hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "local_size": len(self.local)
+        }
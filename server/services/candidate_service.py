@@ -0,0 +1,111 @@
+"""
+候选地点生成
+
+参与者分布在多个区域时，除整体的搜索中心外，再围绕每个簇的中心并发搜索，
+合并结果并做空间去重后交给推荐引擎打分。
+"""
+import asyncio
+from typing import List, Dict, Optional, Tuple
+from models.gathering import Participant
+from core.algorithm import RecommendationEngine
+from services.map_service import MapService
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 每度纬度对应的米数，用于空间去重的网格划分
+METERS_PER_DEG = 111_000
+
+
+def search_centers(participants: List[Participant]) -> List[Tuple[float, float]]:
+    """
+    计算需要搜索的中心点：整体优化中心 + 每个簇的优化中心
+
+    Args:
+        participants: 有位置信息的参与者列表
+
+    Returns:
+        中心点列表，第一个为整体搜索中心
+    """
+    centers = [RecommendationEngine.optimize_center(participants)]
+
+    clusters = RecommendationEngine.cluster_participants(participants)
+    if len(clusters) > 1:
+        for cluster in clusters:
+            centers.append(RecommendationEngine.optimize_center(cluster))
+
+    return centers
+
+
+def dedupe_places(places: List[Dict], cell_meters: int = None) -> List[Dict]:
+    """
+    合并多次搜索结果并去重：相同ID，或同名且落在同一网格（约 cell_meters 米）内视为同一地点
+
+    Args:
+        places: 合并后的地点列表
+        cell_meters: 去重网格大小（米），默认取配置 CANDIDATE_DEDUP_METERS
+
+    Returns:
+        去重后的地点列表（保留首次出现的顺序）
+    """
+    cell_deg = (cell_meters or settings.CANDIDATE_DEDUP_METERS) / METERS_PER_DEG
+
+    seen_ids = set()
+    seen_cells = set()
+    unique = []
+    for place in places:
+        place_id = place.get("id")
+        cell = (
+            place.get("name"),
+            round(place["lat"] / cell_deg),
+            round(place["lng"] / cell_deg)
+        )
+        if (place_id and place_id in seen_ids) or cell in seen_cells:
+            continue
+        if place_id:
+            seen_ids.add(place_id)
+        seen_cells.add(cell)
+        unique.append(place)
+
+    return unique
+
+
+async def generate_candidates(
+    map_service: MapService,
+    participants: List[Participant],
+    keyword: str,
+    radius: int = 3000,
+    centers: Optional[List[Tuple[float, float]]] = None
+) -> Tuple[Tuple[float, float], List[Dict]]:
+    """
+    生成候选地点：围绕每个搜索中心并发调用 search_nearby，合并去重
+
+    Args:
+        map_service: 地图服务
+        participants: 有位置信息的参与者列表
+        keyword: 搜索关键词
+        radius: 每个中心的搜索半径（米）
+        centers: 已计算好的搜索中心，默认由 search_centers 计算
+
+    Returns:
+        (整体搜索中心, 候选地点列表)
+    """
+    centers = centers or search_centers(participants)
+
+    results = await asyncio.gather(
+        *[map_service.search_nearby(center=c, keyword=keyword, radius=radius) for c in centers],
+        return_exceptions=True
+    )
+
+    merged = []
+    for center, result in zip(centers, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to search nearby {center}: {result}")
+            continue
+        merged.extend(result)
+
+    candidates = dedupe_places(merged)
+    logger.info(f"Generated {len(candidates)} candidates from {len(centers)} search centers")
+
+    return centers[0], candidates
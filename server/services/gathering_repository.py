@@ -0,0 +1,365 @@
+"""
+聚会数据访问
+
+所有聚会的读写都经过这里：
+- 每次写入都在同一个原子操作里递增 version 字段，并把写入后的文档写回 Redis（write-through）；
+  写回缓存时只接受更新的版本，并发写入不会被旧版本覆盖。
+- 只保存推荐结果时不递增 version（聚会 ETag 不失效、不推送聚会更新），改为递增 recommendations_version；
+  缓存按 (version, recommendations_version) 比较新旧。
+- 读取先查 Redis，未命中再读 MongoDB 并回填（read-through）。
+- 缓存中同时单独保存版本号，条件请求（ETag）只读这个键即可判断聚会是否有变化。
+- 写入后向订阅该聚会的实时连接推送新文档（见 services/realtime.py）。
+- 缓存快过期时按 XFetch 算法以一定概率提前刷新：越接近过期、重新加载越慢，提前刷新的概率越大，
+  热点聚会的缓存不会在同一时刻集中失效。
+"""
+import math
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import orjson
+from pymongo import ReturnDocument
+from models.gathering import Gathering
+from services.realtime import gathering_hub, encode_event
+from app.database import get_mongodb, get_redis
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 聚会详情不包含各推荐地点的参与者距离明细（由 /recommend/calculate 返回）
+DETAIL_PROJECTION = {"_id": 0, "recommendations.participant_distances": 0}
+
+# 聚会列表不包含推荐结果
+LIST_PROJECTION = {"_id": 0, "recommendations": 0}
+
+# 推荐计算只需要的字段（不读取随每次计算增长的推荐结果）
+CALCULATION_PROJECTION = {
+    "_id": 0,
+    "code": 1,
+    "type": 1,
+    "preferences": 1,
+    "status": 1,
+    "version": 1,
+    "participants.temp_id": 1,
+    "participants.nickname": 1,
+    "participants.location": 1,
+    "participants.transport": 1
+}
+CALCULATION_PARTICIPANT_FIELDS = ("temp_id", "nickname", "location", "transport")
+
+# 缓存中的版本比要写入的版本新时不写入（同版本重新加载时刷新写入时间）
+# 版本相同时再比较推荐结果版本，并发保存的推荐结果不会被旧结果覆盖
+# KEYS[1] 缓存键, KEYS[2] 版本号键; ARGV: 缓存值, 版本, 过期秒数, 推荐结果版本
+SET_IF_NEWER_SCRIPT = """
+local current = redis.call("GET", KEYS[1])
+if current then
+    local ok, entry = pcall(cjson.decode, current)
+    if ok and tonumber(entry["v"]) then
+        local version = tonumber(entry["v"])
+        if version > tonumber(ARGV[2]) then
+            return 0
+        end
+        if version == tonumber(ARGV[2]) and (tonumber(entry["rv"]) or 0) > tonumber(ARGV[4]) then
+            return 0
+        end
+    end
+end
+redis.call("SET", KEYS[1], ARGV[1], "EX", ARGV[3])
+redis.call("SET", KEYS[2], ARGV[2], "EX", ARGV[3])
+return 1
+"""
+
+
+def _parse_datetimes(data: Dict) -> Dict:
+    """缓存中的时间字段是ISO字符串，还原为 datetime 后交给 Gathering.from_db"""
+    return {
+        **data,
+        "created_at": datetime.fromisoformat(data["created_at"]),
+        "expires_at": datetime.fromisoformat(data["expires_at"]),
+        "participants": [
+            {**p, "joined_at": datetime.fromisoformat(p["joined_at"])} if isinstance(p.get("joined_at"), str) else p
+            for p in data.get("participants", [])
+        ]
+    }
+
+
+def _active_filter(code: str) -> Dict:
+    """未过期、未取消的聚会"""
+    return {"code": code, "status": "active", "expires_at": {"$gt": datetime.now()}}
+
+
+class GatheringRepository:
+    """聚会数据访问（MongoDB + Redis缓存）"""
+
+    def __init__(self, ttl: int = 3600, beta: float = 1.0):
+        """
+        Args:
+            ttl: 缓存过期时间（秒）
+            beta: XFetch 提前刷新系数，越大越早刷新
+        """
+        self.ttl = ttl
+        self.beta = beta
+
+        self.hits = 0
+        self.misses = 0
+        self.early_refreshes = 0
+
+    def _key(self, code: str) -> str:
+        return f"gathering:{code.upper()}"
+
+    def _version_key(self, code: str) -> str:
+        return f"gathering:version:{code.upper()}"
+
+    async def _write_cache(self, gathering: Gathering, delta: float = 0.0, data: Optional[Dict] = None):
+        """写回缓存（只接受更新的版本）"""
+        redis = get_redis()
+        if not redis:
+            return
+        entry = {
+            "v": gathering.version,
+            "rv": gathering.recommendations_version,
+            "t": time.time(),
+            "delta": delta,
+            "d": data if data is not None else gathering.model_dump(mode="json")
+        }
+        try:
+            await redis.eval(
+                SET_IF_NEWER_SCRIPT, 2, self._key(gathering.code), self._version_key(gathering.code),
+                orjson.dumps(entry), gathering.version, self.ttl, gathering.recommendations_version
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cache gathering {gathering.code}: {e}")
+
+    async def _load(self, code: str) -> Optional[Gathering]:
+        """从MongoDB读取并回填缓存"""
+        started = time.monotonic()
+        doc = await get_mongodb().gatherings.find_one({"code": code.upper()}, DETAIL_PROJECTION)
+        if not doc:
+            return None
+        gathering = Gathering.from_db(doc)
+        await self._write_cache(gathering, time.monotonic() - started)
+        return gathering
+
+    async def _read_cache(self, code: str) -> Optional[Dict]:
+        """
+        读取缓存的聚会数据（JSON结构），未命中或需要提前刷新时返回None
+        """
+        redis = get_redis()
+        if not redis:
+            return None
+        try:
+            cached = await redis.get(self._key(code))
+        except Exception as e:
+            logger.warning(f"Gathering cache read failed: {e}")
+            return None
+        if not cached:
+            return None
+
+        entry = orjson.loads(cached)
+        # XFetch：now - delta * beta * ln(rand) 超过过期时间时提前刷新
+        expires_at = entry["t"] + self.ttl
+        if time.time() - max(entry.get("delta", 0.0), 0.001) * self.beta * math.log(random.random() or 1e-12) < expires_at:
+            self.hits += 1
+            return entry["d"]
+        self.early_refreshes += 1
+        return None
+
+    async def _after_write(self, doc: Optional[Dict]) -> Optional[Gathering]:
+        """写入成功后写回缓存、推送给实时连接，并返回新文档"""
+        if not doc:
+            return None
+        gathering = Gathering.from_db(doc)
+        data = gathering.model_dump(mode="json")
+        await self._write_cache(gathering, data=data)
+        await gathering_hub.publish(gathering.code, encode_event("gathering", gathering.version, data))
+        return gathering
+
+    async def get(self, code: str) -> Optional[Gathering]:
+        """
+        读取聚会详情（read-through）
+
+        Returns:
+            聚会；不存在时返回None
+        """
+        data = await self._read_cache(code)
+        if data is not None:
+            return Gathering.from_db(_parse_datetimes(data))
+
+        self.misses += 1
+        return await self._load(code)
+
+    async def get_for_calculation(self, code: str) -> Optional[Gathering]:
+        """
+        读取推荐计算所需的字段（类型、偏好、状态、版本和参与者位置/交通方式）
+
+        缓存命中时从缓存数据中取这些字段；未命中时按 CALCULATION_PROJECTION 读取MongoDB，
+        部分文档不回填缓存。
+
+        Returns:
+            只含上述字段的聚会；不存在时返回None
+        """
+        data = await self._read_cache(code)
+        if data is None:
+            self.misses += 1
+            data = await get_mongodb().gatherings.find_one({"code": code.upper()}, CALCULATION_PROJECTION)
+            if not data:
+                return None
+
+        fields = {k: data[k] for k in CALCULATION_PROJECTION if k in data}
+        fields["participants"] = [
+            {k: p[k] for k in CALCULATION_PARTICIPANT_FIELDS if k in p}
+            for p in data.get("participants", [])
+        ]
+        return Gathering.from_db(fields)
+
+    async def get_data(self, code: str) -> Optional[Dict]:
+        """
+        读取聚会详情的JSON结构（缓存命中时直接返回缓存数据，不构建模型，用于详情接口）
+
+        Returns:
+            Gathering 的 JSON 结构；不存在时返回None
+        """
+        data = await self._read_cache(code)
+        if data is not None:
+            return data
+
+        self.misses += 1
+        gathering = await self._load(code)
+        return gathering.model_dump(mode="json") if gathering else None
+
+    async def cached_version(self, code: str) -> Optional[int]:
+        """
+        缓存中的聚会版本号（只读 Redis，用于条件请求）
+
+        Returns:
+            版本号；未缓存或 Redis 不可用时返回None
+        """
+        redis = get_redis()
+        if not redis:
+            return None
+        try:
+            version = await redis.get(self._version_key(code))
+        except Exception as e:
+            logger.warning(f"Gathering version read failed: {e}")
+            return None
+        return int(version) if version is not None else None
+
+    async def exists(self, code: str) -> bool:
+        """邀请码是否已被使用"""
+        return await get_mongodb().gatherings.find_one({"code": code.upper()}, {"_id": 1}) is not None
+
+    async def create(self, doc: Dict) -> Gathering:
+        """创建聚会（版本号从1开始）"""
+        doc = {**doc, "version": 1}
+        await get_mongodb().gatherings.insert_one(doc)
+        doc.pop("_id", None)
+        return await self._after_write(doc)
+
+    async def add_participant(self, code: str, participant: Dict) -> Optional[Gathering]:
+        """
+        新参与者加入（聚会可加入、未满员且尚未加入时才追加）
+
+        Returns:
+            更新后的聚会；条件不满足时返回None
+        """
+        doc = await get_mongodb().gatherings.find_one_and_update(
+            {
+                **_active_filter(code.upper()),
+                "participants.temp_id": {"$ne": participant["temp_id"]},
+                f"participants.{settings.MAX_PARTICIPANTS - 1}": {"$exists": False}
+            },
+            {"$push": {"participants": participant}, "$inc": {"version": 1}},
+            projection=DETAIL_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        return await self._after_write(doc)
+
+    async def update_participant(self, code: str, participant: Dict) -> Optional[Gathering]:
+        """
+        已加入的参与者更新自己的信息
+
+        Returns:
+            更新后的聚会；聚会不可加入或参与者不存在时返回None
+        """
+        doc = await get_mongodb().gatherings.find_one_and_update(
+            {**_active_filter(code.upper()), "participants.temp_id": participant["temp_id"]},
+            {"$set": {"participants.$": participant}, "$inc": {"version": 1}},
+            projection=DETAIL_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        return await self._after_write(doc)
+
+    async def remove_participant(self, code: str, temp_id: str) -> Optional[Gathering]:
+        """参与者退出，聚会不可修改（已过期/取消）或不存在时返回None"""
+        doc = await get_mongodb().gatherings.find_one_and_update(
+            _active_filter(code.upper()),
+            {"$pull": {"participants": {"temp_id": temp_id}}, "$inc": {"version": 1}},
+            projection=DETAIL_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        return await self._after_write(doc)
+
+    async def join_state(self, code: str) -> Optional[Dict]:
+        """判断加入失败原因所需的字段（状态、过期时间、参与者ID）"""
+        return await get_mongodb().gatherings.find_one(
+            {"code": code.upper()},
+            {"_id": 0, "status": 1, "expires_at": 1, "participants.temp_id": 1}
+        )
+
+    async def set_status(self, code: str, status: str) -> Optional[Gathering]:
+        """修改聚会状态（取消/过期），聚会不存在或状态未变时返回None"""
+        doc = await get_mongodb().gatherings.find_one_and_update(
+            {"code": code.upper(), "status": {"$ne": status}},
+            {"$set": {"status": status}, "$inc": {"version": 1}},
+            projection=DETAIL_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        return await self._after_write(doc)
+
+    async def set_recommendations(self, code: str, recommendations: List[Dict]) -> Optional[Gathering]:
+        """
+        保存推荐结果
+
+        只递增 recommendations_version，不递增聚会版本号，也不推送聚会更新
+        （推荐结果由调用方以 recommendations 事件推送）；写回缓存使详情中的推荐结果保持最新。
+
+        Returns:
+            保存后的聚会；聚会不存在时返回None
+        """
+        doc = await get_mongodb().gatherings.find_one_and_update(
+            {"code": code.upper()},
+            {"$set": {"recommendations": recommendations}, "$inc": {"recommendations_version": 1}},
+            projection=DETAIL_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if not doc:
+            return None
+        gathering = Gathering.from_db(doc)
+        await self._write_cache(gathering)
+        return gathering
+
+    async def list_recent(self, limit: int = 10) -> List[Gathering]:
+        """最近创建的进行中聚会（不经过缓存）"""
+        cursor = get_mongodb().gatherings.find(
+            {"status": "active"},
+            LIST_PROJECTION
+        ).sort("created_at", -1).limit(limit)
+        return [Gathering.from_db(doc) async for doc in cursor]
+
+    def stats(self) -> Dict:
+        """缓存命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "early_refreshes": self.early_refreshes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# 全局聚会数据访问实例
+gathering_repository = GatheringRepository(
+    ttl=settings.GATHERING_CACHE_TTL,
+    beta=settings.GATHERING_CACHE_BETA
+)
@@ -0,0 +1,130 @@
+"""
+地理编码服务
+
+地址先做规范化（全角转半角、去空白、统一大小写），再按 (城市, 地址) 查两级缓存；
+地址对应的坐标基本不变，解析结果缓存较长时间，服务商确认未找到的地址只短时缓存；
+接口出错（网络、配额、服务商错误）的结果和模拟坐标不缓存。
+批量解析时先去重并批量读取缓存，未命中的地址在并发上限内同时请求地图服务。
+"""
+import asyncio
+import hashlib
+import re
+import unicodedata
+from typing import Dict, List, Optional, Union
+from services.cache import TwoTierCache
+from services.map_service import MapService, GeocodeError
+from services.quota import QuotaExceeded
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 地址中不影响解析结果的字符（空白和常见分隔符）
+IGNORED_CHARS = re.compile(r"[\s,，.。、;；]+")
+
+
+def normalize_address(address: str) -> str:
+    """规范化地址，作为缓存键"""
+    address = unicodedata.normalize("NFKC", address)
+    return IGNORED_CHARS.sub("", address).lower()
+
+
+class Geocoder:
+    """带缓存的地理编码"""
+
+    def __init__(self, ttl: int = 30 * 24 * 3600, negative_ttl: int = 3600, local_size: int = 20000, concurrency: int = 8):
+        self.negative_ttl = negative_ttl
+        self.concurrency = concurrency
+        self.cache = TwoTierCache(namespace="geocode", ttl=ttl, local_size=local_size)
+
+    def key(self, address: str, city: Optional[str] = None) -> str:
+        """缓存键"""
+        digest = hashlib.md5(normalize_address(address).encode("utf-8")).hexdigest()
+        return f"{normalize_address(city or '')}:{digest}"
+
+    async def geocode(self, map_service: MapService, address: str, city: Optional[str] = None) -> Optional[Dict]:
+        """
+        解析单个地址
+
+        Returns:
+            normalize_geocode 字段；未找到时返回None
+
+        Raises:
+            QuotaExceeded: 配额不足
+            GeocodeError: 地图服务出错（包括网络错误）
+        """
+        result = (await self.geocode_many(map_service, [address], city))[0]
+        if isinstance(result, QuotaExceeded):
+            raise result
+        if isinstance(result, Exception):
+            raise GeocodeError(str(result)) from result
+        return result
+
+    async def geocode_many(
+        self,
+        map_service: MapService,
+        addresses: List[str],
+        city: Optional[str] = None
+    ) -> List[Union[Dict, None, Exception]]:
+        """
+        批量解析地址
+
+        Args:
+            map_service: 地图服务
+            addresses: 地址列表
+            city: 限定城市
+
+        Returns:
+            与 addresses 一一对应的解析结果，未找到的为None，地图服务出错的为对应的异常
+        """
+        keys = [self.key(address, city) for address in addresses]
+        unique: Dict[str, str] = {}
+        for key, address in zip(keys, addresses):
+            unique.setdefault(key, address)
+
+        cached = await self.cache.get_many(list(unique))
+        results: Dict[str, Union[Dict, None, Exception]] = {}
+        missing = []
+        for key, entry in zip(unique, cached):
+            if entry is None:
+                missing.append(key)
+            else:
+                results[key] = entry.get("r")
+
+        if missing:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def resolve(key: str) -> Union[Dict, None, Exception]:
+                async with semaphore:
+                    try:
+                        return await map_service.geocode(unique[key], city)
+                    except Exception as e:
+                        logger.error(f"Geocoding failed for {unique[key]!r}: {e}")
+                        return e
+
+            resolved = await asyncio.gather(*[resolve(key) for key in missing])
+            results.update(zip(missing, resolved))
+
+            # 出错的结果不缓存
+            if map_service.geocode_cacheable:
+                found = {key: {"r": r} for key, r in zip(missing, resolved) if isinstance(r, dict)}
+                not_found = {key: {"r": None} for key, r in zip(missing, resolved) if r is None}
+                if found:
+                    await self.cache.set_many(found)
+                if not_found:
+                    await self.cache.set_many(not_found, self.negative_ttl)
+
+        return [results[key] for key in keys]
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        return self.cache.stats()
+
+
+# 全局地理编码服务
+geocoder = Geocoder(
+    ttl=settings.GEOCODE_CACHE_TTL,
+    negative_ttl=settings.GEOCODE_NEGATIVE_TTL,
+    local_size=settings.GEOCODE_CACHE_LOCAL_SIZE,
+    concurrency=settings.GEOCODE_BATCH_CONCURRENCY
+)
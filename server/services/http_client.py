@@ -0,0 +1,158 @@
+"""
+地图服务共享HTTP客户端
+
+由应用生命周期统一创建和关闭，所有地图服务共用同一个连接池：
+长连接复用、HTTP/2、每个域名的并发上限、连接/读取分别超时，
+幂等GET请求在网络错误或5xx/429时按带抖动的指数退避重试。
+"""
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import httpx
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _http2_available() -> bool:
+    """是否安装了 HTTP/2 支持（h2）"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HostStats:
+    """单个域名的请求统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "avg_latency_ms": round(self.total_latency / self.requests * 1000, 1) if self.requests else 0.0
+        }
+
+
+class MapHttpClient:
+    """地图服务共享HTTP客户端"""
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, HostStats] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """底层 httpx 客户端（未启动时按需创建，便于脚本直接使用地图服务）"""
+        if self._client is None:
+            self.start()
+        return self._client
+
+    def start(self):
+        """创建连接池"""
+        if self._client is not None:
+            return
+
+        http2 = settings.MAP_HTTP2 and _http2_available()
+        if settings.MAP_HTTP2 and not http2:
+            logger.warning("h2 is not installed, map HTTP client falls back to HTTP/1.1")
+
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.MAP_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MAP_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.MAP_HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.MAP_HTTP_CONNECT_TIMEOUT,
+                read=settings.MAP_HTTP_READ_TIMEOUT,
+                write=settings.MAP_HTTP_READ_TIMEOUT,
+                pool=settings.MAP_HTTP_CONNECT_TIMEOUT
+            )
+        )
+        logger.info(f"Map HTTP client started (http2={http2})")
+
+    async def close(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Map HTTP client closed")
+
+    def _host_state(self, host: str):
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(settings.MAP_HTTP_PER_HOST_CONCURRENCY)
+            self._stats[host] = HostStats()
+        return self._semaphores[host], self._stats[host]
+
+    def _backoff(self, attempt: int) -> float:
+        """带完全抖动的指数退避时间（秒）"""
+        return random.uniform(0, settings.MAP_HTTP_RETRY_BACKOFF * (2 ** attempt))
+
+    async def get(self, url: str, params: Dict = None, retries: int = None) -> httpx.Response:
+        """
+        发送GET请求（幂等，失败时重试）
+
+        Args:
+            url: 请求地址
+            params: 查询参数
+            retries: 最多重试次数，默认取配置 MAP_HTTP_RETRIES
+
+        Returns:
+            最后一次请求的响应；重试耗尽时抛出最后一次的网络异常
+        """
+        retries = settings.MAP_HTTP_RETRIES if retries is None else retries
+        semaphore, stats = self._host_state(urlsplit(url).netloc)
+
+        attempt = 0
+        while True:
+            async with semaphore:
+                stats.in_flight += 1
+                started = time.monotonic()
+                try:
+                    response = await self.client.get(url, params=params)
+                    error = None
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    response, error = None, e
+                finally:
+                    stats.in_flight -= 1
+                    stats.requests += 1
+                    stats.total_latency += time.monotonic() - started
+
+            retryable = error is not None or response.status_code in RETRY_STATUS_CODES
+            if not retryable or attempt >= retries:
+                if error is not None:
+                    stats.failures += 1
+                    raise error
+                if response.status_code >= 500:
+                    stats.failures += 1
+                return response
+
+            stats.retries += 1
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def stats(self) -> Dict:
+        """各域名的请求统计"""
+        return {host: s.to_dict() for host, s in self._stats.items()}
+
+
+# 全局共享客户端
+map_http_client = MapHttpClient()
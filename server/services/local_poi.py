@@ -0,0 +1,352 @@
+"""
+本地POI搜索引擎
+
+将POI数据集（列存储文件 .ybpoi，或 CSV/Parquet，字段 id, name, lat, lng, category, rating, price，
+可选 address, tel）加载为 NumPy 列，并按经纬度网格排序建立空间索引：
+同一网格的地点在数组中连续存放，查询时每一行网格只需一次二分查找即可取出候选范围，
+再向量化计算距离、按类别过滤并排序。大部分地点搜索在进程内完成，不再请求地图API。
+"""
+import csv
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from services.map_service import MapService, estimate_route_matrix, cost_to_price_level
+from services.poi_store import POI_STORE_SUFFIX, open_poi_store
+from core.geo import EARTH_RADIUS_KM
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 网格行号的偏移（保证网格键为非负整数）
+GRID_ROW_STRIDE = 1 << 32
+
+# 搜索关键词对应的类别（类别名包含其中任一词即视为匹配）
+KEYWORD_CATEGORIES = {
+    "餐厅": ("餐厅", "美食", "餐饮", "中餐", "西餐", "火锅", "日料", "韩餐", "快餐", "小吃", "烧烤"),
+    "咖啡厅": ("咖啡",),
+    "电影院": ("电影", "影院", "影城"),
+    "KTV": ("KTV", "歌厅"),
+    "商场": ("商场", "购物中心", "百货"),
+}
+
+
+def _grid_keys(lat: np.ndarray, lng: np.ndarray, cell_deg: float) -> np.ndarray:
+    """网格键：行号（纬度）* GRID_ROW_STRIDE + 列号（经度）"""
+    rows = np.floor((np.asarray(lat) + 90.0) / cell_deg).astype(np.int64)
+    cols = np.floor((np.asarray(lng) + 180.0) / cell_deg).astype(np.int64)
+    return rows * GRID_ROW_STRIDE + cols
+
+
+def _parse_price(value) -> int:
+    """数据集中的价格：1-5 视为价格等级，更大的数视为人均消费（元）；缺失返回0"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0
+    if 1 <= value <= 5 and value == int(value):
+        return int(value)
+    return cost_to_price_level(value) or 0
+
+
+class POIIndex:
+    """按网格排序的POI列存储"""
+
+    def __init__(
+        self,
+        lat: np.ndarray,
+        lng: np.ndarray,
+        rating: np.ndarray,
+        price_level: np.ndarray,
+        category: np.ndarray,
+        categories: List[str],
+        ids: List[str],
+        names: List[str],
+        addresses: List[str],
+        tels: List[str],
+        cell_deg: float = 0.01,
+        keys: Optional[np.ndarray] = None
+    ):
+        """
+        Args:
+            lat, lng: 坐标（已按网格键排序）
+            rating: 评分，缺失为NaN
+            price_level: 价格等级，缺失为0
+            category: 类别编号，对应 categories 下标
+            categories: 类别名列表
+            ids, names, addresses, tels: 字符串列（与坐标同序，list 或 StringColumn）
+            cell_deg: 网格大小（度）
+            keys: 预先计算的网格键（从列存储文件加载时传入）
+        """
+        self.lat = lat
+        self.lng = lng
+        self.rating = rating
+        self.price_level = price_level
+        self.category = category
+        self.categories = categories
+        self.ids = ids
+        self.names = names
+        self.addresses = addresses
+        self.tels = tels
+        self.cell_deg = cell_deg
+        self.keys = keys if keys is not None else _grid_keys(lat, lng, cell_deg)
+
+        # 关键词 -> 各类别是否匹配
+        self._keyword_masks: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    @classmethod
+    def from_records(cls, records: List[Dict], cell_deg: float = 0.01) -> "POIIndex":
+        """
+        由地点记录建立索引（无坐标的记录会被跳过）
+
+        Args:
+            records: 地点列表，字段 id, name, lat, lng, category, rating, price, address, tel
+            cell_deg: 网格大小（度）
+        """
+        rows = []
+        for r in records:
+            try:
+                lat, lng = float(r["lat"]), float(r["lng"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            rows.append((r, lat, lng))
+
+        lat = np.array([row[1] for row in rows], dtype=np.float64)
+        lng = np.array([row[2] for row in rows], dtype=np.float64)
+        order = np.argsort(_grid_keys(lat, lng, cell_deg), kind="stable")
+        rows = [rows[k] for k in order]
+
+        categories: List[str] = []
+        category_codes: Dict[str, int] = {}
+        codes = np.empty(len(rows), dtype=np.int32)
+        rating = np.full(len(rows), np.nan, dtype=np.float32)
+        price_level = np.zeros(len(rows), dtype=np.int8)
+        for k, (r, _, _) in enumerate(rows):
+            name = str(r.get("category") or r.get("type") or "")
+            if name not in category_codes:
+                category_codes[name] = len(categories)
+                categories.append(name)
+            codes[k] = category_codes[name]
+            try:
+                rating[k] = float(r.get("rating"))
+            except (TypeError, ValueError):
+                pass
+            price_level[k] = _parse_price(r.get("price", r.get("price_level")))
+
+        def text(field: str) -> List[str]:
+            return [str(r.get(field) or "") for r, _, _ in rows]
+
+        return cls(
+            lat=lat[order], lng=lng[order], rating=rating, price_level=price_level,
+            category=codes, categories=categories,
+            ids=text("id"), names=text("name"), addresses=text("address"), tels=text("tel"),
+            cell_deg=cell_deg
+        )
+
+    def _category_mask(self, keyword: str) -> np.ndarray:
+        """各类别是否与关键词匹配"""
+        mask = self._keyword_masks.get(keyword)
+        if mask is None:
+            terms = KEYWORD_CATEGORIES.get(keyword, (keyword,))
+            mask = np.array([any(t in c for t in terms) for c in self.categories], dtype=bool)
+            self._keyword_masks[keyword] = mask
+        return mask
+
+    def _candidate_rows(self, center: Tuple[float, float], radius_m: float) -> np.ndarray:
+        """搜索范围外接矩形覆盖的网格内的所有行号"""
+        lat_span = radius_m / 1000 / EARTH_RADIUS_KM * 180 / math.pi
+        lng_span = lat_span / max(math.cos(math.radians(center[0])), 1e-6)
+        low = _grid_keys(center[0] - lat_span, center[1] - lng_span, self.cell_deg)
+        high = _grid_keys(center[0] + lat_span, center[1] + lng_span, self.cell_deg)
+
+        row_low, row_high = int(low) // GRID_ROW_STRIDE, int(high) // GRID_ROW_STRIDE
+        col_low, col_high = int(low) % GRID_ROW_STRIDE, int(high) % GRID_ROW_STRIDE
+        rows = np.arange(row_low, row_high + 1, dtype=np.int64) * GRID_ROW_STRIDE
+
+        # 每一行网格在数组中是一个连续区间
+        starts = np.searchsorted(self.keys, rows + col_low, side="left")
+        ends = np.searchsorted(self.keys, rows + col_high, side="right")
+        ranges = [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def search(
+        self,
+        center: Tuple[float, float],
+        keyword: Optional[str] = None,
+        radius: float = 3000,
+        limit: int = 20
+    ) -> List[Dict]:
+        """
+        搜索半径内的地点，按距离由近到远排序
+
+        Args:
+            center: 搜索中心 (纬度, 经度)
+            keyword: 关键词（匹配类别或名称），为空时不过滤
+            radius: 搜索半径（米）
+            limit: 最多返回数量
+
+        Returns:
+            统一字段的地点列表
+        """
+        rows = self._candidate_rows(center, radius)
+        if len(rows) == 0:
+            return []
+
+        lat1, lng1 = np.radians(center[0]), np.radians(center[1])
+        lat2, lng2 = np.radians(self.lat[rows]), np.radians(self.lng[rows])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * 1000 * np.arcsin(np.sqrt(a))
+
+        inside = distance <= radius
+        rows, distance = rows[inside], distance[inside]
+
+        if keyword:
+            matched = self._category_mask(keyword)[self.category[rows]]
+            # 自定义关键词在类别不匹配时再看名称是否包含关键词
+            if keyword not in KEYWORD_CATEGORIES:
+                for k in np.flatnonzero(~matched):
+                    matched[k] = keyword in self.names[rows[k]]
+            rows, distance = rows[matched], distance[matched]
+
+        if len(rows) > limit:
+            nearest = np.argpartition(distance, limit)[:limit]
+            rows, distance = rows[nearest], distance[nearest]
+        rows = rows[np.argsort(distance, kind="stable")]
+
+        return [self.place(int(k)) for k in rows]
+
+    def place(self, k: int) -> Dict:
+        """第 k 行的地点（与 normalize_place 相同的字段）"""
+        rating = round(float(self.rating[k]), 1)
+        return {
+            "id": self.ids[k] or None,
+            "name": self.names[k] or "未知地点",
+            "address": self.addresses[k],
+            "lat": float(self.lat[k]),
+            "lng": float(self.lng[k]),
+            "type": self.categories[self.category[k]] or "餐厅",
+            "rating": rating if rating > 0 else None,
+            "price_level": int(self.price_level[k]) or None,
+            "tel": self.tels[k] or None
+        }
+
+
+def read_poi_records(path: str) -> List[Dict]:
+    """
+    读取POI数据集（.csv 或 .parquet）
+
+    Raises:
+        ValueError: 不支持的文件格式
+        RuntimeError: 读取Parquet但未安装 pyarrow
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.DictReader(f))
+    if ext == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Reading Parquet POI datasets requires pyarrow")
+        return pq.read_table(path).to_pylist()
+    raise ValueError(f"Unsupported POI dataset format: {path}")
+
+
+def load_poi_index(path: str, cell_deg: float = None) -> POIIndex:
+    """
+    加载POI数据集并建立索引
+
+    列存储文件（.ybpoi，由 build_poi_store.py 生成）直接内存映射打开；
+    CSV/Parquet 需要逐行解析，只适合小数据集和开发环境。
+    """
+    if path.endswith(POI_STORE_SUFFIX):
+        index = POIIndex(**open_poi_store(path))
+        logger.info(f"Mapped {len(index)} POIs from {path}")
+        return index
+
+    index = POIIndex.from_records(read_poi_records(path), cell_deg or settings.POI_INDEX_CELL_DEG)
+    logger.info(f"Loaded {len(index)} POIs from {path}")
+    return index
+
+
+class LocalPOIService(MapService):
+    """
+    本地POI地图服务
+
+    地点搜索使用本地索引；本地没有结果时交给 fallback 服务（如腾讯/高德），
+    路线和距离矩阵也交给 fallback，没有 fallback 时按直线距离估算。
+    """
+
+    provider = "local"
+
+    matrix_limits = (25, 25)
+    cache_routes = False
+
+    def __init__(self, index: POIIndex, fallback: Optional[MapService] = None):
+        super().__init__()
+        self.index = index
+        self.fallback = fallback
+
+    async def search_nearby(self, center: Tuple[float, float], keyword: str = "餐厅", radius: int = 3000) -> List[Dict]:
+        """搜索附近的地点"""
+        places = self.index.search(center, keyword, radius)
+        if not places and self.fallback is not None:
+            return await self.fallback.search_nearby(center, keyword, radius)
+        return places
+
+    async def calculate_route(self, from_point: Tuple[float, float], to_point: Tuple[float, float], mode: str = "driving") -> Dict:
+        """计算路线"""
+        if self.fallback is not None:
+            return await self.fallback.calculate_route(from_point, to_point, mode)
+        estimate = estimate_route_matrix(np.array([from_point]), np.array([to_point]), mode)
+        return {
+            "distance": float(estimate["distance"][0, 0]),
+            "duration": float(estimate["duration"][0, 0]),
+            "mode": mode
+        }
+
+    async def distance_matrix(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+        mode: str = "driving"
+    ) -> Dict[str, np.ndarray]:
+        """批量距离计算"""
+        if self.fallback is not None:
+            return await self.fallback.distance_matrix(origins, destinations, mode)
+        return await super().distance_matrix(origins, destinations, mode)
+
+    @property
+    def calibrate_routes(self) -> bool:
+        """距离矩阵交给 fallback 时返回真实路线，完全离线时只有估算值"""
+        return self.fallback is not None and self.fallback.calibrate_routes
+
+    @property
+    def geocode_cacheable(self) -> bool:
+        """完全离线时返回模拟坐标，不缓存"""
+        return self.fallback is not None and self.fallback.geocode_cacheable
+
+    async def geocode(self, address: str, city: Optional[str] = None) -> Optional[Dict]:
+        """地理编码（交给 fallback；完全离线时返回模拟坐标）"""
+        if self.fallback is not None:
+            return await self.fallback.geocode(address, city)
+        return self._mock_geocode(address)
+
+    async def reverse_geocode(self, lat: float, lng: float) -> Optional[Dict]:
+        """逆地理编码（交给 fallback）"""
+        if self.fallback is not None:
+            return await self.fallback.reverse_geocode(lat, lng)
+        return None
+
+    async def _fetch_matrix_chunk(
+        self,
+        origins: np.ndarray,
+        destinations: np.ndarray,
+        mode: str
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """按直线距离估算矩阵"""
+        return estimate_route_matrix(origins, destinations, mode)
@@ -1,9 +1,16 @@
 """
 地图服务集成（腾讯地图/高德地图）
 """
-import httpx
+import asyncio
+import numpy as np
 from typing import List, Dict, Optional, Tuple
 from app.config import settings
+from core.calibration import travel_time_calibrator
+from services.http_client import map_http_client
+from services.quota import quota_manager, QuotaExceeded
+from services.route_cache import route_cache
+from services.poi_cache import poi_cache
+from core.geo import SPEED_MAP, DEFAULT_SPEED, ROUTE_FACTOR, haversine_matrix, normalize_mode
 import logging
 import json
 import hashlib
@@ -11,12 +18,222 @@ from urllib.parse import urlencode
 
 logger = logging.getLogger(__name__)
 
+# 距离矩阵分块并发请求数
+MATRIX_CONCURRENCY = 4
+
+# 腾讯地图"查询无结果"状态码
+TENCENT_NO_RESULT = 347
+
+
+class GeocodeError(Exception):
+    """地理编码接口出错（区别于地址未找到，结果不应缓存）"""
+
+
+def estimate_route_matrix(
+    origins: np.ndarray,
+    destinations: np.ndarray,
+    mode: str = "driving"
+) -> Dict[str, np.ndarray]:
+    """
+    按直线距离估算距离矩阵（地图API不可用或不支持该出行方式时使用）
+
+    Args:
+        origins: 起点坐标，形状 (N, 2)
+        destinations: 终点坐标，形状 (M, 2)
+        mode: 出行方式
+
+    Returns:
+        {"distance": 距离矩阵（米）, "duration": 耗时矩阵（分钟）}
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    mode = normalize_mode(mode)
+    distance_km = haversine_matrix(origins, destinations) * ROUTE_FACTOR
+    factors = travel_time_calibrator.factors(origins, [mode] * len(origins))
+    duration = distance_km / SPEED_MAP.get(mode, DEFAULT_SPEED) * 60 * factors[:, np.newaxis]
+    return {"distance": distance_km * 1000, "duration": duration}
+
+
+def cost_to_price_level(cost) -> Optional[int]:
+    """将人均消费（元）转换为1-5的价格等级"""
+    try:
+        cost = float(cost)
+    except (TypeError, ValueError):
+        return None
+    if cost <= 0:
+        return None
+    for level, upper in enumerate((50, 100, 200, 500), start=1):
+        if cost < upper:
+            return level
+    return 5
+
+
+def normalize_geocode(result: Dict) -> Dict:
+    """
+    统一不同服务商返回的地理编码字段（空字符串/空列表转为None）
+
+    Returns:
+        {"lat", "lng", "formatted_address", "province", "city", "district"}
+    """
+    def text(value):
+        return value if isinstance(value, str) and value else None
+
+    return {
+        "lat": float(result["lat"]),
+        "lng": float(result["lng"]),
+        "formatted_address": text(result.get("formatted_address")),
+        "province": text(result.get("province")),
+        "city": text(result.get("city")),
+        "district": text(result.get("district"))
+    }
+
+
+def normalize_region(result: Dict) -> Dict:
+    """
+    统一不同服务商返回的逆地理编码字段（空字符串/空列表转为None）
+
+    Returns:
+        {"formatted_address", "province", "city", "district", "street"}
+    """
+    def text(value):
+        return value if isinstance(value, str) and value else None
+
+    return {
+        "formatted_address": text(result.get("formatted_address")),
+        "province": text(result.get("province")),
+        "city": text(result.get("city")),
+        "district": text(result.get("district")),
+        "street": text(result.get("street"))
+    }
+
+
+def normalize_place(place: Dict) -> Dict:
+    """
+    统一不同服务商返回的地点字段（空字符串/空列表转为None，评分和价格转为数字）
+
+    Args:
+        place: 服务商解析出的地点
+
+    Returns:
+        {"id", "name", "address", "lat", "lng", "type", "rating", "price_level", "tel"}
+    """
+    def text(value):
+        return value if isinstance(value, str) and value else None
+
+    try:
+        rating = float(place.get("rating"))
+        rating = rating if rating > 0 else None
+    except (TypeError, ValueError):
+        rating = None
+
+    return {
+        "id": text(place.get("id")),
+        "name": text(place.get("name")) or "未知地点",
+        "address": text(place.get("address")) or "",
+        "lat": float(place["lat"]),
+        "lng": float(place["lng"]),
+        "type": text(place.get("type")) or "餐厅",
+        "rating": rating,
+        "price_level": place.get("price_level"),
+        "tel": text(place.get("tel"))
+    }
+
+
 class MapService:
     """地图服务基类"""
+
+    # 单次矩阵请求的 (最多起点数, 最多终点数)
+    matrix_limits: Tuple[int, int] = (10, 10)
+
+    # 是否将服务商返回的路线耗时写入路线缓存
+    cache_routes: bool = True
+
+    # 是否将服务商返回的路线耗时记为通勤时间校准样本（返回估算值的服务不记录）
+    calibrate_routes: bool = True
+
+    # 服务商标识（用于配额和缓存键）
+    provider: str = ""
+
+    @property
+    def geocode_cacheable(self) -> bool:
+        """地理编码结果是否来自真实的服务商接口（模拟坐标和未配置Key时的结果不缓存）"""
+        return True
     
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=10.0)
+        # 所有地图服务共用应用级连接池
+        self.client = map_http_client
+        self.key = None
+
+    async def _get(self, url: str, params: Dict = None):
+        """
+        发送地图API请求，先按当前请求优先级获取配额
+
+        Raises:
+            QuotaExceeded: 配额不足
+        """
+        await quota_manager.acquire(self.provider, self.key)
+        return await self.client.get(url, params=params)
     
+    def _get_mock_places(self, center: Tuple[float, float]) -> List[Dict]:
+        """获取模拟数据（开发测试用）"""
+        mock_places = [
+            {
+                "id": "mock_1",
+                "name": "海底捞火锅(国贸店)",
+                "address": "北京市朝阳区建国门外大街1号国贸商城",
+                "lat": center[0] + 0.01,
+                "lng": center[1] + 0.01,
+                "type": "火锅",
+                "rating": 4.8,
+                "price_level": 3,
+                "tel": "010-12345678"
+            },
+            {
+                "id": "mock_2",
+                "name": "西贝莜面村(三里屯店)",
+                "address": "北京市朝阳区三里屯路19号",
+                "lat": center[0] - 0.008,
+                "lng": center[1] + 0.012,
+                "type": "中餐",
+                "rating": 4.6,
+                "price_level": 2,
+                "tel": "010-87654321"
+            },
+            {
+                "id": "mock_3",
+                "name": "星巴克(CBD店)",
+                "address": "北京市朝阳区CBD核心区",
+                "lat": center[0] + 0.005,
+                "lng": center[1] - 0.008,
+                "type": "咖啡厅",
+                "rating": 4.5,
+                "price_level": 2,
+                "tel": "010-11111111"
+            },
+            {
+                "id": "mock_4",
+                "name": "绿茶餐厅(朝阳大悦城店)",
+                "address": "北京市朝阳区朝阳北路101号",
+                "lat": center[0] - 0.012,
+                "lng": center[1] - 0.005,
+                "type": "中餐",
+                "rating": 4.7,
+                "price_level": 2,
+                "tel": "010-22222222"
+            },
+            {
+                "id": "mock_5",
+                "name": "必胜客(望京店)",
+                "address": "北京市朝阳区望京街",
+                "lat": center[0] + 0.015,
+                "lng": center[1] - 0.01,
+                "type": "西餐",
+                "rating": 4.3,
+                "price_level": 2,
+                "tel": "010-33333333"
+            }
+        ]
+        return mock_places
+
     async def search_nearby(self, center: Tuple[float, float], keyword: str, radius: int) -> List[Dict]:
         """搜索附近的地点"""
         raise NotImplementedError
@@ -25,15 +242,173 @@ class MapService:
         """计算路线"""
         raise NotImplementedError
 
+    async def geocode(self, address: str, city: Optional[str] = None) -> Optional[Dict]:
+        """
+        地址转坐标（地理编码）
+
+        Args:
+            address: 地址
+            city: 限定城市
+
+        Returns:
+            normalize_geocode 字段；地址未找到时返回None
+
+        Raises:
+            GeocodeError: 接口出错
+            QuotaExceeded: 配额不足
+        """
+        return None
+
+    async def reverse_geocode(self, lat: float, lng: float) -> Optional[Dict]:
+        """
+        坐标转地址（逆地理编码）
+
+        Returns:
+            normalize_region 字段；接口出错时返回None
+        """
+        return None
+
+    def _mock_geocode(self, address: str) -> Dict:
+        """模拟地理编码（开发测试用，同一地址在各进程中结果相同）"""
+        digest = int(hashlib.md5(address.encode("utf-8")).hexdigest()[:8], 16)
+        return normalize_geocode({
+            "lat": round(39.908 + (digest % 100) / 10000, 6),
+            "lng": round(116.397 + (digest // 100 % 100) / 10000, 6),
+            "formatted_address": address
+        })
+
+    async def _fetch_matrix_chunk(
+        self,
+        origins: np.ndarray,
+        destinations: np.ndarray,
+        mode: str
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        请求一块距离矩阵（不超过 matrix_limits）
+
+        Returns:
+            {"distance": 米, "duration": 分钟}，缺失的元素为NaN；不支持或失败时返回None
+        """
+        return None
+
+    async def distance_matrix(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+        mode: str = "driving"
+    ) -> Dict[str, np.ndarray]:
+        """
+        批量计算 起点×终点 的路线距离和耗时
+
+        先查路线缓存，只请求含未命中元素的分块；按服务商单次请求上限分块，
+        各块并发请求后拼接成矩阵并写回缓存，同时作为通勤时间校准样本；
+        请求失败或服务商不支持的元素用直线距离估算值补齐。
+
+        Args:
+            origins: 起点列表 [(纬度, 经度)]
+            destinations: 终点列表 [(纬度, 经度)]
+            mode: 出行方式 driving/transit/walking/bicycling
+
+        Returns:
+            {"distance": 距离矩阵（米）, "duration": 耗时矩阵（分钟）, "routed": 是否为服务商返回的路线（布尔矩阵）}，
+            形状均为 (N, M)；routed 为False的元素是估算值
+        """
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+        destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+        n, m = len(origins), len(destinations)
+
+        distance = np.full((n, m), np.nan)
+        duration = np.full((n, m), np.nan)
+
+        # 读取已缓存的路线
+        keys = route_cache.matrix_keys(origins, destinations, mode) if self.cache_routes else []
+        if keys:
+            for index, value in enumerate(await route_cache.cache.get_many(keys)):
+                if value is not None:
+                    distance[index // m, index % m], duration[index // m, index % m] = value
+
+        max_origins, max_destinations = self.matrix_limits
+        blocks = [
+            (i, j)
+            for i in range(0, n, max_origins)
+            for j in range(0, m, max_destinations)
+            if np.isnan(duration[i:i + max_origins, j:j + max_destinations]).any()
+        ]
+        semaphore = asyncio.Semaphore(MATRIX_CONCURRENCY)
+
+        async def fetch(i: int, j: int):
+            async with semaphore:
+                return await self._fetch_matrix_chunk(
+                    origins[i:i + max_origins],
+                    destinations[j:j + max_destinations],
+                    mode
+                )
+
+        results = await asyncio.gather(*[fetch(i, j) for i, j in blocks], return_exceptions=True)
+        fetched = {}
+        for (i, j), result in zip(blocks, results):
+            if isinstance(result, Exception):
+                logger.error(f"Distance matrix chunk ({i}, {j}) failed: {result}")
+                continue
+            if result is None:
+                continue
+            rows, cols = result["distance"].shape
+            distance[i:i + rows, j:j + cols] = result["distance"]
+            duration[i:i + rows, j:j + cols] = result["duration"]
+
+            if keys:
+                for r, c in zip(*np.nonzero(~np.isnan(result["duration"]) & ~np.isnan(result["distance"]))):
+                    fetched[keys[(i + r) * m + j + c]] = [
+                        float(result["distance"][r, c]),
+                        float(result["duration"][r, c])
+                    ]
+
+            # 记录真实耗时用于通勤时间校准
+            if self.calibrate_routes:
+                travel_time_calibrator.record_matrix(
+                    origins[i:i + rows], destinations[j:j + cols], mode, result["duration"]
+                )
+
+        # 写回路线缓存
+        if fetched:
+            await route_cache.cache.set_many(fetched)
+
+        # 缺失的元素使用估算值
+        missing = np.isnan(duration) | np.isnan(distance)
+        if missing.any():
+            estimate = estimate_route_matrix(origins, destinations, mode)
+            distance[missing] = estimate["distance"][missing]
+            duration[missing] = estimate["duration"][missing]
+
+        return {"distance": distance, "duration": duration, "routed": ~missing}
+
 class TencentMapService(MapService):
     """腾讯地图服务"""
 
+    provider = "tencent"
+
+    # 批量距离计算接口单次请求上限（保守取值，起点数×终点数不超过200）
+    matrix_limits = (10, 20)
+
+    # 批量距离计算支持的出行方式（不支持公交）
+    matrix_modes = {
+        "driving": "driving",
+        "walking": "walking",
+        "bicycling": "bicycling",
+        "cycling": "bicycling"
+    }
+
     def __init__(self):
         super().__init__()
         self.key = settings.TENCENT_MAP_KEY
         self.sk = settings.TENCENT_MAP_SK
         self.base_url = "https://apis.map.qq.com"
 
+    @property
+    def geocode_cacheable(self) -> bool:
+        """未配置Key时返回模拟坐标，不缓存"""
+        return bool(self.key)
+
     def _generate_signature(self, path: str, params: Dict) -> str:
         """
         生成腾讯地图API的SK签名
@@ -94,6 +469,23 @@ class TencentMapService(MapService):
             logger.warning("Tencent Map API key not configured, using mock data")
             return self._get_mock_places(center)
 
+        # 经POI缓存读取，接口出错（含短时缓存的错误）或配额不足时使用模拟数据
+        try:
+            places = await poi_cache.get_or_fetch(self.provider, center, keyword, radius, self._fetch_nearby)
+        except QuotaExceeded as e:
+            logger.warning(f"Tencent search skipped: {e}")
+            places = None
+        if places is None:
+            return self._get_mock_places(center)
+        return places
+
+    async def _fetch_nearby(self, center: Tuple[float, float], keyword: str, radius: int) -> Optional[List[Dict]]:
+        """
+        调用腾讯地图地点搜索接口
+
+        Returns:
+            地点列表；接口出错时返回None
+        """
         path = "/ws/place/v1/search"
         url = f"{self.base_url}{path}"
         params = {
@@ -110,33 +502,36 @@ class TencentMapService(MapService):
             params["sig"] = signature
 
         try:
-            response = await self.client.get(url, params=params)
+            response = await self._get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 print(data)
                 if data.get("status") == 0:
                     places = []
                     for item in data.get("data", []):
-                        places.append({
+                        places.append(normalize_place({
                             "id": item.get("id"),
                             "name": item.get("title"),
                             "address": item.get("address"),
                             "lat": item["location"]["lat"],
                             "lng": item["location"]["lng"],
                             "type": item.get("category", "餐厅"),
-                            "rating": item.get("_distance", {}).get("rating"),
+                            "rating": item.get("rating"),
                             "price_level": self._parse_price_level(item.get("price")),
                             "tel": item.get("tel")
-                        })
+                        }))
                     return places
                 else:
                     logger.error(f"Tencent Map API error: status={data.get('status')}, message={data.get('message')}")
             else:
                 logger.error(f"Tencent Map API HTTP error: {response.status_code}, {response.text}")
+        except QuotaExceeded:
+            # 配额不足交给调用方处理（多服务商路由时不计入熔断）
+            raise
         except Exception as e:
             logger.error(f"Failed to search nearby places: {e}")
 
-        return self._get_mock_places(center)
+        return None
     
     async def calculate_route(self, from_point: Tuple[float, float], to_point: Tuple[float, float], mode: str = "driving") -> Dict:
         """
@@ -158,6 +553,11 @@ class TencentMapService(MapService):
                 "mode": mode
             }
 
+        # 先查路线缓存
+        cached = await route_cache.get(from_point, to_point, mode)
+        if cached:
+            return {**cached, "mode": mode}
+
         # 腾讯地图出行方式映射
         path_map = {
             "driving": "/ws/direction/v1/driving",
@@ -180,16 +580,22 @@ class TencentMapService(MapService):
             params["sig"] = signature
 
         try:
-            response = await self.client.get(url, params=params)
+            response = await self._get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get("status") == 0 and data.get("result"):
                     routes = data["result"]["routes"]
                     if routes:
                         route = routes[0]
+                        duration = route.get("duration", 0) / 60  # 转换为分钟
+
+                        # 记录真实耗时用于通勤时间校准，并写入路线缓存
+                        travel_time_calibrator.record(from_point, to_point, mode, duration)
+                        await route_cache.set(from_point, to_point, mode, route.get("distance", 0), duration)
+
                         return {
                             "distance": route.get("distance", 0),
-                            "duration": route.get("duration", 0) / 60,  # 转换为分钟
+                            "duration": duration,
                             "mode": mode
                         }
                 else:
@@ -206,6 +612,135 @@ class TencentMapService(MapService):
             "mode": mode
         }
     
+    async def _fetch_matrix_chunk(
+        self,
+        origins: np.ndarray,
+        destinations: np.ndarray,
+        mode: str
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        调用腾讯地图批量距离计算接口（/ws/distance/v1/matrix）
+
+        Args:
+            origins: 起点坐标，形状 (n, 2)
+            destinations: 终点坐标，形状 (m, 2)
+            mode: 出行方式
+
+        Returns:
+            {"distance": 米, "duration": 分钟}，失败或不支持时返回None
+        """
+        api_mode = self.matrix_modes.get(mode)
+        if not self.key or not api_mode:
+            return None
+
+        path = "/ws/distance/v1/matrix"
+        url = f"{self.base_url}{path}"
+        params = {
+            "key": self.key,
+            "mode": api_mode,
+            "from": ";".join(f"{lat},{lng}" for lat, lng in origins),
+            "to": ";".join(f"{lat},{lng}" for lat, lng in destinations)
+        }
+
+        # 如果配置了SK,生成签名
+        if self.sk:
+            params["sig"] = self._generate_signature(path, params)
+
+        response = await self._get(url, params=params)
+        if response.status_code != 200:
+            logger.error(f"Tencent Map matrix API HTTP error: {response.status_code}")
+            return None
+
+        data = response.json()
+        if data.get("status") != 0:
+            logger.error(f"Tencent Map matrix API error: status={data.get('status')}, message={data.get('message')}")
+            return None
+
+        distance = np.full((len(origins), len(destinations)), np.nan)
+        duration = np.full((len(origins), len(destinations)), np.nan)
+        for i, row in enumerate(data.get("result", {}).get("rows", [])):
+            for j, element in enumerate(row.get("elements", [])):
+                distance[i, j] = element.get("distance", np.nan)
+                duration[i, j] = element.get("duration", np.nan) / 60  # 转换为分钟
+
+        return {"distance": distance, "duration": duration}
+
+    async def geocode(self, address: str, city: Optional[str] = None) -> Optional[Dict]:
+        """调用腾讯地图地理编码接口（未配置Key时返回模拟坐标）"""
+        if not self.key:
+            return self._mock_geocode(address)
+
+        path = "/ws/geocoder/v1/"
+        params = {"key": self.key, "address": address}
+        if city:
+            params["region"] = city
+        if self.sk:
+            params["sig"] = self._generate_signature(path, params)
+
+        # 配额和网络异常直接抛出，只有"查询无结果"返回None
+        response = await self._get(f"{self.base_url}{path}", params=params)
+        if response.status_code != 200:
+            raise GeocodeError(f"Tencent geocoder HTTP error: {response.status_code}")
+
+        data = response.json()
+        if data.get("status") == TENCENT_NO_RESULT:
+            return None
+        if data.get("status") != 0:
+            raise GeocodeError(f"Tencent geocoder error: status={data.get('status')}, message={data.get('message')}")
+
+        try:
+            result = data.get("result", {})
+            components = result.get("address_components", {})
+            return normalize_geocode({
+                "lat": result["location"]["lat"],
+                "lng": result["location"]["lng"],
+                "formatted_address": result.get("title") or address,
+                "province": components.get("province"),
+                "city": components.get("city"),
+                "district": components.get("district")
+            })
+        except (KeyError, TypeError, ValueError) as e:
+            raise GeocodeError(f"Tencent geocoder returned malformed result: {e}")
+
+    async def reverse_geocode(self, lat: float, lng: float) -> Optional[Dict]:
+        """调用腾讯地图逆地理编码接口（未配置Key时返回模拟地址）"""
+        if not self.key:
+            return normalize_region({
+                "formatted_address": f"北京市朝阳区（{lat:.3f}, {lng:.3f}）附近",
+                "province": "北京市",
+                "city": "北京市",
+                "district": "朝阳区"
+            })
+
+        path = "/ws/geocoder/v1/"
+        params = {"key": self.key, "location": f"{lat},{lng}"}
+        if self.sk:
+            params["sig"] = self._generate_signature(path, params)
+
+        try:
+            response = await self._get(f"{self.base_url}{path}", params=params)
+            if response.status_code != 200:
+                logger.error(f"Tencent reverse geocoder HTTP error: {response.status_code}")
+                return None
+
+            data = response.json()
+            if data.get("status") != 0:
+                logger.warning(f"Tencent reverse geocoder error: status={data.get('status')}, message={data.get('message')}")
+                return None
+
+            result = data.get("result", {})
+            components = result.get("address_component", {})
+            return normalize_region({
+                "formatted_address": (result.get("formatted_addresses") or {}).get("recommend") or result.get("address"),
+                "province": components.get("province"),
+                "city": components.get("city"),
+                "district": components.get("district"),
+                "street": components.get("street")
+            })
+        except Exception as e:
+            logger.error(f"Tencent reverse geocoding failed: {e}")
+            return None
+
     def _parse_price_level(self, price_str: str) -> Optional[int]:
         """解析价格等级"""
         if not price_str:
@@ -222,80 +757,49 @@ class TencentMapService(MapService):
         else:
             return 5
     
-    def _get_mock_places(self, center: Tuple[float, float]) -> List[Dict]:
-        """获取模拟数据（开发测试用）"""
-        mock_places = [
-            {
-                "id": "mock_1",
-                "name": "海底捞火锅(国贸店)",
-                "address": "北京市朝阳区建国门外大街1号国贸商城",
-                "lat": center[0] + 0.01,
-                "lng": center[1] + 0.01,
-                "type": "火锅",
-                "rating": 4.8,
-                "price_level": 3,
-                "tel": "010-12345678"
-            },
-            {
-                "id": "mock_2",
-                "name": "西贝莜面村(三里屯店)",
-                "address": "北京市朝阳区三里屯路19号",
-                "lat": center[0] - 0.008,
-                "lng": center[1] + 0.012,
-                "type": "中餐",
-                "rating": 4.6,
-                "price_level": 2,
-                "tel": "010-87654321"
-            },
-            {
-                "id": "mock_3",
-                "name": "星巴克(CBD店)",
-                "address": "北京市朝阳区CBD核心区",
-                "lat": center[0] + 0.005,
-                "lng": center[1] - 0.008,
-                "type": "咖啡厅",
-                "rating": 4.5,
-                "price_level": 2,
-                "tel": "010-11111111"
-            },
-            {
-                "id": "mock_4",
-                "name": "绿茶餐厅(朝阳大悦城店)",
-                "address": "北京市朝阳区朝阳北路101号",
-                "lat": center[0] - 0.012,
-                "lng": center[1] - 0.005,
-                "type": "中餐",
-                "rating": 4.7,
-                "price_level": 2,
-                "tel": "010-22222222"
-            },
-            {
-                "id": "mock_5",
-                "name": "必胜客(望京店)",
-                "address": "北京市朝阳区望京街",
-                "lat": center[0] + 0.015,
-                "lng": center[1] - 0.01,
-                "type": "西餐",
-                "rating": 4.3,
-                "price_level": 2,
-                "tel": "010-33333333"
-            }
-        ]
-        return mock_places
-
 class AMapService(MapService):
     """高德地图服务（备用）"""
+
+    provider = "amap"
+
+    # 距离测量接口单次最多100个起点、1个终点
+    matrix_limits = (100, 1)
+
+    # 距离测量接口的 type 参数：1 驾车，3 步行
+    matrix_types = {
+        "driving": "1",
+        "walking": "3"
+    }
     
     def __init__(self):
         super().__init__()
         self.key = settings.AMAP_KEY
         self.base_url = "https://restapi.amap.com"
+
+    @property
+    def geocode_cacheable(self) -> bool:
+        """未配置Key时不请求接口，不缓存"""
+        return bool(self.key)
     
     async def search_nearby(self, center: Tuple[float, float], keyword: str = "餐厅", radius: int = 3000) -> List[Dict]:
         """搜索附近的地点（高德地图实现）"""
         if not self.key:
             return []
-        
+
+        try:
+            places = await poi_cache.get_or_fetch(self.provider, center, keyword, radius, self._fetch_nearby)
+        except QuotaExceeded as e:
+            logger.warning(f"AMap search skipped: {e}")
+            places = None
+        return places or []
+
+    async def _fetch_nearby(self, center: Tuple[float, float], keyword: str, radius: int) -> Optional[List[Dict]]:
+        """
+        调用高德地图周边搜索接口
+
+        Returns:
+            地点列表；接口出错时返回None
+        """
         url = f"{self.base_url}/v3/place/around"
         params = {
             "key": self.key,
@@ -307,7 +811,7 @@ class AMapService(MapService):
         }
         
         try:
-            response = await self.client.get(url, params=params)
+            response = await self._get(url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get("status") == "1":
@@ -315,29 +819,247 @@ class AMapService(MapService):
                     for item in data.get("pois", []):
                         location = item.get("location", "").split(",")
                         if len(location) == 2:
-                            places.append({
+                            biz_ext = item.get("biz_ext") or {}
+                            places.append(normalize_place({
                                 "id": item.get("id"),
                                 "name": item.get("name"),
                                 "address": item.get("address"),
                                 "lng": float(location[0]),
                                 "lat": float(location[1]),
-                                "type": item.get("type", "").split(";")[0],
-                                "rating": float(item.get("rating", 0)),
+                                "type": (item.get("type") or "").split(";")[0],
+                                "rating": biz_ext.get("rating") or item.get("rating"),
+                                "price_level": self._parse_price_level(biz_ext.get("cost")),
                                 "tel": item.get("tel")
-                            })
+                            }))
                     return places
+                logger.error(f"AMap search API error: info={data.get('info')}")
+            else:
+                logger.error(f"AMap search API HTTP error: {response.status_code}")
+        except QuotaExceeded:
+            raise
         except Exception as e:
             logger.error(f"Failed to search with AMap: {e}")
         
-        return []
+        return None
+
+    async def _fetch_matrix_chunk(
+        self,
+        origins: np.ndarray,
+        destinations: np.ndarray,
+        mode: str
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        调用高德地图距离测量接口（/v3/distance，多起点对单终点）
+
+        Args:
+            origins: 起点坐标，形状 (n, 2)
+            destinations: 终点坐标，形状 (1, 2)
+            mode: 出行方式
+
+        Returns:
+            {"distance": 米, "duration": 分钟}，失败或不支持时返回None
+        """
+        api_type = self.matrix_types.get(mode)
+        if not self.key or not api_type:
+            return None
+
+        url = f"{self.base_url}/v3/distance"
+        params = {
+            "key": self.key,
+            "origins": "|".join(f"{lng},{lat}" for lat, lng in origins),  # 高德使用经度,纬度
+            "destination": f"{destinations[0][1]},{destinations[0][0]}",
+            "type": api_type
+        }
+
+        response = await self._get(url, params=params)
+        if response.status_code != 200:
+            logger.error(f"AMap distance API HTTP error: {response.status_code}")
+            return None
+
+        data = response.json()
+        if data.get("status") != "1":
+            logger.error(f"AMap distance API error: info={data.get('info')}")
+            return None
+
+        distance = np.full((len(origins), 1), np.nan)
+        duration = np.full((len(origins), 1), np.nan)
+        for result in data.get("results", []):
+            i = int(result.get("origin_id", 0)) - 1  # origin_id 从1开始
+            if 0 <= i < len(origins):
+                distance[i, 0] = float(result.get("distance", np.nan))
+                duration[i, 0] = float(result.get("duration", np.nan)) / 60  # 转换为分钟
+
+        return {"distance": distance, "duration": duration}
+
+    async def geocode(self, address: str, city: Optional[str] = None) -> Optional[Dict]:
+        """调用高德地图地理编码接口"""
+        if not self.key:
+            return None
+
+        params = {"key": self.key, "address": address}
+        if city:
+            params["city"] = city
+
+        # 配额和网络异常直接抛出，只有成功但没有结果时返回None
+        response = await self._get(f"{self.base_url}/v3/geocode/geo", params=params)
+        if response.status_code != 200:
+            raise GeocodeError(f"AMap geocoder HTTP error: {response.status_code}")
+
+        data = response.json()
+        if data.get("status") != "1":
+            raise GeocodeError(f"AMap geocoder error: info={data.get('info')}")
+
+        geocodes = data.get("geocodes") or []
+        if not geocodes:
+            return None
+
+        try:
+            item = geocodes[0]
+            lng, lat = item["location"].split(",")
+            return normalize_geocode({
+                "lat": lat,
+                "lng": lng,
+                "formatted_address": item.get("formatted_address") or address,
+                "province": item.get("province"),
+                "city": item.get("city"),
+                "district": item.get("district")
+            })
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise GeocodeError(f"AMap geocoder returned malformed result: {e}")
+
+    async def reverse_geocode(self, lat: float, lng: float) -> Optional[Dict]:
+        """调用高德地图逆地理编码接口"""
+        if not self.key:
+            return None
+
+        try:
+            response = await self._get(
+                f"{self.base_url}/v3/geocode/regeo",
+                params={"key": self.key, "location": f"{lng},{lat}"}
+            )
+            if response.status_code != 200:
+                logger.error(f"AMap reverse geocoder HTTP error: {response.status_code}")
+                return None
+
+            data = response.json()
+            if data.get("status") != "1":
+                logger.warning(f"AMap reverse geocoder error: info={data.get('info')}")
+                return None
+
+            result = data.get("regeocode", {})
+            components = result.get("addressComponent", {})
+            return normalize_region({
+                "formatted_address": result.get("formatted_address"),
+                "province": components.get("province"),
+                "city": components.get("city") or components.get("province"),
+                "district": components.get("district"),
+                "street": components.get("township")
+            })
+        except Exception as e:
+            logger.error(f"AMap reverse geocoding failed: {e}")
+            return None
+
+    def _parse_price_level(self, cost) -> Optional[int]:
+        """将人均消费（元）转换为1-5的价格等级"""
+        return cost_to_price_level(cost)
+
+class FakeMapService(MapService):
+    """本地确定性地图服务（测试和离线开发用，不发起网络请求）"""
+
+    provider = "fake"
+
+    matrix_limits = (25, 25)
+    cache_routes = False
+    calibrate_routes = False
+
+    async def search_nearby(self, center: Tuple[float, float], keyword: str = "餐厅", radius: int = 3000) -> List[Dict]:
+        """在中心点周围生成确定的候选地点（同一中心和关键词结果相同）"""
+        seed = int(hashlib.md5(f"{keyword}|{center[0]:.4f}|{center[1]:.4f}".encode("utf-8")).hexdigest()[:8], 16)
+        rng = np.random.default_rng(seed)
+
+        # 半径换算为度，在圆内均匀取点
+        radius_deg = radius / 111_000
+        r = radius_deg * np.sqrt(rng.random(20))
+        theta = rng.random(20) * 2 * np.pi
+
+        places = []
+        for k in range(20):
+            lat = center[0] + r[k] * np.cos(theta[k])
+            lng = center[1] + r[k] * np.sin(theta[k]) / np.cos(np.radians(center[0]))
+            places.append({
+                "id": f"fake_{seed:x}_{k}",
+                "name": f"{keyword}{k + 1}号店",
+                "address": f"测试地址{k + 1}号",
+                "lat": round(float(lat), 6),
+                "lng": round(float(lng), 6),
+                "type": keyword,
+                "rating": round(3.5 + float(rng.random()) * 1.5, 1),
+                "price_level": int(rng.integers(1, 5)),
+                "tel": None
+            })
+        return places
+
+    async def calculate_route(self, from_point: Tuple[float, float], to_point: Tuple[float, float], mode: str = "driving") -> Dict:
+        """按直线距离估算路线"""
+        estimate = estimate_route_matrix(np.array([from_point]), np.array([to_point]), mode)
+        return {
+            "distance": float(estimate["distance"][0, 0]),
+            "duration": float(estimate["duration"][0, 0]),
+            "mode": mode
+        }
+
+    async def _fetch_matrix_chunk(
+        self,
+        origins: np.ndarray,
+        destinations: np.ndarray,
+        mode: str
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """按直线距离估算矩阵"""
+        return estimate_route_matrix(origins, destinations, mode)
+
+    @property
+    def geocode_cacheable(self) -> bool:
+        """模拟坐标不缓存"""
+        return False
+
+    async def geocode(self, address: str, city: Optional[str] = None) -> Optional[Dict]:
+        """按地址摘要生成确定的坐标"""
+        return self._mock_geocode(address)
+
+# 已创建的地图服务实例（服务本身无状态，连接池由 map_http_client 共享）
+_map_services: Dict[str, MapService] = {}
 
 # 工厂函数
 def get_map_service() -> MapService:
-    """获取地图服务实例"""
-    if settings.TENCENT_MAP_KEY:
-        return TencentMapService()
+    """获取地图服务实例（配置了本地POI数据集时，地点搜索优先使用本地索引）"""
+    if settings.POI_DATASET_PATH and settings.MAP_PROVIDER != "fake":
+        if "LocalPOIService" not in _map_services:
+            from services.local_poi import LocalPOIService, load_poi_index  # 避免循环导入
+            fallback = None if settings.MAP_PROVIDER == "local" else _get_remote_map_service()
+            _map_services["LocalPOIService"] = LocalPOIService(load_poi_index(settings.POI_DATASET_PATH), fallback)
+        return _map_services["LocalPOIService"]
+    return _get_remote_map_service()
+
+
+def _get_remote_map_service() -> MapService:
+    """获取在线地图服务实例"""
+    # 同时配置两家服务商时使用路由（熔断 + 对冲请求）
+    if settings.MAP_PROVIDER != "fake" and settings.TENCENT_MAP_KEY and settings.AMAP_KEY:
+        if "ProviderRouter" not in _map_services:
+            from services.provider_router import ProviderRouter  # 避免循环导入
+            _map_services["ProviderRouter"] = ProviderRouter([TencentMapService(), AMapService()])
+        return _map_services["ProviderRouter"]
+
+    if settings.MAP_PROVIDER == "fake":
+        service_cls = FakeMapService
+    elif settings.TENCENT_MAP_KEY:
+        service_cls = TencentMapService
     elif settings.AMAP_KEY:
-        return AMapService()
+        service_cls = AMapService
     else:
         # 默认使用腾讯地图（会返回模拟数据）
-        return TencentMapService()
+        service_cls = TencentMapService
+
+    if service_cls.__name__ not in _map_services:
+        _map_services[service_cls.__name__] = service_cls()
+    return _map_services[service_cls.__name__]
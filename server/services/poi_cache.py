@@ -0,0 +1,161 @@
+"""
+POI搜索结果缓存（stale-while-revalidate）
+
+缓存键由搜索中心的 geohash 网格、关键词和半径组成。
+新鲜数据直接返回；过期数据先返回，同时在后台刷新；
+空结果和接口错误只短时缓存，避免反复请求出错的接口。
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from core.geo import geohash_encode
+from services.cache import TwoTierCache
+from services.quota import quota_priority, PRIORITY_BACKGROUND
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 以列存储的POI字段，相同字段名只在缓存中出现一次
+POI_FIELDS = ("id", "name", "address", "lat", "lng", "type", "rating", "price_level", "tel")
+
+# 缓存条目状态
+STATUS_OK = "ok"
+STATUS_EMPTY = "empty"
+STATUS_ERROR = "error"
+
+FetchNearby = Callable[[Tuple[float, float], str, int], Awaitable[Optional[List[Dict]]]]
+
+
+def encode_places(places: List[Dict]) -> Dict[str, list]:
+    """将地点列表转换为列存储"""
+    return {field: [p.get(field) for p in places] for field in POI_FIELDS}
+
+
+def decode_places(columns: Dict[str, list]) -> List[Dict]:
+    """将列存储还原为地点列表"""
+    fields = [f for f in POI_FIELDS if f in columns]
+    return [dict(zip(fields, row)) for row in zip(*(columns[f] for f in fields))]
+
+
+class POICache:
+    """POI搜索结果缓存"""
+
+    def __init__(
+        self,
+        precision: int = 6,
+        fresh_ttl: int = 600,
+        stale_ttl: int = 24 * 3600,
+        negative_ttl: int = 60,
+        local_size: int = 5000
+    ):
+        self.precision = precision
+        self.fresh_ttl = fresh_ttl
+        self.negative_ttl = negative_ttl
+        self.cache = TwoTierCache(namespace="poi", ttl=fresh_ttl + stale_ttl, local_size=local_size)
+
+        # 正在后台刷新的缓存键
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.stale_served = 0
+        self.refreshes = 0
+
+    def key(self, provider: str, center: Tuple[float, float], keyword: str, radius: int) -> str:
+        """缓存键"""
+        return f"{provider}:{geohash_encode(center[0], center[1], self.precision)}:{keyword}:{radius}"
+
+    async def _store(self, key: str, places: Optional[List[Dict]]):
+        """写入缓存，空结果和接口错误只短时缓存"""
+        if places is None:
+            entry, ttl = {"t": time.time(), "s": STATUS_ERROR}, self.negative_ttl
+        elif not places:
+            entry, ttl = {"t": time.time(), "s": STATUS_EMPTY}, self.negative_ttl
+        else:
+            entry, ttl = {"t": time.time(), "s": STATUS_OK, "c": encode_places(places)}, None
+
+        await self.cache.set(key, entry, ttl)
+
+    def _refresh_in_background(self, key: str, entry: Dict, fetch: FetchNearby, center: Tuple[float, float], keyword: str, radius: int):
+        """
+        后台刷新过期条目（同一个键同时只刷新一次）
+
+        刷新时接口出错则保留旧数据，并推迟 negative_ttl 秒后再尝试刷新。
+        """
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        self.refreshes += 1
+
+        async def refresh():
+            try:
+                # 后台刷新使用低优先级配额
+                with quota_priority(PRIORITY_BACKGROUND):
+                    places = await fetch(center, keyword, radius)
+                if places is None:
+                    retry_at = time.time() - self.fresh_ttl + self.negative_ttl
+                    await self.cache.set(key, {**entry, "t": retry_at})
+                else:
+                    await self._store(key, places)
+            except Exception as e:
+                logger.error(f"Background POI refresh failed for {key}: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get_or_fetch(
+        self,
+        provider: str,
+        center: Tuple[float, float],
+        keyword: str,
+        radius: int,
+        fetch: FetchNearby
+    ) -> Optional[List[Dict]]:
+        """
+        读取POI搜索结果，未命中时请求接口
+
+        Args:
+            provider: 地图服务商标识
+            center: 搜索中心 (纬度, 经度)
+            keyword: 搜索关键词
+            radius: 搜索半径（米）
+            fetch: 请求接口的协程函数，出错时返回None
+
+        Returns:
+            地点列表；接口出错（或错误仍在缓存期内）时返回None
+        """
+        key = self.key(provider, center, keyword, radius)
+        entry = await self.cache.get(key)
+
+        if entry is None:
+            places = await fetch(center, keyword, radius)
+            await self._store(key, places)
+            return places
+
+        if entry["s"] == STATUS_OK:
+            if time.time() - entry["t"] >= self.fresh_ttl:
+                self.stale_served += 1
+                self._refresh_in_background(key, entry, fetch, center, keyword, radius)
+            return decode_places(entry["c"])
+
+        return [] if entry["s"] == STATUS_EMPTY else None
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        return {
+            **self.cache.stats(),
+            "stale_served": self.stale_served,
+            "refreshes": self.refreshes
+        }
+
+
+# 全局POI缓存
+poi_cache = POICache(
+    precision=settings.POI_CACHE_PRECISION,
+    fresh_ttl=settings.POI_CACHE_FRESH_TTL,
+    stale_ttl=settings.POI_CACHE_STALE_TTL,
+    negative_ttl=settings.POI_CACHE_NEGATIVE_TTL
+)
@@ -0,0 +1,155 @@
+"""
+POI列存储文件格式（内存映射）
+
+文件布局（小端序）：
+    8字节魔数 | 8字节头部长度 | JSON头部 | 数据区（各列按64字节对齐，头部记录各列相对数据区的偏移）
+
+数值列（坐标、网格键、评分、价格等级、类别编号）直接以 NumPy 数组存储；
+字符串列（id、名称、地址、电话）存为 UTF-8 字节串 + 偏移数组。
+打开时用 mmap 只读映射整个文件，各列是指向映射内存的零拷贝数组：
+启动几乎不耗时，同一台机器上的多个 worker 共享同一份页缓存。
+"""
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List, Sequence
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"YBPOI001"
+POI_STORE_SUFFIX = ".ybpoi"
+ALIGNMENT = 64
+
+# 数值列及其存储类型
+NUMERIC_COLUMNS = {
+    "lat": "<f8",
+    "lng": "<f8",
+    "keys": "<i8",
+    "rating": "<f4",
+    "price_level": "<i1",
+    "category": "<i4",
+}
+
+# 字符串列
+STRING_COLUMNS = ("ids", "names", "addresses", "tels")
+
+
+class StringColumn:
+    """内存映射的字符串列（按下标解码，不在内存中展开为Python字符串）"""
+
+    def __init__(self, buffer: mmap.mmap, offsets: np.ndarray, base: int):
+        """
+        Args:
+            buffer: 映射的文件
+            offsets: 各字符串在字节串中的起止偏移，长度 n + 1
+            base: 字节串在文件中的起始位置
+        """
+        self.buffer = buffer
+        self.offsets = offsets
+        self.base = base
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, k: int) -> str:
+        start, end = self.offsets[k], self.offsets[k + 1]
+        return self.buffer[self.base + int(start):self.base + int(end)].decode("utf-8")
+
+
+def _encode_strings(values: Sequence[str]):
+    """字符串列编码为 (偏移数组, 字节串)"""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def _padding(position: int) -> bytes:
+    return b"\0" * (-position % ALIGNMENT)
+
+
+def write_poi_store(index, path: str):
+    """
+    将POI索引写入列存储文件（先写临时文件再替换，正在使用旧文件的 worker 不受影响）
+
+    Args:
+        index: POIIndex
+        path: 输出文件路径
+    """
+    blocks: List[bytes] = []
+    columns: Dict[str, Dict] = {}
+
+    for name, dtype in NUMERIC_COLUMNS.items():
+        array = np.ascontiguousarray(getattr(index, name), dtype=dtype)
+        columns[name] = {"dtype": dtype, "count": len(array)}
+        blocks.append(array.tobytes())
+
+    for name in STRING_COLUMNS:
+        offsets, blob = _encode_strings([getattr(index, name)[k] for k in range(len(index))])
+        columns[f"{name}.offsets"] = {"dtype": "<u8", "count": len(offsets)}
+        blocks.append(offsets.tobytes())
+        columns[f"{name}.data"] = {"dtype": "|u1", "count": len(blob)}
+        blocks.append(blob)
+
+    header = {
+        "count": len(index),
+        "cell_deg": index.cell_deg,
+        "categories": list(index.categories),
+        "columns": columns,
+    }
+
+    # 各列偏移相对于数据区起点（头部之后按64字节对齐的位置）
+    position = 0
+    for meta, block in zip(columns.values(), blocks):
+        meta["offset"] = position
+        position += len(block) + len(_padding(len(block)))
+    encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        f.write(_padding(f.tell()))
+        for block in blocks:
+            f.write(block)
+            f.write(_padding(len(block)))
+    os.replace(tmp_path, path)
+
+
+def open_poi_store(path: str) -> Dict:
+    """
+    内存映射打开列存储文件
+
+    Returns:
+        POIIndex 的构造参数（各列为指向映射内存的只读数组）
+
+    Raises:
+        ValueError: 文件格式不正确
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"Not a POI store file: {path}")
+    (header_length,) = struct.unpack_from("<Q", buffer, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    header = json.loads(buffer[header_start:header_start + header_length].decode("utf-8"))
+    columns = header["columns"]
+    data_start = header_start + header_length
+    data_start += len(_padding(data_start))
+
+    def column(name: str) -> np.ndarray:
+        meta = columns[name]
+        return np.frombuffer(buffer, dtype=meta["dtype"], count=meta["count"], offset=data_start + meta["offset"])
+
+    store = {name: column(name) for name in NUMERIC_COLUMNS}
+    for name in STRING_COLUMNS:
+        store[name] = StringColumn(buffer, column(f"{name}.offsets"), data_start + columns[f"{name}.data"]["offset"])
+
+    store["categories"] = header["categories"]
+    store["cell_deg"] = header["cell_deg"]
+    return store
@@ -0,0 +1,259 @@
+"""
+地图服务商路由
+
+同时配置了腾讯地图和高德地图时，按健康状况选择服务商：
+每个服务商有独立的熔断器和延迟统计；地点搜索先请求最健康的服务商，
+超过其 p95 延迟仍未返回时向下一个服务商发起对冲请求，取最先成功的结果。
+"""
+import asyncio
+import time
+from collections import deque
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from services.map_service import MapService
+from services.poi_cache import poi_cache
+from services.quota import QuotaExceeded
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 熔断器状态
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后熔断，冷却后放行一个探测请求"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """是否允许发起请求"""
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = STATE_HALF_OPEN
+        if self.state == STATE_HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = STATE_OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """请求被取消（对冲落败）时释放探测名额"""
+        self._probing = False
+
+
+class ProviderHealth:
+    """服务商健康状况：熔断器 + 最近延迟 + 错误率"""
+
+    def __init__(self, name: str, window: int = 100):
+        self.name = name
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.MAP_BREAKER_FAILURES,
+            reset_timeout=settings.MAP_BREAKER_RESET_SECONDS
+        )
+        self.latencies: deque = deque(maxlen=window)
+        self.error_rate = 0.0
+
+    def record(self, latency: float, success: bool):
+        """记录一次请求结果"""
+        self.latencies.append(latency)
+        self.error_rate = 0.9 * self.error_rate + 0.1 * (0.0 if success else 1.0)
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def percentile(self, q: float) -> Optional[float]:
+        """最近请求延迟的分位数（秒），样本不足时返回None"""
+        if len(self.latencies) < 10:
+            return None
+        return float(np.percentile(np.fromiter(self.latencies, dtype=np.float64), q))
+
+    def hedge_delay(self) -> float:
+        """发起对冲请求前的等待时间：p95 延迟，样本不足时使用默认值"""
+        p95 = self.percentile(95)
+        return max(p95, settings.MAP_HEDGE_MIN_DELAY) if p95 is not None else settings.MAP_HEDGE_DEFAULT_DELAY
+
+    def score(self) -> float:
+        """健康分（越小越好）：中位延迟按错误率加权"""
+        p50 = self.percentile(50)
+        latency = p50 if p50 is not None else settings.MAP_HEDGE_DEFAULT_DELAY
+        return latency * (1 + 10 * self.error_rate)
+
+    def to_dict(self) -> Dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "state": self.breaker.state,
+            "error_rate": round(self.error_rate, 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+        }
+
+
+# 各服务商的健康状况（进程内共享）
+provider_health: Dict[str, ProviderHealth] = {}
+
+
+def get_provider_health(name: str) -> ProviderHealth:
+    """获取服务商健康状况"""
+    if name not in provider_health:
+        provider_health[name] = ProviderHealth(name)
+    return provider_health[name]
+
+
+class ProviderRouter(MapService):
+    """多服务商路由（熔断 + 对冲请求）"""
+
+    provider = "router"
+
+    def __init__(self, providers: List[MapService]):
+        super().__init__()
+        self.providers = providers
+
+    def _ordered(self) -> List[MapService]:
+        """按健康分排序的可用服务商（熔断中的排在最后，作为兜底）"""
+        return sorted(
+            self.providers,
+            key=lambda p: (get_provider_health(p.provider).breaker.state == STATE_OPEN, get_provider_health(p.provider).score())
+        )
+
+    async def _call(self, provider: MapService, center: Tuple[float, float], keyword: str, radius: int) -> Optional[List[Dict]]:
+        """请求单个服务商并记录结果，失败时返回None"""
+        health = get_provider_health(provider.provider)
+        if not health.breaker.allow():
+            return None
+
+        started = time.monotonic()
+        try:
+            places = await provider._fetch_nearby(center, keyword, radius)
+        except asyncio.CancelledError:
+            health.breaker.release()
+            raise
+        except QuotaExceeded as e:
+            # 配额不足不代表服务商故障，不计入熔断
+            health.breaker.release()
+            logger.warning(f"{provider.provider} skipped: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"{provider.provider} search failed: {e}")
+            places = None
+
+        health.record(time.monotonic() - started, places is not None)
+        return places
+
+    async def _hedged_fetch(self, center: Tuple[float, float], keyword: str, radius: int) -> Optional[List[Dict]]:
+        """
+        对冲请求：主服务商超过 p95 延迟未返回（或失败）时请求下一个服务商，取最先成功的结果
+
+        Returns:
+            地点列表；所有服务商都失败时返回None
+        """
+        remaining = self._ordered()
+        pending = set()
+        delay = None
+
+        def start_next():
+            nonlocal delay
+            provider = remaining.pop(0)
+            delay = get_provider_health(provider.provider).hedge_delay()
+            pending.add(asyncio.create_task(self._call(provider, center, keyword, radius)))
+
+        start_next()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=delay if remaining else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    pending.discard(task)
+                    places = task.result()
+                    if places is not None:
+                        return places
+
+                # 超时未返回或已失败，向下一个服务商发起请求
+                if remaining:
+                    start_next()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def search_nearby(self, center: Tuple[float, float], keyword: str = "餐厅", radius: int = 3000) -> List[Dict]:
+        """搜索附近的地点（所有服务商都失败时使用模拟数据）"""
+        places = await poi_cache.get_or_fetch(self.provider, center, keyword, radius, self._hedged_fetch)
+        if places is None:
+            return self._get_mock_places(center)
+        return places
+
+    def _primary(self) -> MapService:
+        """当前最健康的服务商"""
+        return self._ordered()[0]
+
+    async def calculate_route(self, from_point: Tuple[float, float], to_point: Tuple[float, float], mode: str = "driving") -> Dict:
+        """计算路线（使用支持路线规划的最健康服务商）"""
+        for provider in self._ordered():
+            if type(provider).calculate_route is not MapService.calculate_route:
+                return await provider.calculate_route(from_point, to_point, mode)
+        raise NotImplementedError
+
+    async def distance_matrix(self, origins, destinations, mode: str = "driving"):
+        """批量距离计算（使用最健康的服务商）"""
+        return await self._primary().distance_matrix(origins, destinations, mode)
+
+    @property
+    def geocode_cacheable(self) -> bool:
+        """各服务商的结果都来自真实接口时才缓存"""
+        return all(provider.geocode_cacheable for provider in self.providers)
+
+    async def geocode(self, address: str, city: Optional[str] = None) -> Optional[Dict]:
+        """
+        地理编码（按健康状况依次尝试各服务商，取第一个解析成功的结果）
+
+        Raises:
+            出错的服务商的异常：没有服务商解析成功且有服务商出错时抛出（结果不能视为未找到）
+        """
+        error = None
+        for provider in self._ordered():
+            try:
+                result = await provider.geocode(address, city)
+            except Exception as e:
+                logger.warning(f"Geocoding with {provider.provider} failed: {e}")
+                error = e
+                continue
+            if result is not None:
+                return result
+        if error is not None:
+            raise error
+        return None
+
+    async def reverse_geocode(self, lat: float, lng: float) -> Optional[Dict]:
+        """逆地理编码（按健康状况依次尝试各服务商）"""
+        for provider in self._ordered():
+            result = await provider.reverse_geocode(lat, lng)
+            if result is not None:
+                return result
+        return None
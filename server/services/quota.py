@@ -0,0 +1,201 @@
+"""
+地图API配额管理
+
+每个API Key有每秒请求数（QPS）和每日调用量两项限制。
+通过 Redis 令牌桶在所有 worker 之间共享配额（Redis 不可用时退化为进程内令牌桶）。
+请求分为交互（interactive）和后台（background）两种优先级：
+后台请求不能动用为交互请求预留的令牌和每日额度；令牌不足时短暂排队等待，而不是直接失败。
+"""
+import asyncio
+import contextvars
+import hashlib
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from app.database import get_redis
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+
+# 当前请求的优先级（后台任务中设置为 background）
+request_priority: contextvars.ContextVar = contextvars.ContextVar(
+    "request_priority", default=PRIORITY_INTERACTIVE
+)
+
+# 令牌桶脚本
+# KEYS[1] 令牌桶, KEYS[2] 当日计数
+# ARGV: 速率(个/秒), 桶容量, 保留令牌数, 每日上限(0为不限), 每日保留额度, 当日计数过期秒数
+# 返回: {状态(1通过/0需等待/-1当日额度用尽), 等待毫秒数, 剩余令牌, 当日剩余额度}
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local daily_limit = tonumber(ARGV[4])
+local daily_reserve = tonumber(ARGV[5])
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) / 1000 * rate)
+
+local used = tonumber(redis.call("GET", KEYS[2]) or "0")
+local status = 1
+local wait = 0
+if daily_limit > 0 and used >= daily_limit - daily_reserve then
+    status = -1
+elseif tokens - 1 < reserve then
+    status = 0
+    wait = math.ceil((1 + reserve - tokens) / rate * 1000)
+else
+    tokens = tokens - 1
+    used = redis.call("INCR", KEYS[2])
+    if used == 1 then
+        redis.call("EXPIRE", KEYS[2], ARGV[6])
+    end
+end
+
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", now)
+redis.call("PEXPIRE", KEYS[1], 60000)
+return {status, wait, tostring(tokens), daily_limit - used}
+"""
+
+
+class QuotaExceeded(Exception):
+    """配额不足（排队超时或当日额度用尽）"""
+
+
+@contextmanager
+def quota_priority(priority: str):
+    """在上下文中设置地图API请求优先级"""
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class LocalTokenBucket:
+    """进程内令牌桶（Redis不可用时使用）"""
+
+    def __init__(self, capacity: float):
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.day = None
+        self.used = 0
+
+    def take(self, rate: float, capacity: float, reserve: float, daily_limit: int, daily_reserve: int) -> Tuple[int, int, float, int]:
+        """与 TOKEN_BUCKET_SCRIPT 相同的逻辑"""
+        now = time.monotonic()
+        self.tokens = min(capacity, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+
+        today = datetime.now().strftime("%Y%m%d")
+        if self.day != today:
+            self.day, self.used = today, 0
+
+        if daily_limit > 0 and self.used >= daily_limit - daily_reserve:
+            return -1, 0, self.tokens, daily_limit - self.used
+        if self.tokens - 1 < reserve:
+            return 0, int((1 + reserve - self.tokens) / rate * 1000) + 1, self.tokens, daily_limit - self.used
+
+        self.tokens -= 1
+        self.used += 1
+        return 1, 0, self.tokens, daily_limit - self.used
+
+
+class QuotaManager:
+    """地图API配额管理器"""
+
+    def __init__(self):
+        self._local: Dict[str, LocalTokenBucket] = {}
+        self._remaining: Dict[str, Dict] = {}
+        self.waits = 0
+        self.rejections = 0
+
+    def _limits(self, provider: str) -> Tuple[float, int]:
+        """服务商的 (QPS, 每日上限)"""
+        if provider == "amap":
+            return settings.AMAP_QPS, settings.AMAP_DAILY_QUOTA
+        return settings.TENCENT_MAP_QPS, settings.TENCENT_MAP_DAILY_QUOTA
+
+    async def _take(self, provider: str, api_key: str, priority: str) -> Tuple[int, int, float, Optional[int]]:
+        """尝试获取一个令牌，返回 (状态, 等待毫秒数, 剩余令牌, 当日剩余额度（不限时为None）)"""
+        qps, daily_limit = self._limits(provider)
+        capacity = max(qps, 1)
+        background = priority == PRIORITY_BACKGROUND
+        reserve = capacity * settings.QUOTA_BACKGROUND_RESERVE if background else 0
+        daily_reserve = int(daily_limit * settings.QUOTA_BACKGROUND_RESERVE) if background else 0
+
+        key_id = hashlib.md5(api_key.encode("utf-8")).hexdigest()[:12]
+        redis = get_redis()
+        if redis:
+            try:
+                status, wait, tokens, remaining = await redis.eval(
+                    TOKEN_BUCKET_SCRIPT,
+                    2,
+                    f"quota:{provider}:{key_id}:bucket",
+                    f"quota:{provider}:{key_id}:daily:{datetime.now().strftime('%Y%m%d')}",
+                    qps, capacity, reserve, daily_limit, daily_reserve, 2 * 24 * 3600
+                )
+                return int(status), int(wait), float(tokens), int(remaining) if daily_limit > 0 else None
+            except Exception as e:
+                logger.warning(f"Redis quota check failed, using local bucket: {e}")
+
+        bucket = self._local.setdefault(key_id, LocalTokenBucket(capacity))
+        status, wait, tokens, remaining = bucket.take(qps, capacity, reserve, daily_limit, daily_reserve)
+        return status, wait, tokens, remaining if daily_limit > 0 else None
+
+    async def acquire(self, provider: str, api_key: str, priority: str = None, max_wait: float = None):
+        """
+        获取一次API调用配额，令牌不足时短暂排队
+
+        Args:
+            provider: 服务商标识（tencent/amap）
+            api_key: API Key
+            priority: 优先级，默认取当前上下文的 request_priority
+            max_wait: 最长排队时间（秒），默认交互请求 QUOTA_MAX_WAIT、后台请求其5倍
+
+        Raises:
+            QuotaExceeded: 排队超时或当日额度用尽
+        """
+        priority = priority or request_priority.get()
+        if max_wait is None:
+            max_wait = settings.QUOTA_MAX_WAIT * (5 if priority == PRIORITY_BACKGROUND else 1)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait
+        while True:
+            status, wait_ms, tokens, remaining = await self._take(provider, api_key, priority)
+            self._remaining[provider] = {"tokens": round(tokens, 2), "daily_remaining": remaining}
+
+            if status == 1:
+                return
+            if status == -1:
+                self.rejections += 1
+                raise QuotaExceeded(f"{provider} daily quota exhausted ({priority})")
+
+            wait = wait_ms / 1000
+            if loop.time() + wait > deadline:
+                self.rejections += 1
+                raise QuotaExceeded(f"{provider} QPS quota busy ({priority})")
+            self.waits += 1
+            await asyncio.sleep(wait)
+
+    def stats(self) -> Dict:
+        """剩余配额（各服务商最近一次观测值）"""
+        return {
+            "remaining": dict(self._remaining),
+            "waits": self.waits,
+            "rejections": self.rejections
+        }
+
+
+# 全局配额管理器
+quota_manager = QuotaManager()
@@ -0,0 +1,150 @@
+"""
+聚会实时推送
+
+每个聚会一个频道：参与者变化（聚会文档写入）和新的推荐结果写入时推送给订阅该聚会的 WebSocket 连接。
+多个 uvicorn worker 之间通过 Redis pub/sub 扇出：事件发布到 Redis，
+每个 worker 用一个模式订阅接收全部聚会事件，再发给本进程内订阅了该聚会的连接。
+Redis 不可用时只推送给本进程的连接。
+
+事件都带聚会的 version，客户端忽略不比当前更新的事件；
+断线重连时带上已有的 version 和推荐结果版本，服务端在聚会有更新时先补发一次完整快照，
+最近一次的推荐结果比客户端已有的新时也补发一次。
+"""
+import asyncio
+import orjson
+from typing import Dict, Optional, Set
+from fastapi import WebSocket
+from app.database import get_redis
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Redis 频道前缀，后接邀请码
+CHANNEL_PREFIX = "gathering:events:"
+
+
+def encode_event(event_type: str, version: int, data) -> str:
+    """
+    编码推送事件
+
+    Args:
+        event_type: snapshot（重连补发）/ gathering（聚会更新）/ recommendations（推荐结果）
+        version: 聚会版本号（recommendations 事件为推荐结果版本号）
+        data: 事件数据（可JSON序列化）
+    """
+    return orjson.dumps({"type": event_type, "version": version, "data": data}).decode("utf-8")
+
+
+class GatheringHub:
+    """本进程内各聚会的 WebSocket 连接及跨进程事件扇出"""
+
+    def __init__(self, send_timeout: float = 5.0):
+        """
+        Args:
+            send_timeout: 单个连接发送超时（秒），超时的连接被断开，不拖慢其他连接
+        """
+        self.send_timeout = send_timeout
+        self.connections: Dict[str, Set[WebSocket]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def connect(self, code: str, websocket: WebSocket):
+        """登记连接"""
+        self.connections.setdefault(code, set()).add(websocket)
+
+    def disconnect(self, code: str, websocket: WebSocket):
+        """移除连接"""
+        sockets = self.connections.get(code)
+        if sockets is None:
+            return
+        sockets.discard(websocket)
+        if not sockets:
+            del self.connections[code]
+
+    async def publish(self, code: str, message: str):
+        """
+        发布事件（经 Redis 发给所有 worker；Redis 不可用时只发给本进程）
+
+        Args:
+            code: 邀请码
+            message: encode_event 编码后的事件
+        """
+        self.published += 1
+        redis = get_redis()
+        if redis and self._listener and not self._listener.done():
+            try:
+                await redis.publish(f"{CHANNEL_PREFIX}{code}", message)
+                return
+            except Exception as e:
+                logger.warning(f"Failed to publish gathering event for {code}: {e}")
+        await self.deliver(code, message)
+
+    async def deliver(self, code: str, message: str):
+        """发给本进程内订阅该聚会的连接（事件只编码一次，各连接并发发送）"""
+        sockets = list(self.connections.get(code, ()))
+        if not sockets:
+            return
+
+        results = await asyncio.gather(
+            *[asyncio.wait_for(ws.send_text(message), self.send_timeout) for ws in sockets],
+            return_exceptions=True
+        )
+        for ws, result in zip(sockets, results):
+            if isinstance(result, Exception):
+                self.dropped += 1
+                self.disconnect(code, ws)
+            else:
+                self.delivered += 1
+
+    def start(self):
+        """启动 Redis 订阅（Redis 不可用时不启动）"""
+        if get_redis() and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """停止订阅"""
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self):
+        """订阅所有聚会频道并转发给本进程的连接，连接中断后重新订阅"""
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    code = message["channel"][len(CHANNEL_PREFIX):]
+                    if code in self.connections:
+                        await self.deliver(code, message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Gathering event subscription lost, resubscribing: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
+
+    def stats(self) -> Dict:
+        """连接和推送统计"""
+        return {
+            "gatherings": len(self.connections),
+            "connections": sum(len(s) for s in self.connections.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped
+        }
+
+
+# 全局聚会推送实例
+gathering_hub = GatheringHub(send_timeout=settings.REALTIME_SEND_TIMEOUT)
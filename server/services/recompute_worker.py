@@ -0,0 +1,197 @@
+"""
+推荐结果后台重算
+
+参与者变化时把聚会加入 Redis Stream，由各 worker 进程内的后台任务（同一消费组）消费并重算推荐，
+HTTP 请求不再等待地图接口。
+
+重算做了防抖：每次变化都把该聚会的到期时间推迟到 debounce 秒之后，
+而 Stream 中同一聚会同时只有一条待处理消息；消费者等到最后一次变化 debounce 秒后才计算，
+连续加入五个人只重算一次。开始计算前清除排队标记，计算期间的新变化会重新入队。
+"""
+import asyncio
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+from app.database import get_redis
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "recompute:stream"
+GROUP = "recompute"
+
+
+class RecomputeWorker:
+    """推荐重算队列（生产者 + 消费者）"""
+
+    def __init__(
+        self,
+        debounce: float = 2.0,
+        concurrency: int = 4,
+        max_stream_length: int = 10000,
+        claim_idle: float = 60.0
+    ):
+        """
+        Args:
+            debounce: 最后一次变化后等待多久再重算（秒）
+            concurrency: 每个进程同时重算的聚会数
+            max_stream_length: Stream 最大长度（近似裁剪）
+            claim_idle: 其他消费者的消息超过多久未确认时接管（秒，如该进程已退出）
+        """
+        self.debounce = debounce
+        self.concurrency = concurrency
+        self.max_stream_length = max_stream_length
+        self.claim_idle = claim_idle
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._handler: Optional[Callable[[str], Awaitable]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._jobs: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.enqueued = 0
+        self.debounced = 0
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _due_key(self, code: str) -> str:
+        return f"recompute:due:{code}"
+
+    def _queued_key(self, code: str) -> str:
+        return f"recompute:queued:{code}"
+
+    async def enqueue(self, code: str) -> bool:
+        """
+        参与者变化后安排重算
+
+        Returns:
+            是否已加入队列；后台任务未运行（如 Redis 不可用）时返回False，由请求方自行计算
+        """
+        redis = get_redis()
+        if not redis or not self.running:
+            return False
+
+        code = code.upper()
+        try:
+            # 推迟到期时间；已有待处理消息时不重复入队
+            await redis.set(self._due_key(code), time.time() + self.debounce, ex=int(self.debounce) + 600)
+            if await redis.set(self._queued_key(code), 1, nx=True, ex=int(self.claim_idle) + 600):
+                await redis.xadd(STREAM_KEY, {"code": code}, maxlen=self.max_stream_length, approximate=True)
+                self.enqueued += 1
+            else:
+                self.debounced += 1
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to enqueue recompute for {code}: {e}")
+            return False
+
+    def start(self, handler: Callable[[str], Awaitable]):
+        """
+        启动消费任务（Redis 不可用时不启动）
+
+        Args:
+            handler: 重算单个聚会的协程函数，参数为邀请码
+        """
+        if get_redis() and self._task is None:
+            self._handler = handler
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止消费任务（未完成的消息留在 Stream 中，由其他消费者接管）"""
+        tasks = [t for t in [self._task, *self._jobs] if t]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._jobs.clear()
+
+    async def _run(self):
+        """从 Stream 读取消息并分发"""
+        redis = get_redis()
+        try:
+            await redis.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                logger.error(f"Failed to create recompute consumer group: {e}")
+
+        next_claim = 0.0
+        while True:
+            try:
+                # 定期接管已退出消费者未确认的消息
+                if time.monotonic() >= next_claim:
+                    next_claim = time.monotonic() + self.claim_idle
+                    claimed = await redis.xautoclaim(
+                        STREAM_KEY, GROUP, self.consumer, min_idle_time=int(self.claim_idle * 1000), count=100
+                    )
+                    for message_id, fields in claimed[1]:
+                        if fields:
+                            self._spawn(message_id, fields["code"])
+
+                entries = await redis.xreadgroup(GROUP, self.consumer, {STREAM_KEY: ">"}, count=10, block=5000)
+                for _, messages in entries or []:
+                    for message_id, fields in messages:
+                        self._spawn(message_id, fields["code"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Recompute stream read failed: {e}")
+                await asyncio.sleep(1)
+
+    def _spawn(self, message_id: str, code: str):
+        task = asyncio.create_task(self._process(message_id, code))
+        self._jobs.add(task)
+        task.add_done_callback(self._jobs.discard)
+
+    async def _process(self, message_id: str, code: str):
+        """等到防抖期结束后重算并确认消息"""
+        redis = get_redis()
+        try:
+            while True:
+                due = await redis.get(self._due_key(code))
+                wait = float(due) - time.time() if due else 0.0
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            async with self._semaphore:
+                await redis.delete(self._queued_key(code))
+                try:
+                    await self._handler(code)
+                    self.processed += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"Recompute failed for gathering {code}: {e}")
+            await redis.xack(STREAM_KEY, GROUP, message_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Recompute job for {code} aborted: {e}")
+
+    def stats(self) -> Dict:
+        """队列统计"""
+        return {
+            "running": self.running,
+            "enqueued": self.enqueued,
+            "debounced": self.debounced,
+            "processed": self.processed,
+            "failed": self.failed,
+            "in_progress": len(self._jobs)
+        }
+
+
+# 全局重算队列
+recompute_worker = RecomputeWorker(
+    debounce=settings.RECOMPUTE_DEBOUNCE_SECONDS,
+    concurrency=settings.RECOMPUTE_CONCURRENCY
+)
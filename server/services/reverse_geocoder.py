@@ -0,0 +1,217 @@
+"""
+离线逆地理编码
+
+区县和街道（乡镇）边界多边形从 GeoJSON 加载（坐标系需与小程序一致，即 GCJ-02），
+按经纬度网格建立索引：每个网格记录与之相交的多边形（按外接矩形）。
+查询时先取坐标所在网格的候选多边形，再对候选多边形的所有边一次性向量化做射线法判断。
+本地边界覆盖范围外的坐标才请求地图服务商，结果按 geohash 网格缓存。
+"""
+import json
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from core.geo import geohash_encode
+from services.cache import TwoTierCache
+from services.map_service import MapService
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _rings(geometry: Dict) -> List[np.ndarray]:
+    """GeoJSON 几何的所有环（外环和内环），每个环为 (K, 2) 的 [经度, 纬度] 数组"""
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return []
+    return [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon if len(ring) >= 3]
+
+
+class PolygonLayer:
+    """一层互不重叠的行政区多边形（如全部区县或全部街道）"""
+
+    def __init__(self, features: List[Tuple[Dict, List[np.ndarray]]], cell_deg: float = 0.05):
+        """
+        Args:
+            features: [(属性, 环列表)]
+            cell_deg: 网格大小（度）
+        """
+        self.cell_deg = cell_deg
+        self.properties = [props for props, _ in features]
+
+        # 所有多边形的边按多边形顺序拼接，offsets[i]:offsets[i+1] 为第 i 个多边形的边
+        x1, y1, x2, y2, counts = [], [], [], [], []
+        self.bbox = np.empty((len(features), 4))
+        for i, (_, rings) in enumerate(features):
+            points = np.concatenate(rings)
+            self.bbox[i] = (points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max())
+            for ring in rings:
+                x1.append(ring[:, 0])
+                y1.append(ring[:, 1])
+                x2.append(np.roll(ring[:, 0], -1))
+                y2.append(np.roll(ring[:, 1], -1))
+            counts.append(sum(len(ring) for ring in rings))
+
+        self.x1 = np.concatenate(x1) if x1 else np.empty(0)
+        self.y1 = np.concatenate(y1) if y1 else np.empty(0)
+        self.x2 = np.concatenate(x2) if x2 else np.empty(0)
+        self.y2 = np.concatenate(y2) if y2 else np.empty(0)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        # 网格 -> 外接矩形与该网格相交的多边形
+        grid: Dict[Tuple[int, int], List[int]] = {}
+        for i, (min_lng, min_lat, max_lng, max_lat) in enumerate(self.bbox):
+            for row in range(int(np.floor(min_lat / cell_deg)), int(np.floor(max_lat / cell_deg)) + 1):
+                for col in range(int(np.floor(min_lng / cell_deg)), int(np.floor(max_lng / cell_deg)) + 1):
+                    grid.setdefault((row, col), []).append(i)
+        self.grid = {cell: np.array(ids, dtype=np.int64) for cell, ids in grid.items()}
+
+    def __len__(self) -> int:
+        return len(self.properties)
+
+    def locate(self, lat: float, lng: float) -> Optional[Dict]:
+        """
+        坐标所在的多边形
+
+        Returns:
+            多边形属性；不在任何多边形内时返回None
+        """
+        ids = self.grid.get((int(np.floor(lat / self.cell_deg)), int(np.floor(lng / self.cell_deg))))
+        if ids is None:
+            return None
+
+        box = self.bbox[ids]
+        ids = ids[(box[:, 0] <= lng) & (lng <= box[:, 2]) & (box[:, 1] <= lat) & (lat <= box[:, 3])]
+        if len(ids) == 0:
+            return None
+
+        # 候选多边形的边拼成一个数组，射线法统计每个多边形与向右射线的交点数（奇数在内，内环自然抵消）
+        starts, ends = self.offsets[ids], self.offsets[ids + 1]
+        edges = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        x1, y1, x2, y2 = self.x1[edges], self.y1[edges], self.x2[edges], self.y2[edges]
+        spans = (y1 > lat) != (y2 > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crossing_x = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+        crossings = spans & (lng < crossing_x)
+
+        counts = np.add.reduceat(crossings.astype(np.int64), np.concatenate([[0], np.cumsum(ends - starts)[:-1]]))
+        inside = ids[counts % 2 == 1]
+        return self.properties[int(inside[0])] if len(inside) else None
+
+
+def load_polygon_layer(path: str, cell_deg: float = None) -> PolygonLayer:
+    """从 GeoJSON FeatureCollection 加载多边形层"""
+    with open(path, encoding="utf-8") as f:
+        collection = json.load(f)
+
+    features = []
+    for feature in collection.get("features", []):
+        rings = _rings(feature.get("geometry") or {"type": None})
+        if rings:
+            features.append((feature.get("properties") or {}, rings))
+
+    layer = PolygonLayer(features, cell_deg or settings.REVERSE_GEOCODE_CELL_DEG)
+    logger.info(f"Loaded {len(layer)} boundaries from {path}")
+    return layer
+
+
+def format_address(province: Optional[str], city: Optional[str], district: Optional[str], street: Optional[str]) -> str:
+    """拼接地址（直辖市省市同名时只保留一个）"""
+    parts = [province, city if city != province else None, district, street]
+    return "".join(p for p in parts if p)
+
+
+class ReverseGeocoder:
+    """逆地理编码：本地边界优先，覆盖范围外请求地图服务商"""
+
+    def __init__(
+        self,
+        districts: Optional[PolygonLayer] = None,
+        streets: Optional[PolygonLayer] = None,
+        precision: int = 7,
+        ttl: int = 7 * 24 * 3600
+    ):
+        """
+        Args:
+            districts: 区县边界，属性 name（区县名）、city、province
+            streets: 街道/乡镇边界，属性 name
+            precision: 服务商结果缓存的 geohash 精度
+            ttl: 服务商结果缓存时间（秒）
+        """
+        self.districts = districts
+        self.streets = streets
+        self.precision = precision
+        self.cache = TwoTierCache(namespace="regeo", ttl=ttl, local_size=20000)
+
+        self.local_hits = 0
+        self.provider_lookups = 0
+
+    def lookup(self, lat: float, lng: float) -> Optional[Dict]:
+        """
+        本地边界查询
+
+        Returns:
+            {"formatted_address", "province", "city", "district", "street"}；不在覆盖范围内时返回None
+        """
+        district = self.districts.locate(lat, lng) if self.districts is not None else None
+        if district is None:
+            return None
+
+        street = self.streets.locate(lat, lng) if self.streets is not None else None
+        result = {
+            "province": district.get("province"),
+            "city": district.get("city"),
+            "district": district.get("name") or district.get("district"),
+            "street": street.get("name") if street else None
+        }
+        result["formatted_address"] = format_address(result["province"], result["city"], result["district"], result["street"])
+        return result
+
+    async def reverse_geocode(self, map_service: MapService, lat: float, lng: float) -> Optional[Dict]:
+        """
+        坐标转地址
+
+        Returns:
+            lookup 相同字段；本地和服务商都无法解析时返回None
+        """
+        result = self.lookup(lat, lng)
+        if result is not None:
+            self.local_hits += 1
+            return result
+
+        key = geohash_encode(lat, lng, self.precision)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        self.provider_lookups += 1
+        result = await map_service.reverse_geocode(lat, lng)
+        if result is not None:
+            await self.cache.set(key, result)
+        return result
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        return {
+            "districts": len(self.districts) if self.districts is not None else 0,
+            "streets": len(self.streets) if self.streets is not None else 0,
+            "local_hits": self.local_hits,
+            "provider_lookups": self.provider_lookups,
+            "provider_cache": self.cache.stats()
+        }
+
+
+_reverse_geocoder: Optional[ReverseGeocoder] = None
+
+
+def get_reverse_geocoder() -> ReverseGeocoder:
+    """获取逆地理编码实例（首次调用时加载配置的边界数据）"""
+    global _reverse_geocoder
+    if _reverse_geocoder is None:
+        _reverse_geocoder = ReverseGeocoder(
+            districts=load_polygon_layer(settings.REVERSE_GEOCODE_DISTRICTS_PATH) if settings.REVERSE_GEOCODE_DISTRICTS_PATH else None,
+            streets=load_polygon_layer(settings.REVERSE_GEOCODE_STREETS_PATH) if settings.REVERSE_GEOCODE_STREETS_PATH else None
+        )
+    return _reverse_geocoder
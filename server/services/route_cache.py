@@ -0,0 +1,87 @@
+"""
+路线耗时缓存
+
+缓存键由起点/终点的 geohash 网格、出行方式和出发时段组成，
+邻近的起终点（如国贸写字楼群）共享同一条缓存。
+"""
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from core.geo import geohash_encode, normalize_mode
+from services.cache import TwoTierCache
+from app.config import settings
+
+
+class RouteCache:
+    """路线耗时缓存"""
+
+    def __init__(self, precision: int = 7, bucket_hours: int = 3, ttl: int = 6 * 3600, local_size: int = 50000):
+        self.precision = precision
+        self.bucket_hours = bucket_hours
+        self.cache = TwoTierCache(namespace="route", ttl=ttl, local_size=local_size)
+
+    def time_bucket(self, when: datetime = None) -> int:
+        """出发时段分桶"""
+        return (when or datetime.now()).hour // self.bucket_hours
+
+    def cell(self, point: Tuple[float, float]) -> str:
+        """坐标所在的 geohash 网格"""
+        return geohash_encode(point[0], point[1], self.precision)
+
+    def key(self, from_cell: str, to_cell: str, mode: str, bucket: int) -> str:
+        """缓存键"""
+        return f"{from_cell}:{to_cell}:{normalize_mode(mode)}:{bucket}"
+
+    async def get(self, from_point: Tuple[float, float], to_point: Tuple[float, float], mode: str) -> Optional[Dict]:
+        """
+        读取单条路线
+
+        Returns:
+            {"distance": 米, "duration": 分钟}，未命中时返回None
+        """
+        value = await self.cache.get(
+            self.key(self.cell(from_point), self.cell(to_point), mode, self.time_bucket())
+        )
+        if value is None:
+            return None
+        return {"distance": value[0], "duration": value[1]}
+
+    async def set(self, from_point: Tuple[float, float], to_point: Tuple[float, float], mode: str, distance: float, duration: float):
+        """写入单条路线"""
+        await self.cache.set(
+            self.key(self.cell(from_point), self.cell(to_point), mode, self.time_bucket()),
+            [distance, duration]
+        )
+
+    def matrix_keys(self, origins: List[Tuple[float, float]], destinations: List[Tuple[float, float]], mode: str) -> List[str]:
+        """
+        生成 起点×终点 的缓存键（按行展开）
+
+        Args:
+            origins: 起点列表
+            destinations: 终点列表
+            mode: 出行方式
+
+        Returns:
+            长度为 N×M 的缓存键列表
+        """
+        bucket = self.time_bucket()
+        from_cells = [self.cell(p) for p in origins]
+        to_cells = [self.cell(p) for p in destinations]
+        return [
+            self.key(from_cell, to_cell, mode, bucket)
+            for from_cell in from_cells
+            for to_cell in to_cells
+        ]
+
+    def stats(self) -> Dict:
+        """命中统计"""
+        return self.cache.stats()
+
+
+# 全局路线缓存
+route_cache = RouteCache(
+    precision=settings.ROUTE_CACHE_PRECISION,
+    bucket_hours=settings.ROUTE_CACHE_BUCKET_HOURS,
+    ttl=settings.ROUTE_CACHE_TTL,
+    local_size=settings.ROUTE_CACHE_LOCAL_SIZE
+)
@@ -0,0 +1,153 @@
+"""
+请求合并（single-flight）
+
+相同键的并发调用只执行一次，其余调用方等待并共享结果。
+进程内用 Future 合并；多个 worker 之间用 Redis 锁 + 结果键合并：
+拿到锁的 worker 负责计算并写入结果键，其余 worker 轮询结果键。
+"""
+import asyncio
+import json
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi.encoders import jsonable_encoder
+from app.database import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 仅当锁仍由自己持有时才释放
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """请求合并器"""
+
+    def __init__(
+        self,
+        namespace: str,
+        lock_ttl: int = 30,
+        result_ttl: int = 10,
+        wait_timeout: float = 15.0,
+        poll_interval: float = 0.05
+    ):
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], fresh: bool = False) -> Any:
+        """
+        执行 fn，相同 key 的并发调用共享同一次执行的结果
+
+        Args:
+            key: 合并键
+            fn: 实际执行的协程函数
+            fresh: 不使用已写入的结果键（只与正在进行的计算合并），用于强制刷新
+
+        Returns:
+            fn 的结果（其他 worker 计算的结果为JSON解码后的数据）
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._do_distributed(key, fn, fresh)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _do_distributed(self, key: str, fn: Callable[[], Awaitable[Any]], fresh: bool = False) -> Any:
+        """通过 Redis 锁在多个 worker 之间合并"""
+        redis = get_redis()
+        if not redis:
+            self.executed += 1
+            return await fn()
+
+        lock_key = f"{self.namespace}:lock:{key}"
+        result_key = f"{self.namespace}:result:{key}"
+
+        try:
+            if fresh:
+                # 丢弃之前的结果，等待其他 worker 时只接受本次之后写入的结果
+                await redis.delete(result_key)
+            else:
+                cached = await redis.get(result_key)
+                if cached is not None:
+                    self.coalesced += 1
+                    return json.loads(cached)
+
+            token = uuid.uuid4().hex
+            acquired = await redis.set(lock_key, token, nx=True, ex=self.lock_ttl)
+        except Exception as e:
+            logger.warning(f"Single-flight Redis unavailable ({self.namespace}): {e}")
+            self.executed += 1
+            return await fn()
+
+        if acquired:
+            try:
+                self.executed += 1
+                result = await fn()
+                try:
+                    await redis.setex(result_key, self.result_ttl, json.dumps(jsonable_encoder(result), ensure_ascii=False))
+                except Exception as e:
+                    logger.warning(f"Failed to publish single-flight result for {key}: {e}")
+                return result
+            finally:
+                try:
+                    await redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except Exception as e:
+                    logger.warning(f"Failed to release single-flight lock for {key}: {e}")
+
+        # 等待持锁的 worker 写入结果；锁提前释放（对方失败）或等待超时则自行计算
+        result = await self._wait_for_result(redis, lock_key, result_key)
+        if result is not None:
+            self.coalesced += 1
+            return result
+
+        self.executed += 1
+        return await fn()
+
+    async def _wait_for_result(self, redis, lock_key: str, result_key: str) -> Optional[Any]:
+        """轮询结果键"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                cached = await redis.get(result_key)
+                if cached is not None:
+                    return json.loads(cached)
+                if not await redis.exists(lock_key):
+                    return None
+            except Exception as e:
+                logger.warning(f"Single-flight wait failed ({self.namespace}): {e}")
+                return None
+        return None
+
+    def stats(self) -> Dict:
+        """合并统计"""
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight)
+        }
@@ -0,0 +1,75 @@
+"""
+推荐结果的路线耗时
+
+打分时通勤时间按直线距离估算（乘以校准系数），不调用路线接口；
+选出前N个推荐地点后，再用地图服务的批量距离接口查询 参与者×推荐地点 的路线距离和耗时，
+替换返回给用户的通勤数据，查询到的耗时同时作为通勤时间校准的样本（见 core/calibration.py）。
+推荐顺序和得分仍以估算结果为准。
+"""
+import asyncio
+from typing import Dict, List
+import numpy as np
+from models.gathering import Participant
+from core.results import ScoredPlace
+from services.map_service import MapService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def apply_routed_times(map_service: MapService, participants: List[Participant], places: List[ScoredPlace]):
+    """
+    用路线接口的距离和耗时更新推荐结果中的通勤数据（原地修改）
+
+    每种交通方式一次 distance_matrix 调用，只替换服务商实际返回了路线的元素；
+    服务只返回估算值、不支持该交通方式或查询失败的元素保留打分时的估算值。
+
+    Args:
+        map_service: 地图服务
+        participants: 参与者列表（与推荐项中 participant_distances 的顺序一致）
+        places: 推荐地点列表
+    """
+    if not participants or not places or not map_service.calibrate_routes:
+        return
+
+    # 以估算值为初始值，查询成功的行再覆盖
+    distance_km = np.array([[d.distance for d in place.participant_distances] for place in places]).T
+    travel_time = np.array([[d.travel_time for d in place.participant_distances] for place in places]).T
+
+    routed = np.zeros(distance_km.shape, dtype=bool)
+
+    rows_by_mode: Dict[str, List[int]] = {}
+    for i, p in enumerate(participants):
+        rows_by_mode.setdefault(p.transport or "driving", []).append(i)
+
+    destinations = [(place.lat, place.lng) for place in places]
+    results = await asyncio.gather(
+        *[
+            map_service.distance_matrix(
+                [(participants[i].location.lat, participants[i].location.lng) for i in rows],
+                destinations,
+                mode
+            )
+            for mode, rows in rows_by_mode.items()
+        ],
+        return_exceptions=True
+    )
+    for (mode, rows), result in zip(rows_by_mode.items(), results):
+        if isinstance(result, Exception):
+            logger.warning(f"Routed travel times for mode {mode} failed, keeping estimates: {result}")
+            continue
+        mask = result["routed"]
+        distance_km[rows] = np.where(mask, result["distance"] / 1000, distance_km[rows])
+        travel_time[rows] = np.where(mask, result["duration"], travel_time[rows])
+        routed[rows] = mask
+
+    distances = np.round(distance_km, 1)
+    times = np.round(travel_time, 1)
+    for j, place in enumerate(places):
+        if not routed[:, j].any():
+            continue
+        for i, item in enumerate(place.participant_distances):
+            item.distance = float(distances[i, j])
+            item.travel_time = float(times[i, j])
+        place.travel_times = {p.temp_id: float(times[i, j]) for i, p in enumerate(participants)}
+        place.avg_travel_time = round(float(np.mean(travel_time[:, j])), 1)
@@ -0,0 +1,8 @@
+"""
+测试公共配置
+"""
+import sys
+from pathlib import Path
+
+# 添加 server 目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+
+from core.algorithm import RecommendationEngine
+from models.gathering import Location, Participant
+
+
+def _fixture():
+    rng = random.Random(11)
+    transports = ["driving", "transit", "walking"]
+    participants = [
+        Participant(
+            temp_id=f"p{i}",
+            nickname=f"用户{i}",
+            location=Location(address=f"地址{i}", lat=39.9 + rng.uniform(-0.08, 0.08), lng=116.4 + rng.uniform(-0.08, 0.08)),
+            transport=transports[i % 3]
+        )
+        for i in range(5)
+    ]
+    candidates = [
+        {
+            "id": f"c{j}",
+            "name": f"地点{j}",
+            "address": f"候选地址{j}",
+            "lat": 39.9 + rng.uniform(-0.05, 0.05),
+            "lng": 116.4 + rng.uniform(-0.05, 0.05),
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "price_level": rng.randint(1, 4)
+        }
+        for j in range(200)
+    ]
+    return participants, candidates
+
+
+def test_vectorized_scores_match_per_candidate_scoring():
+    participants, candidates = _fixture()
+
+    expected = [
+        RecommendationEngine.score_location(
+            Location(address=c["address"], lat=c["lat"], lng=c["lng"]),
+            participants,
+            rating=c["rating"],
+            price_level=c["price_level"]
+        )["total_score"]
+        for c in candidates
+    ]
+    scores = RecommendationEngine.score_candidates(participants, candidates)["total_score"]
+
+    # haversine 与 geodesic 的距离差异只带来很小的得分误差
+    np.testing.assert_allclose(scores, expected, atol=0.3)
+
+    # 前10名相同；顺序只在得分近乎并列（相差不超过两倍误差）时可能不同
+    expected_by_id = {c["id"]: score for c, score in zip(candidates, expected)}
+    expected_top = sorted(expected_by_id, key=lambda cid: -expected_by_id[cid])[:10]
+    places = RecommendationEngine.recommend_locations(participants, candidates, 10)
+    ranked = [expected_by_id[place.id] for place in places]
+
+    assert sorted(place.id for place in places) == sorted(expected_top)
+    assert all(later <= earlier + 0.6 for earlier, later in zip(ranked, ranked[1:]))
+    for place in places:
+        assert abs(place.score - expected_by_id[place.id]) <= 0.3
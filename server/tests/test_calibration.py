@@ -0,0 +1,49 @@
+import asyncio
+
+import fakeredis.aioredis
+
+import app.database as database
+from core.calibration import TravelTimeCalibrator
+
+
+def _record(calibrator: TravelTimeCalibrator, duration: float, count: int = 5):
+    for _ in range(count):
+        calibrator.record((39.9, 116.4), (39.95, 116.45), "driving", duration, hour=8)
+
+
+def test_refit_bumps_version_only_when_factors_change():
+    calibrator = TravelTimeCalibrator(min_samples=5)
+
+    calibrator.refit()
+    assert calibrator.version == 0
+
+    _record(calibrator, 40)
+    calibrator.refit()
+    assert calibrator.version == 1
+
+    # 没有新样本，或新样本不改变拟合结果
+    calibrator.refit()
+    _record(calibrator, 40)
+    calibrator.refit()
+    assert calibrator.version == 1
+
+    _record(calibrator, 80, count=20)
+    calibrator.refit()
+    assert calibrator.version == 2
+
+
+def test_samples_are_shared_between_workers_through_redis(monkeypatch):
+    monkeypatch.setattr(database, "redis_client", fakeredis.aioredis.FakeRedis(decode_responses=True))
+    first, second = TravelTimeCalibrator(min_samples=5), TravelTimeCalibrator(min_samples=5)
+    _record(first, 40)
+
+    async def sync():
+        await first.sync_samples()
+        await second.sync_samples()
+
+    asyncio.run(sync())
+    first.refit()
+    second.refit()
+
+    assert second.stats()["samples"] == 5
+    assert second.stats()["mode_factors"] == first.stats()["mode_factors"]
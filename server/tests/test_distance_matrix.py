@@ -0,0 +1,147 @@
+import asyncio
+
+import numpy as np
+
+import services.map_service as map_service_module
+from core.algorithm import RecommendationEngine
+from core.calibration import TravelTimeCalibrator
+from models.gathering import Location, Participant
+from services.map_service import FakeMapService, estimate_route_matrix
+from services.travel_times import apply_routed_times
+
+
+def _points(count: int, lat: float, lng: float, step: float):
+    return [(lat + step * i, lng + step * (i % 7)) for i in range(count)]
+
+
+class RecordingMapService(FakeMapService):
+    """记录每次分块请求的形状，可按分块起点指定失败方式"""
+
+    def __init__(self, failures=None):
+        super().__init__()
+        self.failures = failures or {}
+        self.chunks = []
+
+    async def _fetch_matrix_chunk(self, origins, destinations, mode):
+        self.chunks.append((len(origins), len(destinations)))
+        failure = self.failures.get(len(self.chunks) - 1)
+        if failure == "none":
+            return None
+        if failure == "raise":
+            raise ConnectionError("chunk failed")
+
+        result = estimate_route_matrix(origins, destinations, mode)
+        # 路线耗时为估算值的两倍，便于区分是否使用了估算值补齐
+        result["duration"] = result["duration"] * 2
+        if failure == "partial":
+            result["duration"][0, 0] = np.nan
+        return result
+
+
+def test_distance_matrix_splits_into_provider_sized_chunks():
+    service = RecordingMapService()
+    origins = _points(30, 39.9, 116.4, 0.01)
+    destinations = _points(40, 39.95, 116.45, 0.005)
+
+    result = asyncio.run(service.distance_matrix(origins, destinations, "driving"))
+
+    assert sorted(service.chunks) == sorted([(25, 25), (25, 15), (5, 25), (5, 15)])
+    estimate = estimate_route_matrix(np.array(origins), np.array(destinations), "driving")
+    assert result["duration"].shape == (30, 40)
+    np.testing.assert_allclose(result["duration"], estimate["duration"] * 2)
+    np.testing.assert_allclose(result["distance"], estimate["distance"])
+
+
+def test_distance_matrix_fills_failed_elements_with_estimates():
+    # 分块按 (0,0) (0,25) (25,0) (25,25) 的顺序请求
+    service = RecordingMapService({0: "none", 1: "raise", 2: "partial"})
+    origins = _points(30, 39.9, 116.4, 0.01)
+    destinations = _points(40, 39.95, 116.45, 0.005)
+
+    result = asyncio.run(service.distance_matrix(origins, destinations, "walking"))
+    estimate = estimate_route_matrix(np.array(origins), np.array(destinations), "walking")["duration"]
+    duration = result["duration"]
+
+    assert not np.isnan(duration).any()
+    np.testing.assert_allclose(duration[:25, :25], estimate[:25, :25])
+    np.testing.assert_allclose(duration[:25, 25:], estimate[:25, 25:])
+    assert duration[25, 0] == estimate[25, 0]
+    np.testing.assert_allclose(duration[25:, 1:25], estimate[25:, 1:25] * 2)
+    np.testing.assert_allclose(duration[25:, 25:], estimate[25:, 25:] * 2)
+
+
+def test_routed_times_replace_estimates_and_feed_calibrator(monkeypatch):
+    calibrator = TravelTimeCalibrator(min_samples=5)
+    monkeypatch.setattr(map_service_module, "travel_time_calibrator", calibrator)
+
+    service = RecordingMapService()
+    service.calibrate_routes = True
+    participants = [
+        Participant(
+            temp_id=f"p{i}",
+            location=Location(address=f"地址{i}", lat=39.9 + 0.02 * i, lng=116.4 + 0.015 * i),
+            transport="transit" if i % 2 else "driving"
+        )
+        for i in range(4)
+    ]
+    candidates = [
+        {"id": f"c{j}", "name": f"地点{j}", "address": "", "lat": 39.93 + 0.004 * j, "lng": 116.42, "rating": 4.5}
+        for j in range(8)
+    ]
+    places = RecommendationEngine.recommend_locations(participants, candidates, 5)
+    estimated = {place.id: dict(place.travel_times) for place in places}
+
+    asyncio.run(apply_routed_times(service, participants, places))
+
+    for place in places:
+        for temp_id, minutes in place.travel_times.items():
+            assert abs(minutes - 2 * estimated[place.id][temp_id]) <= 0.2
+        assert [d.travel_time for d in place.participant_distances] == list(place.travel_times.values())
+        assert abs(place.avg_travel_time - np.mean(list(place.travel_times.values()))) <= 0.1
+
+    # 每种交通方式一次请求，路线耗时都记为校准样本
+    assert sorted(service.chunks) == [(2, 5), (2, 5)]
+    calibrator.refit()
+    factors = calibrator.stats()["mode_factors"]
+    assert sorted(factors) == ["driving", "transit"]
+    np.testing.assert_allclose(list(factors.values()), 2.0)
+
+
+def _routing_fixture():
+    participants = [
+        Participant(
+            temp_id=f"p{i}",
+            location=Location(address=f"地址{i}", lat=39.9 + 0.02 * i, lng=116.4 + 0.015 * i),
+            transport="driving"
+        )
+        for i in range(3)
+    ]
+    candidates = [
+        {"id": f"c{j}", "name": f"地点{j}", "address": "", "lat": 39.93 + 0.004 * j, "lng": 116.42, "rating": 4.5}
+        for j in range(8)
+    ]
+    return participants, RecommendationEngine.recommend_locations(participants, candidates, 5)
+
+
+def test_routed_times_keep_estimates_when_nothing_was_routed():
+    service = RecordingMapService({0: "none"})
+    service.calibrate_routes = True
+    participants, places = _routing_fixture()
+    before = [place.to_dict() for place in places]
+
+    asyncio.run(apply_routed_times(service, participants, places))
+
+    assert [place.to_dict() for place in places] == before
+
+
+def test_routed_times_only_replace_routed_cells():
+    service = RecordingMapService({0: "partial"})
+    service.calibrate_routes = True
+    participants, places = _routing_fixture()
+    before = [place.to_dict() for place in places]
+
+    asyncio.run(apply_routed_times(service, participants, places))
+
+    # 第一个参与者到第一个地点没有路线，保留打分时的直线距离和估算耗时
+    assert places[0].participant_distances[0].to_dict() == before[0]["participant_distances"][0]
+    assert places[0].participant_distances[1].travel_time != before[0]["participant_distances"][1]["travel_time"]
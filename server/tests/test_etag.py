@@ -0,0 +1,70 @@
+import fakeredis.aioredis
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import api.gathering as gathering_api
+import api.recommendation as recommendation
+import app.database as database
+from app.config import settings
+from app.etag import etag_matches
+from main import app
+from services.map_service import FakeMapService
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(database, "redis_client", fakeredis.aioredis.FakeRedis(decode_responses=True))
+    monkeypatch.setattr(database, "mongodb", AsyncMongoMockClient()["yuebei_test"])
+    monkeypatch.setattr(recommendation, "get_map_service", lambda: FakeMapService())
+    monkeypatch.setattr(settings, "ROUTED_TRAVEL_TIMES", False)
+
+    async def schedule_recompute(code):
+        pass
+
+    # 由测试显式计算推荐，不在后台重算
+    monkeypatch.setattr(gathering_api, "_schedule_recompute", schedule_recompute)
+    return TestClient(app)
+
+
+def _join(client, code, temp_id, lat, lng):
+    participant = {"temp_id": temp_id, "nickname": temp_id, "location": {"address": temp_id, "lat": lat, "lng": lng}}
+    assert client.post("/api/gathering/join", json={"code": code, "participant": participant}).json()["success"]
+
+
+def test_etag_matches_weak_and_listed_tags():
+    assert etag_matches('"g-3"', '"g-3"')
+    assert etag_matches('W/"g-3"', '"g-3"')
+    assert etag_matches('"g-1", W/"g-3"', '"g-3"')
+    assert etag_matches("*", '"g-3"')
+    assert not etag_matches('"g-2"', '"g-3"')
+    assert not etag_matches(None, '"g-3"')
+
+
+def test_conditional_requests_return_304_until_the_gathering_changes(client):
+    created = client.post("/api/gathering/create", json={
+        "type": "meal",
+        "creator_location": {"address": "国贸", "lat": 39.9, "lng": 116.4}
+    }).json()
+    code = created["data"]["code"]
+    _join(client, code, "u2", 39.95, 116.45)
+
+    gathering = client.get(f"/api/gathering/{code}")
+    gathering_etag = gathering.headers["ETag"]
+    assert client.get(f"/api/gathering/{code}", headers={"If-None-Match": gathering_etag}).status_code == 304
+
+    calculated = client.post("/api/recommend/calculate", params={"gathering_code": code})
+    recommendations_etag = calculated.headers["ETag"]
+    assert calculated.json()["success"]
+
+    # 保存推荐结果不使聚会的 ETag 失效
+    assert client.get(f"/api/gathering/{code}", headers={"If-None-Match": gathering_etag}).status_code == 304
+    assert client.get(f"/api/recommend/{code}", headers={"If-None-Match": recommendations_etag}).status_code == 304
+
+    _join(client, code, "u3", 39.93, 116.42)
+
+    assert client.get(f"/api/gathering/{code}", headers={"If-None-Match": gathering_etag}).status_code == 200
+    refreshed = client.get(f"/api/recommend/{code}", headers={"If-None-Match": recommendations_etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["ETag"] != recommendations_etag
+    assert refreshed.json()["participant_count"] == 3
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime
+
+import fakeredis.aioredis
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import app.database as database
+import services.gathering_repository as gathering_repository_module
+from models.gathering import Gathering
+from services.gathering_repository import GatheringRepository
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    mongodb = AsyncMongoMockClient()["yuebei_test"]
+    monkeypatch.setattr(database, "redis_client", redis)
+    monkeypatch.setattr(database, "mongodb", mongodb)
+    return redis, mongodb
+
+
+def _doc(code: str = "ABC123") -> dict:
+    now = datetime(2026, 1, 5, 12, 0)
+    return {
+        "id": "g1",
+        "code": code,
+        "type": "meal",
+        "creator_id": "creator",
+        "participants": [
+            {
+                "temp_id": "p1",
+                "nickname": "用户1",
+                "location": {"address": "国贸", "lat": 39.9, "lng": 116.4},
+                "transport": "transit",
+                "joined_at": now
+            }
+        ],
+        "preferences": {"budget": 2},
+        "status": "active",
+        "recommendations": [{"id": "c1", "participant_distances": [{"temp_id": "p1"}]}],
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def test_calculation_read_only_loads_scoring_fields(stores):
+    redis, mongodb = stores
+    repository = GatheringRepository()
+
+    async def run():
+        await repository.create(_doc())
+        await redis.flushall()
+        from_db = await repository.get_for_calculation("abc123")
+        # 部分文档不回填缓存
+        cached_after_miss = await redis.get("gathering:ABC123")
+        await repository.get("ABC123")
+        from_cache = await repository.get_for_calculation("ABC123")
+        return from_db, cached_after_miss, from_cache
+
+    from_db, cached_after_miss, from_cache = asyncio.run(run())
+
+    assert cached_after_miss is None
+    for gathering in (from_db, from_cache):
+        data = gathering.model_dump(exclude_unset=True)
+        assert set(data) == {"code", "type", "preferences", "status", "version", "participants"}
+        assert set(data["participants"][0]) == {"temp_id", "nickname", "location", "transport"}
+        assert gathering.participants[0].location.lat == 39.9
+        assert gathering.version == 1
+    assert asyncio.run(repository.get_for_calculation("NOPE00")) is None
+
+
+def test_saving_recommendations_keeps_the_gathering_version(stores, monkeypatch):
+    redis, mongodb = stores
+    repository = GatheringRepository()
+    published = []
+
+    async def publish(code, message):
+        published.append(message)
+
+    monkeypatch.setattr(gathering_repository_module.gathering_hub, "publish", publish)
+
+    async def run():
+        await repository.create(_doc())
+        published.clear()
+        first = await repository.set_recommendations("ABC123", [{"id": "c1"}])
+        second = await repository.set_recommendations("ABC123", [{"id": "c2"}])
+        # 较早保存的结果晚到时不覆盖缓存
+        await repository._write_cache(first)
+        return first, second, await repository.cached_version("ABC123"), await repository.get_data("ABC123")
+
+    first, second, cached_version, data = asyncio.run(run())
+
+    assert (first.version, first.recommendations_version) == (1, 1)
+    assert (second.version, second.recommendations_version) == (1, 2)
+    assert cached_version == 1
+    assert data["recommendations"] == [{"id": "c2"}]
+    assert published == []
+
+
+def test_cache_keeps_the_newest_gathering_version(stores):
+    redis, mongodb = stores
+    repository = GatheringRepository()
+    newer = Gathering.from_db({**_doc(), "version": 3, "status": "cancelled"})
+    older = Gathering.from_db({**_doc(), "version": 2, "recommendations_version": 9})
+
+    async def run():
+        await repository._write_cache(newer)
+        await repository._write_cache(older)
+        return await repository.cached_version("ABC123"), await repository.get_data("ABC123")
+
+    cached_version, data = asyncio.run(run())
+
+    assert cached_version == 3
+    assert data["status"] == "cancelled"
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.location as location
+from main import app
+from services.geocoder import Geocoder
+from services.map_service import FakeMapService, GeocodeError, MapService
+from services.quota import QuotaExceeded
+
+
+class ScriptedMapService(MapService):
+    """按地址返回预设结果或抛出预设异常，并记录调用次数"""
+
+    provider = "scripted"
+
+    def __init__(self, answers):
+        super().__init__()
+        self.answers = answers
+        self.calls = 0
+
+    async def geocode(self, address, city=None):
+        self.calls += 1
+        answer = self.answers[address]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def _resolve_twice(service, address):
+    geocoder = Geocoder()
+
+    async def run():
+        first = await geocoder.geocode(service, address)
+        second = await geocoder.geocode(service, address)
+        return first, second
+
+    return asyncio.run(run())
+
+
+def test_provider_errors_are_returned_and_not_cached():
+    for error in (GeocodeError("HTTP 500"), QuotaExceeded("daily quota"), ConnectionError("reset")):
+        service = ScriptedMapService({"国贸": error})
+        geocoder = Geocoder()
+
+        async def run():
+            first = await geocoder.geocode_many(service, ["国贸"])
+            second = await geocoder.geocode_many(service, ["国贸"])
+            return first + second
+
+        assert asyncio.run(run()) == [error, error]
+        assert service.calls == 2
+
+
+def test_single_geocode_raises_provider_errors():
+    geocoder = Geocoder()
+
+    with pytest.raises(QuotaExceeded):
+        asyncio.run(geocoder.geocode(ScriptedMapService({"国贸": QuotaExceeded("busy")}), "国贸"))
+    with pytest.raises(GeocodeError):
+        asyncio.run(geocoder.geocode(ScriptedMapService({"国贸": ConnectionError("reset")}), "国贸"))
+
+
+def test_endpoints_report_provider_errors_separately_from_not_found(monkeypatch):
+    service = ScriptedMapService({
+        "国贸": {"lat": 39.9, "lng": 116.4, "formatted_address": "国贸", "province": None, "city": None, "district": None},
+        "不存在的地址": None,
+        "超时地址": TimeoutError("read timeout"),
+        "限流地址": QuotaExceeded("busy")
+    })
+    monkeypatch.setattr(location, "geocoder", Geocoder())
+    monkeypatch.setattr(location, "get_map_service", lambda: service)
+    client = TestClient(app)
+
+    assert client.post("/api/location/geocode", params={"address": "超时地址"}).status_code == 502
+    assert client.post("/api/location/geocode", params={"address": "限流地址"}).status_code == 503
+    assert client.post("/api/location/geocode", params={"address": "不存在的地址"}).json()["success"] is False
+
+    body = client.post("/api/location/geocode/batch", json={"addresses": ["国贸", "不存在的地址", "超时地址"]}).json()
+    assert (body["resolved"], body["failed"]) == (1, 1)
+    assert "error" not in body["data"][1]
+    assert body["data"][2]["location"] is None and body["data"][2]["error"]
+
+
+def test_not_found_is_cached():
+    service = ScriptedMapService({"不存在的地址": None})
+    assert _resolve_twice(service, "不存在的地址") == (None, None)
+    assert service.calls == 1
+
+
+def test_mock_geocodes_are_not_cached():
+    geocoder = Geocoder()
+
+    async def run():
+        await geocoder.geocode(FakeMapService(), "国贸")
+        return await geocoder.cache.get(geocoder.key("国贸"))
+
+    assert asyncio.run(run()) is None
@@ -0,0 +1,38 @@
+"""
+多服务商路由测试
+"""
+import asyncio
+import hashlib
+from datetime import datetime
+from app.config import settings
+from services.map_service import TencentMapService, AMapService
+from services.provider_router import ProviderRouter, provider_health, STATE_CLOSED
+from services.quota import quota_manager, LocalTokenBucket
+
+
+def _exhaust(api_key: str):
+    """把该 Key 的进程内令牌桶的当日额度用尽"""
+    bucket = LocalTokenBucket(1)
+    bucket.day = datetime.now().strftime("%Y%m%d")
+    bucket.used = 10 ** 9
+    quota_manager._local[hashlib.md5(api_key.encode("utf-8")).hexdigest()[:12]] = bucket
+
+
+def test_quota_rejections_do_not_open_breaker():
+    tencent, amap = TencentMapService(), AMapService()
+    tencent.key, amap.key = "test-tencent-key", "test-amap-key"
+    _exhaust(tencent.key)
+    _exhaust(amap.key)
+    provider_health.clear()
+    router = ProviderRouter([tencent, amap])
+
+    rejections = quota_manager.rejections
+    for _ in range(settings.MAP_BREAKER_FAILURES + 2):
+        assert asyncio.run(router._hedged_fetch((39.9, 116.4), "餐厅", 1000)) is None
+
+    # 请求确实因配额被拒绝，但没有计入熔断
+    assert quota_manager.rejections > rejections
+    for name in ("tencent", "amap"):
+        health = provider_health[name]
+        assert health.breaker.state == STATE_CLOSED
+        assert health.breaker.failures == 0
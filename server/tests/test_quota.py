@@ -0,0 +1,73 @@
+import asyncio
+import uuid
+
+import fakeredis.aioredis
+import pytest
+
+import api.recommendation as recommendation
+import app.database as database
+from app.config import settings
+from services.quota import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    QuotaExceeded,
+    QuotaManager,
+    request_priority
+)
+
+
+@pytest.fixture(params=["redis", "local"])
+def backend(request, monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True) if request.param == "redis" else None
+    monkeypatch.setattr(database, "redis_client", client)
+    monkeypatch.setattr(settings, "TENCENT_MAP_QPS", 1000)
+    monkeypatch.setattr(settings, "TENCENT_MAP_DAILY_QUOTA", 10)
+    monkeypatch.setattr(settings, "QUOTA_BACKGROUND_RESERVE", 0.2)
+    return request.param
+
+
+def _drain(manager: QuotaManager, api_key: str, priority: str) -> int:
+    """按该优先级一直获取配额，返回拒绝前成功的次数"""
+
+    async def run():
+        granted = 0
+        while True:
+            try:
+                await manager.acquire("tencent", api_key, priority, max_wait=0.01)
+            except QuotaExceeded:
+                return granted
+            granted += 1
+
+    return asyncio.run(run())
+
+
+def test_background_requests_leave_reserved_daily_quota(backend):
+    manager = QuotaManager()
+    api_key = uuid.uuid4().hex
+
+    # 每日10次，其中20%只留给交互请求
+    assert _drain(manager, api_key, PRIORITY_BACKGROUND) == 8
+    assert _drain(manager, api_key, PRIORITY_INTERACTIVE) == 2
+    assert manager.rejections == 2
+
+
+def test_recompute_uses_background_priority(monkeypatch):
+    seen = []
+
+    class ActiveGathering:
+        status = "active"
+
+    async def get(code):
+        return ActiveGathering()
+
+    async def calculate(*args, **kwargs):
+        seen.append(request_priority.get())
+
+    monkeypatch.setattr(recommendation.gathering_repository, "get_for_calculation", get)
+    monkeypatch.setattr(recommendation, "participant_version", lambda gathering: "v")
+    monkeypatch.setattr(recommendation, "_calculate", calculate)
+
+    asyncio.run(recommendation.recompute_gathering("ABC123"))
+
+    assert seen == [PRIORITY_BACKGROUND]
+    assert request_priority.get() == PRIORITY_INTERACTIVE
@@ -0,0 +1,73 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+
+import app.database as database
+from services.recompute_worker import RecomputeWorker
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    read = client.xreadgroup
+
+    async def xreadgroup(*args, **kwargs):
+        # 模拟阻塞读取，避免空队列时空转
+        entries = await read(*args, **kwargs)
+        if not entries:
+            await asyncio.sleep(0.02)
+        return entries
+
+    monkeypatch.setattr(client, "xreadgroup", xreadgroup)
+    monkeypatch.setattr(database, "redis_client", client)
+    return client
+
+
+def test_changes_within_the_debounce_window_recompute_once(redis):
+    worker = RecomputeWorker(debounce=0.2)
+    handled = []
+
+    async def handler(code):
+        handled.append(code)
+
+    async def run():
+        assert await worker.enqueue("abc123") is False
+
+        worker.start(handler)
+        for _ in range(5):
+            assert await worker.enqueue("abc123") is True
+            await asyncio.sleep(0.05)
+        await worker.enqueue("xyz789")
+        # 最后一次变化后还未到防抖时间
+        await asyncio.sleep(0.1)
+        pending = list(handled)
+        await asyncio.sleep(0.4)
+        await worker.stop()
+        return pending
+
+    assert asyncio.run(run()) == []
+    assert sorted(handled) == ["ABC123", "XYZ789"]
+    assert worker.stats()["enqueued"] == 2
+    assert worker.stats()["debounced"] == 4
+
+
+def test_changes_during_a_recompute_are_queued_again(redis):
+    worker = RecomputeWorker(debounce=0.05)
+    handled = []
+
+    async def run():
+        async def handler(code):
+            handled.append(code)
+            if len(handled) == 1:
+                # 计算期间参与者再次变化
+                await worker.enqueue(code)
+
+        worker.start(handler)
+        await worker.enqueue("ABC123")
+        await asyncio.sleep(0.5)
+        await worker.stop()
+
+    asyncio.run(run())
+    assert handled == ["ABC123", "ABC123"]
+    assert worker.stats()["processed"] == 2
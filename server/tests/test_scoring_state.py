@@ -0,0 +1,112 @@
+import random
+from datetime import datetime
+
+import core.algorithm
+import core.calibration
+import core.scoring_state
+from core.algorithm import RecommendationEngine
+from core.scoring_state import GatheringScoringState
+from models.gathering import Location, Participant
+
+
+def _participant(i: int, lat: float, lng: float, transport: str = "driving") -> Participant:
+    return Participant(
+        temp_id=f"p{i}",
+        nickname=f"用户{i}",
+        location=Location(address=f"地址{i}", lat=lat, lng=lng),
+        transport=transport
+    )
+
+
+def _candidates(count: int = 300):
+    rng = random.Random(7)
+    return [
+        {
+            "id": f"c{i}",
+            "name": f"地点{i}",
+            "address": f"候选地址{i}",
+            "lat": 39.9 + rng.uniform(-0.05, 0.05),
+            "lng": 116.4 + rng.uniform(-0.05, 0.05),
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "price_level": rng.randint(1, 4),
+            "type": "restaurant"
+        }
+        for i in range(count)
+    ]
+
+
+def _dicts(places):
+    return [p.to_dict() for p in places]
+
+
+def test_incremental_recommend_matches_full_recompute():
+    candidates = _candidates()
+    state = GatheringScoringState(candidates, [(39.9, 116.4)], "餐厅")
+    transports = ["driving", "transit", "walking"]
+    participants = [
+        _participant(i, 39.9 + 0.01 * i, 116.4 - 0.008 * i, transports[i % 3])
+        for i in range(6)
+    ]
+
+    assert state.sync(participants) == 6
+    assert _dicts(state.recommend(5)) == _dicts(
+        RecommendationEngine.recommend_locations(participants, candidates, 5)
+    )
+
+    # 一人移动、一人离开、一人加入：只重新计算变化的两行
+    participants[2] = _participant(2, 39.93, 116.37, "walking")
+    del participants[4]
+    participants.append(_participant(9, 39.88, 116.45, "transit"))
+
+    assert state.sync(participants) == 2
+    assert _dicts(state.recommend(5)) == _dicts(
+        RecommendationEngine.recommend_locations(participants, candidates, 5)
+    )
+
+    # 参与者不变时不重新计算
+    assert state.sync(participants) == 0
+
+
+def test_covers_tolerates_small_center_drift_only():
+    state = GatheringScoringState(_candidates(10), [(39.9, 116.4)], "餐厅")
+
+    # 约 0.5 公里
+    assert state.covers([(39.9045, 116.4)], "餐厅", 1.0)
+    # 约 2.2 公里
+    assert not state.covers([(39.92, 116.4)], "餐厅", 1.0)
+    # 关键词或簇数量变化时重新搜索
+    assert not state.covers([(39.9, 116.4)], "咖啡", 1.0)
+    assert not state.covers([(39.9, 116.4), (39.95, 116.5)], "餐厅", 1.0)
+
+
+def test_rows_are_recomputed_when_the_calibration_hour_changes(monkeypatch):
+    hour = {"value": 8}
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2026, 1, 5, hour["value"], 30)
+
+    calibrator = core.calibration.TravelTimeCalibrator(min_samples=1)
+    monkeypatch.setattr(core.calibration, "datetime", Clock)
+    monkeypatch.setattr(core.algorithm, "travel_time_calibrator", calibrator)
+    monkeypatch.setattr(core.scoring_state, "travel_time_calibrator", calibrator)
+
+    # 早高峰驾车比估算慢一倍，其他时段按全局系数
+    for _ in range(3):
+        calibrator.record((39.9, 116.4), (39.95, 116.45), "driving", 60, hour=8)
+    calibrator.record((39.9, 116.4), (39.95, 116.45), "driving", 20, hour=14)
+    calibrator.refit()
+
+    candidates = _candidates(50)
+    participants = [_participant(i, 39.9 + 0.002 * i, 116.4 + 0.002 * i) for i in range(3)]
+    state = GatheringScoringState(candidates, [(39.9, 116.4)], "餐厅")
+
+    assert state.sync(participants) == 3
+    assert state.sync(participants) == 0
+
+    hour["value"] = 14
+    assert state.sync(participants) == 3
+    assert _dicts(state.recommend(5)) == _dicts(
+        RecommendationEngine.recommend_locations(participants, candidates, 5)
+    )
@@ -0,0 +1,51 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+
+import app.database as database
+from services.singleflight import SingleFlight
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(database, "redis_client", client)
+    return client
+
+
+def _counter():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"n": len(calls)}
+
+    return calls, compute
+
+
+def test_concurrent_calls_share_one_execution(redis):
+    flight = SingleFlight(namespace="test")
+    calls, compute = _counter()
+
+    async def run():
+        return await asyncio.gather(*[flight.do("k", compute) for _ in range(5)])
+
+    assert asyncio.run(run()) == [{"n": 1}] * 5
+    assert len(calls) == 1
+
+
+def test_recent_result_is_reused_unless_fresh(redis):
+    flight = SingleFlight(namespace="test")
+    calls, compute = _counter()
+
+    async def run():
+        first = await flight.do("k", compute)
+        reused = await flight.do("k", compute)
+        refreshed = await flight.do("k", compute, fresh=True)
+        after_refresh = await flight.do("k", compute)
+        return first, reused, refreshed, after_refresh
+
+    assert asyncio.run(run()) == ({"n": 1}, {"n": 1}, {"n": 2}, {"n": 2})
+    assert len(calls) == 2